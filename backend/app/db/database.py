@@ -1,16 +1,18 @@
 # backend/app/db/database.py
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, func, text
 from sqlalchemy.orm import sessionmaker
-from .models import Base
+from .models import Base, Snapshot
 
 load_dotenv()
 DEMO_MODE = os.getenv("DEMO_MODE", "0") == "1"
 
 if DEMO_MODE:
     print("Using demo SQLite database")
-    DATABASE_URL = "sqlite:///./steamvault_demo.db"
+    DATABASE_URL = f"sqlite:///{os.getenv('DEMO_DB_PATH', './steamvault_demo.db')}"
 else:
     USER = os.getenv("user")
     PASSWORD = os.getenv("password")
@@ -26,9 +28,156 @@ else:
         DATABASE_URL = "sqlite:///./steamvault.db"
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if "sqlite" in DATABASE_URL else {})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, info={"db": "main"})
+
+# Optional read replicas (comma separated urls), ignored in demo mode
+# e.g. READ_REPLICA_URLS=sqlite:///./steamvault_replica.db
+READ_REPLICA_URLS = [] if DEMO_MODE else [u.strip() for u in os.getenv("READ_REPLICA_URLS", "").split(",") if u.strip()]
+READ_REPLICA_MAX_LAG = float(os.getenv("READ_REPLICA_MAX_LAG", "60"))              # seconds behind primary
+READ_REPLICA_CHECK_INTERVAL = float(os.getenv("READ_REPLICA_CHECK_INTERVAL", "15"))  # seconds between health checks
+READ_YOUR_WRITES_WINDOW = float(os.getenv("READ_YOUR_WRITES_WINDOW", "30"))        # seconds reads stay on primary after a write
+
+class ReadReplica:
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_engine(
+            url,
+            pool_pre_ping=True,
+            connect_args={"check_same_thread": False} if "sqlite" in url else {}
+        )
+        # same data as "main" but possibly behind it, see db_namespace()
+        self.Session = sessionmaker(
+            autocommit=False, autoflush=False, bind=self.engine,
+            info={"db": "main", "replica": self.engine.url.render_as_string(hide_password=True)}
+        )
+        self.healthy = False
+        self.lag = None
+        self.checked_at = 0.0
+
+    def check(self, primary_latest):
+        '''
+        Replica is usable when it answers and its newest snapshot is at most
+        READ_REPLICA_MAX_LAG seconds behind the primary's
+        '''
+        try:
+            with self.engine.connect() as conn:
+                replica_latest = conn.execute(func.max(Snapshot.date).select()).scalar()
+            if primary_latest is None:
+                self.lag = 0.0
+            elif replica_latest is None:
+                self.lag = None
+            else:
+                self.lag = max((primary_latest - replica_latest).total_seconds(), 0.0)
+            self.healthy = self.lag is not None and self.lag <= READ_REPLICA_MAX_LAG
+        except Exception as e:
+            print(f"Read replica {self.engine.url.render_as_string(hide_password=True)} unavailable: {e}")
+            self.healthy = False
+            self.lag = None
+        self.checked_at = time.time()
+
+read_replicas = [ReadReplica(url) for url in READ_REPLICA_URLS]
+if read_replicas:
+    print(f"Using {len(read_replicas)} read replica(s) for analytics reads")
+
+_replica_lock = threading.Lock()
+_replica_turn = 0
+_last_primary_write = 0.0
+
+def mark_primary_write():
+    # reads right after a write (e.g. after /fetch/) stay on the primary
+    global _last_primary_write
+    _last_primary_write = time.time()
+
+def check_replicas(force: bool = False):
+    if not read_replicas:
+        return []
+    now = time.time()
+    stale = [r for r in read_replicas if force or now - r.checked_at >= READ_REPLICA_CHECK_INTERVAL]
+    if stale:
+        try:
+            with engine.connect() as conn:
+                primary_latest = conn.execute(func.max(Snapshot.date).select()).scalar()
+        except Exception as e:
+            print(f"Primary unavailable for replica lag check: {e}")
+            primary_latest = None
+        for replica in stale:
+            replica.check(primary_latest)
+    return [{
+        "url": r.engine.url.render_as_string(hide_password=True),
+        "healthy": r.healthy,
+        "lag_seconds": r.lag
+    } for r in read_replicas]
+
+def db_namespace(db) -> str:
+    '''
+    Key for in-memory state built from a session's data (time series store,
+    trend series, partitions, cache keys): "main", "demo", or
+    "main@<replica url>". A replica can lag the primary, so nothing it builds
+    is shared with the primary's. Data versions stay per logical db
+    (db.info["db"]), they are bumped by writes to the primary
+    '''
+    name = db.info.get("db") or db.get_bind().url.render_as_string(hide_password=True)
+    replica = db.info.get("replica")
+    return f"{name}@{replica}" if replica else name
+
+def ReadSessionLocal():
+    '''
+    Session for read-only work. Goes to a healthy, caught-up replica when one
+    is configured, otherwise (or right after a write) to the primary.
+    '''
+    global _replica_turn
+    if not read_replicas or time.time() - _last_primary_write < READ_YOUR_WRITES_WINDOW:
+        return SessionLocal()
+
+    with _replica_lock:
+        check_replicas()
+        healthy = [r for r in read_replicas if r.healthy]
+        if not healthy:
+            return SessionLocal()
+        replica = healthy[_replica_turn % len(healthy)]
+        _replica_turn += 1
+    return replica.Session()
 
 # Initialize production DB if not demo
 def init_database():
     if not DEMO_MODE:
-        Base.metadata.create_all(bind=engine)
+        migrate_schema(engine)
+
+def migrate_schema(bind):
+    '''
+    create_all only creates missing tables, so columns and indexes added to
+    existing tables later on are added here (columns must be nullable or have
+    a server default)
+    '''
+    Base.metadata.create_all(bind=bind)
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=bind.dialect)}"
+                if column.server_default is not None:
+                    default = column.server_default.arg
+                    default = default if isinstance(default, str) else default.compile(dialect=bind.dialect)
+                    ddl += f" DEFAULT {default}"
+                conn.execute(text(ddl))
+                print(f"Added column {table.name}.{column.name}")
+
+            existing_indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing_indexes:
+                    index.create(conn)
+                    print(f"Added index {index.name}")
+
+
+# cached per engine, the demo db ships without the newer derived tables
+_table_cache = {}
+
+def has_table(session, table_name: str) -> bool:
+    bind = session.get_bind()
+    key = (bind.url.render_as_string(hide_password=True), table_name)
+    if key not in _table_cache:
+        _table_cache[key] = inspect(bind).has_table(table_name)
+    return _table_cache[key]
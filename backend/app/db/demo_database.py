@@ -1,12 +1,89 @@
 # /backend/app/db/demo_database.py
+import os
+import sqlite3
+import threading
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from .models import Base
+from sqlalchemy.pool import QueuePool, StaticPool
+from .database import migrate_schema
 
-DATABASE_URL = "sqlite:///./steamvault_demo.db"
+'''
+The demo database never changes, so it is read from disk once and kept in
+memory as a serialized SQLite image. Each process restores the image once
+into a shared-cache in-memory database, every pooled connection is a
+read-only connection to that one copy: requests never touch the file and
+never share a connection, and memory doesn't grow with the pool.
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+load_demo_database() runs at import time of main.py, so with
+`gunicorn --preload` the image (and anything precomputed from it) lives in the
+master and is shared copy-on-write by the workers. Pooled connections are
+dropped after fork, each worker restores its own copy on first use.
+'''
+
+DEMO_DB_PATH = os.getenv("DEMO_DB_PATH", "./steamvault_demo.db") # another file e.g. for load tests
+DATABASE_URL = f"sqlite:///{DEMO_DB_PATH}"
+
+_demo_image = None
+# pid -> connection keeping that process's shared copy alive. A forked worker
+# leaves the parent's entry alone (closing it there is not safe) and adds its own
+_holders = {}
+_holders_lock = threading.Lock()
+
+def _shared_uri():
+    return f"file:steamvault_demo_{os.getpid()}?mode=memory&cache=shared"
+
+def _connect():
+    with _holders_lock:
+        if os.getpid() not in _holders:
+            holder = sqlite3.connect(_shared_uri(), uri=True, check_same_thread=False)
+            # deserialize() makes a private db, so the image goes in with a backup
+            image = sqlite3.connect(":memory:")
+            try:
+                image.deserialize(_demo_image)
+                image.backup(holder)
+            finally:
+                image.close()
+            _holders[os.getpid()] = holder
+    conn = sqlite3.connect(_shared_uri(), uri=True, check_same_thread=False)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+engine = create_engine("sqlite://", creator=_connect, poolclass=QueuePool, pool_size=5, max_overflow=10)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, info={"db": "demo"})
+
+# never reuse the parent's sqlite connections in a forked worker
+os.register_at_fork(after_in_child=lambda: engine.dispose(close=False))
+
+def load_demo_database(prepare=None):
+    '''
+    Copy steamvault_demo.db into memory (once). Missing derived tables are
+    created on the copy and `prepare(session)` can fill them, the file on
+    disk is never modified.
+    '''
+    global _demo_image
+    if _demo_image is not None:
+        return
+
+    disk = sqlite3.connect(f"file:{DEMO_DB_PATH}?mode=ro", uri=True)
+    memory = sqlite3.connect(":memory:", check_same_thread=False)
+    try:
+        disk.backup(memory)
+    finally:
+        disk.close()
+
+    build_engine = create_engine("sqlite://", creator=lambda: memory, poolclass=StaticPool)
+    migrate_schema(build_engine)
+    if prepare:
+        session = sessionmaker(bind=build_engine, info={"db": "demo"})()
+        try:
+            prepare(session)
+        finally:
+            session.close()
+
+    _demo_image = memory.serialize()
+    build_engine.dispose()
+    memory.close()
+    print(f"Loaded demo database into memory ({len(_demo_image) // 1024} KB)")
 
 def init_demo_database():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    load_demo_database()
@@ -1,5 +1,5 @@
 # /backend/app/db/models.py
-from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Date, ForeignKey, Text, Boolean, Index, false
 from sqlalchemy.orm import declarative_base, relationship
 from datetime import datetime, timezone, date
 
@@ -24,7 +24,7 @@ class Snapshot(Base):
 
     # attributes
     id = Column(Integer, primary_key=True, index=True)
-    date = Column(DateTime, default=datetime.now(timezone.utc), nullable=False)
+    date = Column(DateTime, default=datetime.now(timezone.utc), nullable=False, index=True)
     appid = Column(Integer, ForeignKey("games.appid"), nullable=False, index=True)
     playtime_forever = Column(Integer, nullable=False) # minutes
     last_played = Column(DateTime, nullable=True)
@@ -32,6 +32,9 @@ class Snapshot(Base):
     # allow snapshot.game to return to Game obj
     game = relationship("Game", back_populates="snapshots")
 
+    # "snapshot of game X on day Y" lookups (one per game per day)
+    __table_args__ = (Index("ix_snapshots_appid_date", "appid", "date"),)
+
 # computed daily summaries stored to preserve historical data
 class DailySummary(Base):
     __tablename__ = "daily_summaries"
@@ -52,5 +55,99 @@ class DailySummary(Base):
     most_played_name = Column(String, nullable=True)
     most_played_minutes = Column(Integer, default=0)
 
+    # set by the nightly finalize step, ingest no longer touches the row after that
+    finalized = Column(Boolean, default=False, server_default=false(), nullable=False)
+
     # just to easily reference the highest played game
-    most_played_game = relationship("Game")
\ No newline at end of file
+    most_played_game = relationship("Game")
+
+# precomputed per game stats, kept up to date by db_sync on every ingest
+# so lifetime queries don't have to aggregate the whole snapshot history
+class GameStats(Base):
+    __tablename__ = "game_stats"
+
+    id = Column(Integer, primary_key=True, index=True)
+    appid = Column(Integer, ForeignKey("games.appid"), unique=True, nullable=False, index=True)
+
+    current_playtime = Column(Integer, default=0, nullable=False) # minutes
+    first_snapshot_date = Column(DateTime, nullable=True)
+    last_snapshot_date = Column(DateTime, nullable=True)
+    last_played = Column(DateTime, nullable=True)
+    lifetime_rank = Column(Integer, nullable=True, index=True) # 1 = most played
+
+    # playtime at the end of the previous day, today's minutes = current - baseline
+    baseline_date = Column(Date, nullable=True) # (UTC) day the baseline applies to
+    baseline_playtime = Column(Integer, nullable=True)
+
+    game = relationship("Game")
+
+
+# Steam store details per game, filled in the background (see services/metadata.py)
+class GameMetadata(Base):
+    __tablename__ = "game_metadata"
+
+    id = Column(Integer, primary_key=True, index=True)
+    appid = Column(Integer, ForeignKey("games.appid"), unique=True, nullable=False, index=True)
+
+    on_store = Column(Boolean, default=True, nullable=False) # false: store has no page for it
+    header_image = Column(String, nullable=True)
+    genres = Column(Text, nullable=True)     # json list of names
+    categories = Column(Text, nullable=True) # json list of names (single-player, controller support, ...)
+    developers = Column(Text, nullable=True) # json list
+    release_date = Column(String, nullable=True) # as the store shows it
+
+    fetched_at = Column(DateTime, nullable=True)
+    refresh_after = Column(DateTime, nullable=False, index=True)
+
+    game = relationship("Game")
+
+# one row per (game, genre), so playtime can be grouped by genre with a join
+class GameGenre(Base):
+    __tablename__ = "game_genres"
+
+    id = Column(Integer, primary_key=True, index=True)
+    appid = Column(Integer, ForeignKey("games.appid"), nullable=False, index=True)
+    genre = Column(String, nullable=False, index=True)
+
+    __table_args__ = (Index("ix_game_genres_appid_genre", "appid", "genre", unique=True),)
+
+# one row per month of snapshots split into its own partition (see services/partitions.py)
+class SnapshotPartition(Base):
+    __tablename__ = "snapshot_partitions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(Date, nullable=False, unique=True, index=True) # first day of the month
+    table_name = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="attached") # attached / archived
+    rows = Column(Integer, nullable=True)
+    archive_path = Column(String, nullable=True) # sqlite file / postgres schema.table
+    archived_at = Column(DateTime, nullable=True)
+
+# nightly playtime projections (see services/forecast.py), appid NULL = the whole library
+class Forecast(Base):
+    __tablename__ = "forecasts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    appid = Column(Integer, ForeignKey("games.appid"), nullable=True, unique=True, index=True)
+    as_of = Column(Date, nullable=False) # last day of data the models saw
+    computed_at = Column(DateTime, nullable=False)
+
+    current_playtime = Column(Integer, default=0, nullable=False) # minutes
+    daily_rate = Column(Float, default=0.0, nullable=False) # minutes per day, exponentially weighted
+    trend = Column(Float, default=0.0, nullable=False)      # change of the daily minutes per day (linear fit)
+    weekly = Column(Text, nullable=True)                     # json: projected minutes of the next weeks
+    milestone_hours = Column(Integer, nullable=True)         # next round number of hours
+    milestone_date = Column(Date, nullable=True)             # when it is reached at daily_rate
+
+    # run stats, library row only
+    games = Column(Integer, nullable=True)
+    runtime_ms = Column(Float, nullable=True)
+
+# standard analytics responses rendered once after each ingest (see services/bundle.py)
+class AnalyticsBundle(Base):
+    __tablename__ = "analytics_bundles"
+
+    id = Column(Integer, primary_key=True, index=True)
+    version = Column(Integer, unique=True, nullable=False, index=True)
+    created_at = Column(DateTime, nullable=False)
+    payload = Column(Text, nullable=False) # json: bundle key -> response
@@ -1,14 +1,18 @@
 # /backend/app/main.py
+import asyncio
 import os
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from backend.app.routes import fetch, analytics, games
-from backend.app.db.database import init_database
-from backend.app.security import verify_cron_token
+from backend.app.routes import fetch, analytics, games, events, imports
+from backend.app.services import db_sync, ingest, timeseries, cache, bundle, partitions
+from backend.app.db.database import init_database, read_replicas, check_replicas
+from backend.app.security import verify_cron_token, verify_admin_token
+from backend.app.profiling import ProfilingMiddleware, load_profile
+from backend.app import tracing
 
 # DELETE THIS, demo purposes only
-from backend.app.routes.demo.demo_routes import demo_router 
+from backend.app.routes.demo.demo_routes import demo_router, preload_demo
 
 load_dotenv()
 DEMO_MODE = os.getenv("DEMO_MODE", "0") == "1"
@@ -21,6 +25,7 @@ if DEMO_MODE or SHOW_DEMO_DOCS:
 else:
     # Disable all docs
     app = FastAPI(title="SteamVault",docs_url=None,redoc_url=None,openapi_url=None)
+app.router.route_class = tracing.TracedRoute
 
 # CORS middleware for frontend
 app.add_middleware(
@@ -37,8 +42,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# opt-in per request profiling (admin token + x-profile header or ?profile=1)
+app.add_middleware(ProfilingMiddleware)
+
+# request traces (off unless TRACING_EXPORTER is set), outermost so it times everything
+tracing.configure()
+app.add_middleware(tracing.TracingMiddleware)
+
 # Initialize db
 init_database()
+if not DEMO_MODE:
+    db_sync.backfill_game_stats()
+    partitions.maintain()
+    timeseries.preload()
+
+# Load the demo db into memory and precompute its responses at import time,
+# with `gunicorn --preload` this is done once and shared by all workers
+if DEMO_MODE or SHOW_DEMO_DOCS:
+    preload_demo()
 
 @app.get("/")
 async def main():
@@ -48,8 +69,46 @@ async def main():
 @app.post("/cron/ping", dependencies=[Depends(verify_cron_token)])
 async def cron_ping():    
     print("pinged the /cron/ping endpoint [POST]")
+    if read_replicas:
+        # piggyback replica health checks on the keep-alive
+        return {"status": "ok", "ran": "cron/ping", "replicas": check_replicas(force=True)}
     return {"status": "ok", "ran": "cron/ping"}
 
+# read back a stored request profile
+@app.get("/profiles/{profile_id}", dependencies=[Depends(verify_admin_token)], include_in_schema=False)
+async def get_profile(profile_id: str):
+    profile = load_profile(profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+# warm cache across restarts / sleeps, only valid for the data it was built from
+def _cache_tag():
+    return "demo" if DEMO_MODE else bundle.current_version()
+
+_cache_saver = {}
+
+async def _save_cache_periodically():
+    while True:
+        await asyncio.sleep(cache.CACHE_SNAPSHOT_INTERVAL)
+        try:
+            await asyncio.to_thread(cache.save_snapshot, _cache_tag())
+        except Exception as e:
+            print(f"Error saving cache snapshot: {e}")
+
+@app.on_event("startup")
+async def load_cache():
+    loaded = await asyncio.to_thread(cache.load_snapshot, _cache_tag())
+    print(f"Loaded {loaded} cache entries from {cache.CACHE_SNAPSHOT_PATH}")
+    _cache_saver["task"] = asyncio.create_task(_save_cache_periodically())
+
+@app.on_event("shutdown")
+async def save_cache():
+    if "task" in _cache_saver:
+        _cache_saver["task"].cancel()
+    saved = await asyncio.to_thread(cache.save_snapshot, _cache_tag())
+    print(f"Saved {saved} cache entries to {cache.CACHE_SNAPSHOT_PATH}")
+
 # Startup event
 @app.on_event("startup")
 async def run_fetch():
@@ -63,5 +122,7 @@ async def run_fetch():
         app.include_router(fetch.router, prefix="/fetch", tags=["fetch"], include_in_schema=False)
         app.include_router(analytics.router, prefix="/analytics", tags=["analytics"], include_in_schema=False)
         app.include_router(games.router, prefix="/games", tags=["games"], include_in_schema=False)
-        from backend.app.routes.fetch import get_steam_games
-        await get_steam_games()
+        app.include_router(events.router, prefix="/events", tags=["events"], include_in_schema=False)
+        app.include_router(imports.router, prefix="/import", tags=["import"], include_in_schema=False)
+        # first ingest in the background, startup doesn't wait for Steam
+        ingest.trigger("startup")
@@ -0,0 +1,247 @@
+# /backend/app/profiling.py
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from urllib.parse import parse_qs
+
+from dotenv import load_dotenv
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from backend.app import tracing
+
+'''
+On-demand profiling for a single request.
+
+Send the admin token in `x-token` plus either an `x-profile: 1` header or a
+`?profile=1` query flag. The request then runs under a sampling profiler and
+every SQL statement it executes is timed. The result is written to PROFILE_DIR:
+- <id>.collapsed : collapsed stacks (flamegraph.pl / speedscope can open it)
+- <id>.json      : metadata, SQL statements and their timings
+
+The profile id is returned in the `x-profile-id` response header and the stored
+profile can be read back from GET /profiles/{id}.
+
+Requests without the flag are passed straight through, nothing is hooked.
+'''
+
+load_dotenv()
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "./profiles")
+SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "1")) / 1000
+
+# profile of the request running in the current context (None almost always)
+_active_profile = contextvars.ContextVar("active_profile", default=None)
+
+# sql listeners are only attached while at least one profile is running
+_sql_hook_lock = threading.Lock()
+_sql_hook_users = 0
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.stacks = Counter()
+        self.sql = []
+        self.samples = 0
+        self.started = time.perf_counter()
+        self.duration_ms = None
+        self.status_code = None
+
+        self._threads = {threading.get_ident()}
+        self._threads_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample_loop, name=f"profiler-{self.id}", daemon=True)
+
+    def start(self):
+        self._sampler.start()
+
+    def stop(self):
+        self._stop.set()
+        self._sampler.join()
+        self.duration_ms = round((time.perf_counter() - self.started) * 1000, 3)
+
+    def run_in_thread(self, func, *args, **kwargs):
+        # register the worker thread so its stacks get sampled too
+        ident = threading.get_ident()
+        with self._threads_lock:
+            self._threads.add(ident)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            with self._threads_lock:
+                self._threads.discard(ident)
+
+    def _sample_loop(self):
+        while not self._stop.wait(SAMPLE_INTERVAL):
+            with self._threads_lock:
+                threads = tuple(self._threads)
+            frames = sys._current_frames()
+            for ident in threads:
+                frame = frames.get(ident)
+                if frame is not None:
+                    self.stacks[_collapse(frame)] += 1
+                    self.samples += 1
+
+    def record_sql(self, statement: str, duration_ms: float, executemany: bool):
+        self.sql.append({
+            "statement": statement,
+            "duration_ms": round(duration_ms, 3),
+            "executemany": executemany
+        })
+
+    def collapsed(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.stacks.most_common())
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "duration_ms": self.duration_ms,
+            "sample_interval_ms": SAMPLE_INTERVAL * 1000,
+            "samples": self.samples,
+            "sql_count": len(self.sql),
+            "sql_total_ms": round(sum(s["duration_ms"] for s in self.sql), 3),
+            "sql": self.sql
+        }
+
+    def save(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, f"{self.id}.collapsed"), "w") as f:
+            f.write(self.collapsed())
+        with open(os.path.join(PROFILE_DIR, f"{self.id}.json"), "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+
+def _collapse(frame) -> str:
+    # root first, leaf last, as expected by flamegraph tools
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_profile.get() is not None:
+        conn.info.setdefault("profile_query_start", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _active_profile.get()
+    if profile is None:
+        return
+    starts = conn.info.get("profile_query_start")
+    if starts:
+        profile.record_sql(statement, (time.perf_counter() - starts.pop()) * 1000, executemany)
+
+def _attach_sql_hooks():
+    global _sql_hook_users
+    with _sql_hook_lock:
+        if _sql_hook_users == 0:
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        _sql_hook_users += 1
+
+def _detach_sql_hooks():
+    global _sql_hook_users
+    with _sql_hook_lock:
+        _sql_hook_users -= 1
+        if _sql_hook_users == 0:
+            event.remove(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.remove(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+async def to_thread(func, /, *args, **kwargs):
+    '''
+    Drop-in replacement for asyncio.to_thread that keeps the worker thread
+    inside the current request profile (if any), and in a span of the current
+    trace (waiting for a free thread included).
+    '''
+    with tracing.span(f"to_thread {getattr(func, '__qualname__', repr(func))}", op="thread"):
+        profile = _active_profile.get()
+        if profile is None:
+            return await asyncio.to_thread(func, *args, **kwargs)
+        return await asyncio.to_thread(profile.run_in_thread, func, *args, **kwargs)
+
+
+def load_profile(profile_id: str):
+    # ids are hex only, anything else can't be one of ours
+    if not profile_id.isalnum():
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        data = json.load(f)
+    with open(os.path.join(PROFILE_DIR, f"{profile_id}.collapsed")) as f:
+        data["collapsed"] = f.read()
+    return data
+
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-profile" and value not in (b"", b"0"):
+            return True
+    query = scope.get("query_string", b"")
+    if b"profile" in query:
+        flag = parse_qs(query.decode("latin-1")).get("profile", ["0"])[0]
+        return flag not in ("", "0")
+    return False
+
+def _has_admin_token(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == b"x-token":
+            return ADMIN_TOKEN is not None and value.decode("latin-1") == ADMIN_TOKEN
+    return False
+
+
+class ProfilingMiddleware:
+    '''
+    Plain ASGI middleware (not BaseHTTPMiddleware) so unflagged requests only
+    pay for a header scan before being handed to the app.
+    '''
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        if not _has_admin_token(scope):
+            body = b'{"detail":"Unauthorized access - invalid admin token"}'
+            await send({"type": "http.response.start", "status": 401, "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile.id.encode())]
+            await send(message)
+
+        token = _active_profile.set(profile)
+        _attach_sql_hooks()
+        profile.start()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            profile.stop()
+            _detach_sql_hooks()
+            _active_profile.reset(token)
+            profile.save()
+            print(f"[PROFILE] {profile.method} {profile.path} -> {profile.id} ({profile.duration_ms} ms, {len(profile.sql)} queries)")
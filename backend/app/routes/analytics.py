@@ -1,26 +1,42 @@
 # /backend/app/routes/analytics.py
 from fastapi import APIRouter, Depends, HTTPException, Query
-from backend.app.services import analytics
+from backend.app.services import analytics, trends, heatmap, bundle, batch, events, series, partitions, coplay, forecast
+from backend.app import profiling
+from backend.app.tracing import TracedRoute
 from backend.app.services.analytics import compute_daily_summary, get_top_games, get_trends, get_latest_summary
-from backend.app.db.database import SessionLocal
+from backend.app.db.database import SessionLocal, ReadSessionLocal
 from backend.app.db.models import DailySummary
 from backend.app.security import verify_admin_token
 from backend.app.services import cache
 from typing import Optional, List
-from datetime import date
+from datetime import date, datetime, timezone
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 @router.post("/summary/generate", dependencies=[Depends(verify_admin_token)])
 async def generate_summary():
     summary = compute_daily_summary()
     if not summary:
         raise HTTPException(status_code=404, detail="No data for today or not enough data to compute.")
+    version = await profiling.to_thread(bundle.build_bundle)
+    events.publish_data_changed(version, summary=bundle.get_response(bundle.bundle_key("summary_latest")))
     return {"message": "Created summary", "summary":summary.__dict__}
 
+@router.post("/summary/finalize", dependencies=[Depends(verify_admin_token)])
+async def finalize_summary(day: Optional[date] = None):
+    summary = analytics.finalize_daily_summary(day)
+    if not summary:
+        raise HTTPException(status_code=404, detail="No data for that day.")
+    # nightly: move finished months into their partitions / create the next ones
+    await profiling.to_thread(partitions.maintain)
+    await profiling.to_thread(forecast.run_forecasts)
+    version = await profiling.to_thread(bundle.build_bundle)
+    events.publish_data_changed(version, summary=bundle.get_response(bundle.bundle_key("summary_latest")))
+    return {"message": "Finalized summary", "summary": summary.__dict__}
+
 @router.get("/summary/latest")
 async def get_latest_summary():
-    summary = analytics.get_latest_summary()
+    summary = bundle.serve(bundle.bundle_key("summary_latest"), analytics.get_latest_summary)
     if not summary:
         raise HTTPException(status_code=404, detail="No summaries yet.")
     return summary
@@ -31,42 +47,109 @@ async def get_top_games(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100)
     ):
-    result = analytics.get_top_games(period, page, limit)
+    result = bundle.serve(
+        bundle.bundle_key("top_games", period, page, limit),
+        lambda: analytics.get_top_games(period, page, limit)
+    )
     if not result:
         raise HTTPException(status_code=404, detail="No data for that period.")
     return result
 
+@router.get("/library")
+async def library_as_of(as_of: Optional[date] = None, page: int = Query(1, ge=1), limit: int = Query(50, ge=1, le=500)):
+    library = analytics.library_as_of(as_of or datetime.now(timezone.utc).date(), page, limit)
+    if not library:
+        raise HTTPException(status_code=404, detail="No snapshots on or before that date.")
+    return library
+
 @router.get("/trends")
-async def get_trends():
-    result = analytics.get_trends()
+async def get_trends(windows: Optional[str] = Query(None, description="Comma separated window sizes in days, e.g. 7,30,90,365")):
+    try:
+        parsed = trends.parse_windows(windows)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid windows: {e}")
+    result = bundle.serve(bundle.bundle_key("trends", *parsed), lambda: analytics.get_trends(windows=parsed))
     if not result:
         raise HTTPException(status_code=404, detail="Not enough data to show trends")
     return result
 
 @router.get("/summary/history")
 async def summary_history( start_date: Optional[date] = None, end_date: Optional[date] = None, limit: int = 90 ):
-    summary = analytics.summary_history(start_date, end_date, limit)
+    summary = bundle.serve(
+        bundle.bundle_key("summary_history", start_date, end_date, limit),
+        lambda: analytics.summary_history(start_date, end_date, limit)
+    )
     if not summary:
         raise HTTPException(status_code=404, detail="No data available to compute today's summary.")
     return summary
 
 @router.get("/streaks")
 async def streaks(appid: Optional[int] = None):
-    streak = analytics.get_streaks(appid)
+    streak = bundle.serve(bundle.bundle_key("streaks", appid), lambda: analytics.get_streaks(appid))
     if not streak:
         raise HTTPException(status_code=404, detail="No data available to fetch streak.")
     return streak
 
 @router.get("/activity/heatmap")
 async def activity_heatmap(limit_days: int = 90):
-    acitvity = analytics.activity_heatmap(limit_days)
+    acitvity = bundle.serve(bundle.bundle_key("heatmap", limit_days), lambda: analytics.activity_heatmap(limit_days))
     if not acitvity:
         raise HTTPException(status_code=404, detail="Not enough data available to see activity.")
     return acitvity
 
+@router.get("/activity/calendar")
+async def activity_calendar(
+    years: int = Query(1, ge=1, le=heatmap.MAX_YEARS),
+    top: int = Query(0, ge=0, le=heatmap.MAX_TOP_GAMES)
+    ):
+    calendar = bundle.serve(bundle.bundle_key("calendar", years, top), lambda: heatmap.activity_calendar(years, top))
+    if not calendar:
+        raise HTTPException(status_code=404, detail="Not enough data available to see activity.")
+    return calendar
+
+@router.get("/forecast")
+async def get_forecast(appid: Optional[int] = None, limit: int = Query(10, ge=1, le=100)):
+    result = bundle.serve(bundle.bundle_key("forecast", appid, limit), lambda: forecast.get_forecast(appid, limit))
+    if not result:
+        raise HTTPException(status_code=404, detail="No forecast for that game." if appid else "No forecasts yet, they are computed nightly.")
+    return result
+
+@router.post("/forecast/run", dependencies=[Depends(verify_admin_token)])
+async def run_forecast():
+    run = await profiling.to_thread(forecast.run_forecasts)
+    if not run:
+        raise HTTPException(status_code=500, detail="Computing the forecasts failed.")
+    version = await profiling.to_thread(bundle.build_bundle)
+    return {"message": "Computed forecasts", **run, "version": version}
+
+@router.get("/genres")
+async def playtime_by_genre():
+    genres = analytics.playtime_by_genre()
+    if not genres or not genres["genres"]:
+        raise HTTPException(status_code=404, detail="No game metadata yet.")
+    return genres
+
 @router.get("/games/compare")
-async def compare_games( appids: List[int] = Query(...), start_date: Optional[date] = None, end_date: Optional[date] = None):
-    comparison = analytics.compare_games(appids, start_date, end_date)
+async def compare_games( appids: List[int] = Query(...), start_date: Optional[date] = None, end_date: Optional[date] = None, resolution: series.Resolution = "day", max_points: Optional[int] = Query(None, ge=series.MIN_POINTS, le=series.MAX_POINTS)):
+    comparison = analytics.compare_games(appids, start_date, end_date, resolution=resolution, max_points=max_points)
     if not comparison:
         raise HTTPException(status_code=404, detail="Could not compare games.")
-    return comparison
\ No newline at end of file
+    return comparison
+
+@router.get("/games/related")
+async def related_games(appid: int, days: int = Query(coplay.DEFAULT_DAYS, ge=7, le=coplay.MAX_DAYS), limit: int = Query(10, ge=1, le=100)):
+    related = coplay.related_games(appid, days, limit)
+    if not related:
+        raise HTTPException(status_code=404, detail="Game not found.")
+    return related
+
+@router.get("/games/pairs")
+async def game_pairs(metric: str = Query("together", enum=coplay.METRICS), days: int = Query(coplay.DEFAULT_DAYS, ge=7, le=coplay.MAX_DAYS), limit: int = Query(20, ge=1, le=100)):
+    pairs = coplay.top_pairs(metric, days, limit)
+    if not pairs:
+        raise HTTPException(status_code=404, detail="Not enough data to pair games.")
+    return pairs
+
+@router.post("/batch")
+async def analytics_batch(request: batch.BatchRequest):
+    return await batch.run_batch(request.queries, ReadSessionLocal, lookup=bundle.get_response)
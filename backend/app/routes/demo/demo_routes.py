@@ -1,27 +1,72 @@
 # backend/app/routes/demo/demo_routes.py
-from fastapi import APIRouter, HTTPException, Query
-from backend.app.db.demo_database import SessionLocal
-from backend.app.services import analytics, games
+from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.encoders import jsonable_encoder
+from backend.app.db.demo_database import SessionLocal, load_demo_database
+from backend.app.db.models import Game
+from backend.app.services import analytics, games, trends, heatmap, db_sync, bundle, batch, series, cache, coplay, forecast
+from backend.app import tracing
+from backend.app.tracing import TracedRoute
 from typing import Optional, List
 from datetime import date
 
 '''
 This module is simply for showcasing demo data.
 This can be deleted.
-This uses the steamvault_demo.db file.
+This uses the steamvault_demo.db file (loaded into memory, see demo_database.py).
 '''
 
-demo_router = APIRouter(prefix="/demo")
-
-# create a single demo session (could also create one per request)
-demo_session = SessionLocal()
+demo_router = APIRouter(prefix="/demo", route_class=TracedRoute)
 
 # Demo reference date - the "current date" for demo purposes
 DEMO_REFERENCE_DATE = date(2025, 11, 15)
 
+# responses for the default parameters of every demo endpoint, built once by
+# preload_demo() since the demo data never changes
+DEMO_RESPONSES = {}
+
+def get_demo_db():
+    # one short lived, read-only session per request
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _prepare(session):
+    # derived tables of the in-memory copy
+    db_sync.backfill_game_stats(session)
+    forecast.run_forecasts(session, reference_date=DEMO_REFERENCE_DATE)
+
+def preload_demo():
+    load_demo_database(prepare=_prepare)
+    if DEMO_RESPONSES:
+        return
+
+    db = SessionLocal()
+    try:
+        # same standard responses the production bundle holds, plus every game page
+        responses = bundle.standard_responses(db, reference_date=DEMO_REFERENCE_DATE)
+        for (appid,) in db.query(Game.appid).all():
+            details = games.game_details(appid, 30, db, reference_date=DEMO_REFERENCE_DATE)
+            responses[bundle.bundle_key("game", appid, 30, "day", None)] = jsonable_encoder(details)
+
+        DEMO_RESPONSES.update(responses)
+        print(f"Precomputed {len(DEMO_RESPONSES)} demo responses")
+    finally:
+        db.close()
+
+def _respond(key_parts, compute):
+    key = bundle.bundle_key(*key_parts)
+    with tracing.span("cache.get", op="cache", layer="precomputed", key=key) as span:
+        cache.count("precomputed", key in DEMO_RESPONSES)
+        span.set("hit", key in DEMO_RESPONSES)
+    if key in DEMO_RESPONSES:
+        return DEMO_RESPONSES[key]
+    return compute()
+
 @demo_router.get("/analytics/summary/latest")
-async def demo_get_latest_summary():
-    summary = analytics.get_latest_summary(session=demo_session)
+async def demo_get_latest_summary(db=Depends(get_demo_db)):
+    summary = _respond(("summary_latest",), lambda: analytics.get_latest_summary(session=db))
     if not summary:
         raise HTTPException(status_code=404, detail="No summaries yet.")
     return summary
@@ -30,55 +75,126 @@ async def demo_get_latest_summary():
 async def get_top_games(
     period: str = Query("lifetime", enum=["week", "month", "lifetime"]),
     page: int = Query(1, ge=1),
-    limit: int = Query(10, ge=1, le=100)
+    limit: int = Query(10, ge=1, le=100),
+    db=Depends(get_demo_db)
     ):
-    result = analytics.get_top_games(period, page, limit, demo_session, reference_date=DEMO_REFERENCE_DATE)
+    result = _respond(
+        ("top_games", period, page, limit),
+        lambda: analytics.get_top_games(period, page, limit, db, reference_date=DEMO_REFERENCE_DATE)
+    )
     if not result:
         raise HTTPException(status_code=404, detail="No data for that period.")
     return result
 
+@demo_router.get("/analytics/library")
+async def library_as_of(as_of: Optional[date] = None, page: int = Query(1, ge=1), limit: int = Query(50, ge=1, le=500), db=Depends(get_demo_db)):
+    library = analytics.library_as_of(as_of or DEMO_REFERENCE_DATE, page, limit, db)
+    if not library:
+        raise HTTPException(status_code=404, detail="No snapshots on or before that date.")
+    return library
+
 @demo_router.get("/analytics/summary/history")
-async def demo_summary_history( start_date: Optional[date] = None, end_date: Optional[date] = None, limit: int = 90 ):
-    summary = analytics.summary_history(start_date, end_date, limit, session=demo_session)
+async def demo_summary_history( start_date: Optional[date] = None, end_date: Optional[date] = None, limit: int = 90, db=Depends(get_demo_db) ):
+    summary = _respond(
+        ("summary_history", start_date, end_date, limit),
+        lambda: analytics.summary_history(start_date, end_date, limit, session=db)
+    )
     if not summary:
         raise HTTPException(status_code=404, detail="No data available to compute today's summary.")
     return summary
 
 @demo_router.get("/analytics/trends")
-async def get_trends():
-    result = analytics.get_trends(demo_session, reference_date=DEMO_REFERENCE_DATE)
+async def get_trends(windows: Optional[str] = Query(None, description="Comma separated window sizes in days, e.g. 7,30,90,365"), db=Depends(get_demo_db)):
+    try:
+        parsed = trends.parse_windows(windows)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid windows: {e}")
+    result = _respond(
+        ("trends", *parsed),
+        lambda: analytics.get_trends(db, reference_date=DEMO_REFERENCE_DATE, windows=parsed)
+    )
     if not result:
         raise HTTPException(status_code=404, detail="Not enough data to show trends")
     return result
 
 @demo_router.get("/analytics/streaks")
-async def streaks(appid: Optional[int] = None):
-    streak = analytics.get_streaks(appid, demo_session)
+async def streaks(appid: Optional[int] = None, db=Depends(get_demo_db)):
+    streak = _respond(("streaks", appid), lambda: analytics.get_streaks(appid, db))
     if not streak:
         raise HTTPException(status_code=404, detail="No data available to fetch streak.")
     return streak
 
 @demo_router.get("/analytics/activity/heatmap")
-async def activity_heatmap(limit_days: int = 90):
-    activity = analytics.activity_heatmap(limit_days, demo_session, reference_date=DEMO_REFERENCE_DATE)
+async def activity_heatmap(limit_days: int = 90, db=Depends(get_demo_db)):
+    activity = _respond(
+        ("heatmap", limit_days),
+        lambda: analytics.activity_heatmap(limit_days, db, reference_date=DEMO_REFERENCE_DATE)
+    )
     if not activity:
         raise HTTPException(status_code=404, detail="Not enough data available to see activity.")
     return activity
 
+@demo_router.get("/analytics/activity/calendar")
+async def activity_calendar(
+    years: int = Query(1, ge=1, le=heatmap.MAX_YEARS),
+    top: int = Query(0, ge=0, le=heatmap.MAX_TOP_GAMES),
+    db=Depends(get_demo_db)
+    ):
+    calendar = _respond(
+        ("calendar", years, top),
+        lambda: heatmap.activity_calendar(years, top, db, reference_date=DEMO_REFERENCE_DATE)
+    )
+    if not calendar:
+        raise HTTPException(status_code=404, detail="Not enough data available to see activity.")
+    return calendar
+
 @demo_router.get("/analytics/games/compare")
-async def compare_games( appids: List[int] = Query(...), start_date: Optional[date] = None, end_date: Optional[date] = None):
-    comparison = analytics.compare_games(appids, start_date, end_date, demo_session, reference_date=DEMO_REFERENCE_DATE)
+async def compare_games( appids: List[int] = Query(...), start_date: Optional[date] = None, end_date: Optional[date] = None, resolution: series.Resolution = "day", max_points: Optional[int] = Query(None, ge=series.MIN_POINTS, le=series.MAX_POINTS), db=Depends(get_demo_db)):
+    comparison = analytics.compare_games(appids, start_date, end_date, db, reference_date=DEMO_REFERENCE_DATE, resolution=resolution, max_points=max_points)
     if not comparison:
         raise HTTPException(status_code=404, detail="Could not compare games.")
     return comparison
 
+@demo_router.get("/analytics/games/related")
+async def related_games(appid: int, days: int = Query(coplay.DEFAULT_DAYS, ge=7, le=coplay.MAX_DAYS), limit: int = Query(10, ge=1, le=100), db=Depends(get_demo_db)):
+    related = coplay.related_games(appid, days, limit, db, reference_date=DEMO_REFERENCE_DATE)
+    if not related:
+        raise HTTPException(status_code=404, detail="Game not found.")
+    return related
+
+@demo_router.get("/analytics/games/pairs")
+async def game_pairs(metric: str = Query("together", enum=coplay.METRICS), days: int = Query(coplay.DEFAULT_DAYS, ge=7, le=coplay.MAX_DAYS), limit: int = Query(20, ge=1, le=100), db=Depends(get_demo_db)):
+    pairs = coplay.top_pairs(metric, days, limit, db, reference_date=DEMO_REFERENCE_DATE)
+    if not pairs:
+        raise HTTPException(status_code=404, detail="Not enough data to pair games.")
+    return pairs
+
+@demo_router.get("/analytics/forecast")
+async def get_forecast(appid: Optional[int] = None, limit: int = Query(10, ge=1, le=100), db=Depends(get_demo_db)):
+    result = _respond(("forecast", appid, limit), lambda: forecast.get_forecast(appid, limit, db))
+    if not result:
+        raise HTTPException(status_code=404, detail="No forecast for that game.")
+    return result
+
+@demo_router.post("/analytics/batch")
+async def analytics_batch(request: batch.BatchRequest):
+    return await batch.run_batch(request.queries, SessionLocal, lookup=DEMO_RESPONSES.get, reference_date=DEMO_REFERENCE_DATE)
+
 @demo_router.get("/games/search")
-async def search(q: str = Query(..., min_length=1)):
-    return games.search_games(q, demo_session)
+async def search(q: str = Query(..., min_length=1), db=Depends(get_demo_db)):
+    return games.search_games(q, db)
 
 @demo_router.get("/games/{appid}")
-async def game_details(appid: int, days: int = 30):
-    details = games.game_details(appid, days, demo_session)
+async def game_details(appid: int, days: int = 30, resolution: series.Resolution = "day", max_points: Optional[int] = Query(None, ge=series.MIN_POINTS, le=series.MAX_POINTS), db=Depends(get_demo_db)):
+    details = _respond(
+        ("game", appid, days, resolution, max_points),
+        lambda: games.game_details(appid, days, db, reference_date=DEMO_REFERENCE_DATE, resolution=resolution, max_points=max_points)
+    )
     if "error" in details:
         raise HTTPException(status_code=404, detail="Game not found")
-    return details
\ No newline at end of file
+    return details
+
+# lookup counts per cache layer of this process (used by backend/scripts/load_test.py)
+@demo_router.get("/stats/cache", include_in_schema=False)
+async def cache_stats():
+    return cache.stats()
@@ -0,0 +1,79 @@
+# /backend/app/routes/events.py
+import asyncio
+import json
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from backend.app.services import events
+from backend.app.tracing import TracedRoute
+
+router = APIRouter(route_class=TracedRoute)
+
+'''
+Push channel for the dashboard: subscribe once and refetch when a
+data_changed event arrives, instead of polling the analytics endpoints.
+'''
+
+def _hello():
+    return {"type": "hello", "version": events.current_version()}
+
+@router.get("/stream")
+async def event_stream(request: Request):
+    if events.subscriber_count() >= events.EVENTS_MAX_CONNECTIONS:
+        raise HTTPException(status_code=503, detail="Too many event subscribers, poll instead.")
+
+    async def stream():
+        # subscribed once the body is sent, a client gone before that never got a slot
+        try:
+            subscriber = events.subscribe()
+        except events.TooManySubscribers:
+            # filled up since the check above, the client reconnects later
+            yield f"retry: {events.EVENTS_HEARTBEAT * 1000}\n\n"
+            return
+        try:
+            yield f"event: hello\ndata: {json.dumps(_hello())}\n\n"
+            while not await request.is_disconnected():
+                event = await subscriber.next_event(timeout=events.EVENTS_HEARTBEAT)
+                if event is None:
+                    yield ": ping\n\n"
+                else:
+                    yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            events.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.websocket("/ws")
+async def event_socket(websocket: WebSocket):
+    try:
+        subscriber = events.subscribe()
+    except events.TooManySubscribers:
+        await websocket.close(code=1013)
+        return
+
+    await websocket.accept()
+    # clients never need to send anything, reading only notices the disconnect
+    receiver = asyncio.create_task(websocket.receive_text())
+    try:
+        await websocket.send_json(_hello())
+        while True:
+            waiter = asyncio.create_task(subscriber.next_event(timeout=events.EVENTS_HEARTBEAT))
+            done, _ = await asyncio.wait({receiver, waiter}, return_when=asyncio.FIRST_COMPLETED)
+            if waiter in done:
+                event = waiter.result()
+                await websocket.send_json(event if event is not None else {"type": "ping"})
+            else:
+                waiter.cancel()
+            if receiver in done:
+                if receiver.exception():
+                    break
+                # ignore whatever the client sent
+                receiver = asyncio.create_task(websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        events.unsubscribe(subscriber)
@@ -1,61 +1,70 @@
 # /backend/app/routes/fetch.py
+import asyncio
 import os
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, Depends
 
-import asyncio
 
-from backend.app.services import steam_api, db_sync
+from backend.app.services import steam_api, ingest, metadata
 from backend.app.security import verify_admin_token
 from backend.app.services import cache
+from backend.app.tracing import TracedRoute
 
 load_dotenv()
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 STEAM_API_KEY = os.getenv("STEAM_API_KEY")
 STEAM_ID = os.getenv("STEAM_ID")
 ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 """
-Fetch user's owned games and data
-Returns JSON list of games with appid, name, and playtime.
+Fetch user's owned games and snapshot them
+Runs as an ingest job (see services/ingest.py), concurrent calls share one job.
+Waits for it and returns the job's stage timings and row counts,
+details=true adds what changed (the changed games list is capped).
 """
 @router.get("/", dependencies=[Depends(verify_admin_token)])
-async def get_steam_games():
-    # fetch raw data response
-    raw_data = await steam_api.get_owned_games()
+async def get_steam_games(details: bool = False):
+    job, _ = ingest.trigger("fetch")
+    # shielded, a client that hangs up doesn't cancel the job for everyone else
+    await asyncio.shield(job.done)
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=f"ingest failed: {job.error}")
+    return job.to_dict(details)
 
-    # process
-    processed_data = await steam_api.process_owned_games(raw_data)
+@router.post("/jobs", status_code=202, dependencies=[Depends(verify_admin_token)])
+async def start_ingest_job():
+    job, coalesced = ingest.trigger("jobs")
+    return {**job.to_dict(), "coalesced": coalesced}
 
-    # save to db
-    try:
-        # sqlalchemy blocks the thread
-        await asyncio.to_thread(db_sync.save_game_to_db, processed_data["games"])
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"failed to save snapshot: {e}")
+@router.get("/jobs/{job_id}", dependencies=[Depends(verify_admin_token)])
+async def ingest_job_status(job_id: str):
+    job = ingest.get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
 
-    print(processed_data["games"][0])
+@router.post("/metadata", status_code=202, dependencies=[Depends(verify_admin_token)])
+async def start_metadata_run():
+    started = metadata.schedule()
+    return {"started": started, **metadata.status()}
 
-    return processed_data
+@router.get("/metadata", dependencies=[Depends(verify_admin_token)])
+async def metadata_status():
+    return metadata.status()
 
 @router.get("/profile")
 async def get_proflie():
-    # fetch cached data
-    cached = cache.get_cache("steam-profile")
-    
-    if cached:
-        return {"cached": True, "profile":cached}
-    
+    # an expired profile is still served, refreshed in the background
     try:
-        profile_data = await steam_api.get_player_summary(STEAM_ID)
+        profile_data, cached = await cache.aget_or_revalidate(
+            "steam-profile", lambda: steam_api.get_player_summary(STEAM_ID), ttl=7200 # 2 hr cache
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to fetch profile {e}")
 
     if not profile_data:
         raise HTTPException(status_code=404, detail="Profile not found")
 
-    cache.set_cache("steam-profile", profile_data, 7200) # 2 hr cache
-
-    return {"cached": False, "profile":profile_data}
\ No newline at end of file
+    return {"cached": cached, "profile":profile_data}
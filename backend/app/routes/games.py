@@ -1,20 +1,21 @@
 # /backend/app/routes/games.py
 from fastapi import APIRouter, Query, HTTPException
-from typing import List
+from typing import List, Optional
 from backend.app.db.database import SessionLocal
 from backend.app.db.models import Game, Snapshot
-from backend.app.services import games
+from backend.app.services import games, series
+from backend.app.tracing import TracedRoute
 from datetime import datetime, timedelta, timezone
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 @router.get("/search")
 async def search(q: str = Query(..., min_length=1)):
     return games.search_games(q)
 
 @router.get("/{appid}")
-async def game_details(appid: int, days: int = 30):
-    details = games.game_details(appid, days)
+async def game_details(appid: int, days: int = 30, resolution: series.Resolution = "day", max_points: Optional[int] = Query(None, ge=series.MIN_POINTS, le=series.MAX_POINTS)):
+    details = games.game_details(appid, days, resolution=resolution, max_points=max_points)
     if "error" in details:
         raise HTTPException(status_code=404, detail="Game not found")
     return details
\ No newline at end of file
@@ -0,0 +1,92 @@
+# /backend/app/routes/imports.py
+import asyncio
+import os
+import re
+import uuid
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from typing import Optional
+from backend.app.security import verify_admin_token
+from backend.app.services import events, importer
+from backend.app import profiling
+from backend.app.tracing import TracedRoute
+
+router = APIRouter(dependencies=[Depends(verify_admin_token)], route_class=TracedRoute)
+
+'''
+Admin side of the bulk history importer (see services/importer.py).
+The upload is streamed to IMPORT_DIR and imported in the background, poll
+GET /import/{id} for progress. A failed import can be resumed.
+'''
+
+UPLOAD_CHUNK = 1024 * 1024
+
+# import id -> latest stats of imports started by this worker
+_imports = {}
+_tasks = {}
+
+def _path(import_id: str):
+    if not re.fullmatch(r"[0-9a-f]{32}", import_id):
+        return None
+    for fmt in importer.FORMATS:
+        path = os.path.join(importer.IMPORT_DIR, f"{import_id}.{fmt}")
+        if os.path.exists(path):
+            return path
+    return None
+
+async def _run(import_id: str, path: str, fmt: Optional[str]):
+    def progress(stats):
+        _imports[import_id] = dict(stats)
+
+    try:
+        stats = await profiling.to_thread(importer.import_history, path, fmt, progress=progress)
+        _imports[import_id] = stats
+        events.publish_data_changed(stats.get("bundle_version"))
+    except Exception as e:
+        print(f"Import {import_id} failed: {e}")
+        _imports[import_id] = importer.load_checkpoint(path) or {"status": "failed", "error": str(e)}
+    finally:
+        _tasks.pop(import_id, None)
+
+def _start(import_id: str, path: str, fmt: Optional[str]):
+    _imports[import_id] = {"status": "running", "stage": "load", "rows_read": 0}
+    _tasks[import_id] = asyncio.create_task(_run(import_id, path, fmt))
+
+@router.post("/", status_code=202)
+async def start_import(file: UploadFile = File(...), format: Optional[str] = Query(None, enum=list(importer.FORMATS))):
+    ext = os.path.splitext(file.filename or "")[1].lower()
+    try:
+        fmt = importer.detect_format(f"upload{ext}", format)
+    except importer.ImportFormatError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    import_id = uuid.uuid4().hex
+    os.makedirs(importer.IMPORT_DIR, exist_ok=True)
+    path = os.path.join(importer.IMPORT_DIR, f"{import_id}.{fmt}")
+    # stream the upload to disk, never held in memory as a whole
+    with open(path, "wb") as out:
+        while chunk := await file.read(UPLOAD_CHUNK):
+            out.write(chunk)
+
+    _start(import_id, path, fmt)
+    return {"import_id": import_id, "status": "running"}
+
+@router.get("/{import_id}")
+async def import_status(import_id: str):
+    if import_id in _imports:
+        return {"import_id": import_id, **_imports[import_id]}
+    # started by another worker / before a restart
+    path = _path(import_id)
+    stats = importer.load_checkpoint(path) if path else None
+    if not stats:
+        raise HTTPException(status_code=404, detail="Import not found")
+    return {"import_id": import_id, **stats}
+
+@router.post("/{import_id}/resume", status_code=202)
+async def resume_import(import_id: str):
+    if import_id in _tasks:
+        raise HTTPException(status_code=409, detail="Import is still running")
+    path = _path(import_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Import not found")
+    _start(import_id, path, None)
+    return {"import_id": import_id, "status": "running"}
@@ -1,91 +1,129 @@
 # backend/app/services/analytics.py
-from backend.app.db.database import SessionLocal
-from backend.app.db.models import Game, Snapshot, DailySummary
-from backend.app.services import cache
+import numpy as np
+from functools import lru_cache
+from backend.app.db.database import SessionLocal, ReadSessionLocal, db_namespace, has_table, mark_primary_write
+from backend.app.db.models import Game, Snapshot, DailySummary, GameStats, GameMetadata, GameGenre
+from backend.app.services import cache, trends, series, timeseries, partitions
 from datetime import date, timedelta, datetime, timezone
-from sqlalchemy import func
+from sqlalchemy import func, case, cast, Float, false, select, bindparam, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import aliased
 from typing import List, Optional
 
+def _summarize_day(db, day: date):
+    '''
+    Authoritative summary values for `day`, computed from the snapshots
+    (change points, a game without a snapshot that day didn't change)
+    Returns None when nothing was played that day
+    '''
+    day_start = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+    day_end = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+
+    # Get latest snapshot per game for the day (columns, not entities: row ids
+    # repeat across the sqlite month tables, the identity map would mix them up)
+    S = partitions.snapshots(db, day_start, day_end)
+    days_snapshots = (
+        db.query(S.appid, S.playtime_forever)
+        .filter(S.date >= day_start, S.date < day_end)
+        .order_by(S.appid, S.date.desc())
+        .all()
+    )
+    if not days_snapshots:
+        return None
+
+    # Pick only latest snapshot per game for the day
+    latest_today = {}
+    for appid, playtime in days_snapshots:
+        if appid not in latest_today:
+            latest_today[appid] = playtime
+
+    total_today = 0
+    new_games = 0
+    playtime_by_game = {}
+    before = partitions.snapshots(db, end=day_start)
+
+    for appid, playtime in latest_today.items():
+        # latest snapshot **before the day** for this game
+        prev_playtime = (
+            db.query(before.playtime_forever)
+            .filter(before.appid == appid, before.date < day_start)
+            .order_by(before.date.desc())
+            .limit(1)
+            .scalar()
+        )
+        if prev_playtime is None:
+            new_games += 1
+            prev_playtime = 0
+        delta = playtime - prev_playtime
+        if delta > 0:
+            playtime_by_game[appid] = delta
+            total_today += delta
+
+    if not playtime_by_game:
+        return None  # nothing new played that day
+
+    # Most played game of the day
+    most_played_appid = max(playtime_by_game, key=playtime_by_game.get)
+    most_played_game = db.query(Game).filter_by(appid=most_played_appid).first()
+
+    # Compare with the previous day's summary if it exists
+    prev_total = _previous_total(db, day)
+
+    # every game seen by the end of the day, their playtime carries forward
+    known = partitions.snapshots(db, end=day_end)
+    tracked = db.query(func.count(func.distinct(known.appid))).filter(known.date < day_end).scalar()
+
+    return {
+        "total_playtime_minutes": total_today,
+        "new_games_count": new_games,
+        "total_games_tracked": tracked,
+        "most_played_appid": most_played_appid,
+        "most_played_name": most_played_game.name if most_played_game else None,
+        "most_played_minutes": playtime_by_game[most_played_appid],
+        "average_playtime_per_game": round(total_today / tracked, 2) if tracked else 0,
+        "total_playtime_change": total_today - prev_total
+    }
+
+def _previous_total(db, day: date) -> int:
+    prev = (
+        db.query(DailySummary.total_playtime_minutes)
+        .filter(DailySummary.date < day)
+        .order_by(DailySummary.date.desc())
+        .limit(1)
+        .scalar()
+    )
+    return prev or 0
+
+def _summary_written(db, summary):
+    mark_primary_write()
+    trends.record_summary(db, summary.date, summary.total_playtime_minutes)
+    cache.delete_cache("daily-summary-latest")
+    cache.bump_data_version()
+
 def compute_daily_summary():
+    '''
+    Today's summary. Ingest keeps it current (see upsert_daily_summary), it is
+    only computed from the snapshots here when no ingest has written it yet
+    '''
     db = SessionLocal()
     try:
-        now_utc = datetime.now(timezone.utc)
-        today_utc = now_utc.date()
-        tomorrow_utc = today_utc + timedelta(days=1)
+        today_utc = datetime.now(timezone.utc).date()
 
-        # Return existing summary if already exists
         existing_summary = db.query(DailySummary).filter_by(date=today_utc).first()
         if existing_summary:
             return existing_summary
 
-        # Get latest snapshot per game for today
-        todays_snapshots = (
-            db.query(Snapshot)
-            .filter(
-                Snapshot.date >= datetime.combine(today_utc, datetime.min.time(), tzinfo=timezone.utc),
-                Snapshot.date < datetime.combine(tomorrow_utc, datetime.min.time(), tzinfo=timezone.utc)
-            )
-            .order_by(Snapshot.appid, Snapshot.date.desc())
-            .all()
-        )
-
-        if not todays_snapshots:
+        values = _summarize_day(db, today_utc)
+        if not values:
             return None
 
-        # Pick only latest snapshot per game for today
-        latest_today = {}
-        for s in todays_snapshots:
-            if s.appid not in latest_today:
-                latest_today[s.appid] = s
-
-        total_today = 0
-        playtime_by_game = {}
-
-        for appid, snap in latest_today.items():
-            # latest snapshot **before today** for this game
-            prev_snap = (
-                db.query(Snapshot)
-                .filter(Snapshot.appid == appid, Snapshot.date < datetime.combine(today_utc, datetime.min.time(), tzinfo=timezone.utc))
-                .order_by(Snapshot.date.desc())
-                .first()
-            )
-            prev_playtime = prev_snap.playtime_forever if prev_snap else 0
-            delta = snap.playtime_forever - prev_playtime
-            if delta > 0:
-                playtime_by_game[appid] = delta
-                total_today += delta
-
-        if not playtime_by_game:
-            return None  # nothing new played today
-
-        # Most played game today
-        most_played_appid = max(playtime_by_game, key=playtime_by_game.get)
-        most_played_minutes = playtime_by_game[most_played_appid]
-        most_played_game = db.query(Game).filter_by(appid=most_played_appid).first()
-
-        # Compare with yesterday summary if exists
-        yesterday = today_utc - timedelta(days=1)
-        prev_summary = db.query(DailySummary).order_by(DailySummary.date.desc()).first()
-        prev_total = prev_summary.total_playtime_minutes if prev_summary else 0
-        total_change = total_today - prev_total
-
-        summary = DailySummary(
-            date=today_utc,
-            total_playtime_minutes=total_today,
-            total_games_tracked=len(latest_today),
-            most_played_appid=most_played_appid,
-            most_played_name=most_played_game.name if most_played_game else None,
-            most_played_minutes=most_played_minutes,
-            average_playtime_per_game=round(total_today / len(latest_today), 2) if latest_today else 0,
-            total_playtime_change=total_change
-        )
-
+        summary = DailySummary(date=today_utc, **values)
         db.add(summary)
         db.commit()
         db.refresh(summary)
 
-        cache.set_cache("daily-summary-latest", summary, ttl=900)
+        _summary_written(db, summary)
         return summary
 
     except Exception as e:
@@ -94,14 +132,211 @@ def compute_daily_summary():
     finally:
         db.close()
 
+def upsert_daily_summary(db, day: date, minutes: int = 0, games_tracked: int = 0, new_games: int = 0, top=None):
+    '''
+    Apply one ingest's deltas to the day's summary in a single upsert,
+    without rescanning the day's snapshots. Finalized days are left alone.
+    - minutes: playtime added to the day by this ingest
+    - games_tracked: games this ingest saw for the first time that day
+    - new_games: games seen for the first time
+    - top: (appid, name, minutes played that day) of this ingest's most played game
+    Runs inside the caller's transaction.
+    '''
+    prev_total = _previous_total(db, day)
+    top_appid, top_name, top_minutes = top or (None, None, 0)
+
+    table = DailySummary.__table__
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(table).values(
+        date=day,
+        total_playtime_minutes=minutes,
+        new_games_count=new_games,
+        total_games_tracked=games_tracked,
+        average_playtime_per_game=round(minutes / games_tracked, 2) if games_tracked else 0,
+        total_playtime_change=minutes - prev_total,
+        most_played_appid=top_appid,
+        most_played_name=top_name,
+        most_played_minutes=top_minutes,
+        finalized=False
+    )
+
+    current, new = table.c, stmt.excluded
+    total = func.coalesce(current.total_playtime_minutes, 0) + new.total_playtime_minutes
+    tracked = func.coalesce(current.total_games_tracked, 0) + new.total_games_tracked
+    takes_top = new.most_played_minutes > func.coalesce(current.most_played_minutes, 0)
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[current.date],
+        set_={
+            "total_playtime_minutes": total,
+            "new_games_count": func.coalesce(current.new_games_count, 0) + new.new_games_count,
+            "total_games_tracked": tracked,
+            "average_playtime_per_game": case((tracked > 0, func.round(cast(total, Float) / tracked, 2)), else_=0.0),
+            "total_playtime_change": total - prev_total,
+            "most_played_appid": case((takes_top, new.most_played_appid), else_=current.most_played_appid),
+            "most_played_name": case((takes_top, new.most_played_name), else_=current.most_played_name),
+            "most_played_minutes": case((takes_top, new.most_played_minutes), else_=current.most_played_minutes)
+        },
+        where=current.finalized == false()
+    )
+    db.execute(stmt)
+
+def after_summary_upsert(db, day: date):
+    # called by the ingest once its transaction is committed
+    summary = db.query(DailySummary).filter_by(date=day).first()
+    if summary:
+        _summary_written(db, summary)
+    return summary
+
+def finalize_daily_summary(day: Optional[date] = None):
+    '''
+    Nightly step: recompute `day` (default: yesterday, UTC) from the snapshots
+    and seal it so later ingests can't change it anymore
+    '''
+    db = SessionLocal()
+    try:
+        day = day or datetime.now(timezone.utc).date() - timedelta(days=1)
+        values = _summarize_day(db, day)
+        summary = db.query(DailySummary).filter_by(date=day).first()
+
+        if not values and not summary:
+            return None
+        if not values:
+            # incremental row but nothing actually played, keep it as an empty day
+            values = {
+                "total_playtime_minutes": 0, "most_played_appid": None, "most_played_name": None,
+                "most_played_minutes": 0, "average_playtime_per_game": 0,
+                "total_playtime_change": -_previous_total(db, day)
+            }
+        if not summary:
+            summary = DailySummary(date=day)
+            db.add(summary)
+
+        for key, value in values.items():
+            setattr(summary, key, value)
+        summary.finalized = True
+        db.commit()
+        db.refresh(summary)
+
+        _summary_written(db, summary)
+        return summary
+    except Exception as e:
+        db.rollback()
+        print(f"Error finalizing daily summary: {e}")
+    finally:
+        db.close()
+
+# most played game of a day = max(delta * _TOP_KEY - appid): biggest delta, lowest appid on ties
+_TOP_KEY = 1 << 32
+
+def rebuild_daily_summaries(db, start: date, end: date, finalize_before: Optional[date] = None) -> int:
+    '''
+    Recompute every summary from start to end (inclusive) in one pass, same
+    values _summarize_day would give (used after bulk imports, where calling it
+    per day would be thousands of queries). Days before `finalize_before` are
+    sealed. Caller commits. Returns the number of rows written
+    '''
+    if end < start:
+        return 0
+    end_exclusive = datetime.combine(end + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    S = partitions.snapshots(db, end=end_exclusive)
+    day = timeseries.day_column(db, S)
+
+    # per snapshot delta vs the game's previous snapshot, summed per game per day
+    # that is (last snapshot of the day) - (last snapshot before the day)
+    prev = func.lag(S.playtime_forever).over(partition_by=S.appid, order_by=S.date)
+    per_snapshot = (
+        db.query(
+            S.appid.label("appid"),
+            day.label("day"),
+            (S.playtime_forever - func.coalesce(prev, 0)).label("delta"),
+            case((prev.is_(None), 1), else_=0).label("first")
+        )
+        .filter(S.date < end_exclusive)
+        .subquery()
+    )
+    per_game_day = (
+        db.query(
+            per_snapshot.c.appid,
+            per_snapshot.c.day,
+            func.sum(per_snapshot.c.delta).label("delta"),
+            func.max(per_snapshot.c.first).label("new")
+        )
+        .group_by(per_snapshot.c.appid, per_snapshot.c.day)
+        .subquery()
+    )
+    played = per_game_day.c.delta > 0
+    rows = (
+        db.query(
+            per_game_day.c.day,
+            func.sum(case((played, per_game_day.c.delta), else_=0)),
+            func.sum(per_game_day.c.new),
+            func.max(case((played, per_game_day.c.delta * _TOP_KEY - per_game_day.c.appid)))
+        )
+        .group_by(per_game_day.c.day)
+        .order_by(per_game_day.c.day)
+        .all()
+    )
+
+    # games tracked on a day = every game seen by then (first snapshots so far),
+    # so days before start are read too, only for that count
+    per_day = {}
+    known = 0
+    for row_day, total, new_games, top_key in rows:
+        known += new_games
+        if row_day < start or top_key is None:
+            continue  # nothing played that day
+        minutes = -(-top_key // _TOP_KEY)
+        per_day[row_day] = {"total": total, "tracked": known, "new": new_games, "top": (minutes * _TOP_KEY - top_key, minutes)}
+
+    names = dict(db.query(Game.appid, Game.name).all())
+    existing = {s.date: s for s in db.query(DailySummary).filter(DailySummary.date >= start, DailySummary.date <= end).all()}
+    prev_total = _previous_total(db, start)
+    written = 0
+
+    current = start
+    while current <= end:
+        values = per_day.get(current)
+        summary = existing.get(current)
+        if values:
+            if not summary:
+                summary = DailySummary(date=current)
+                db.add(summary)
+            appid, minutes = values["top"]
+            summary.total_playtime_minutes = values["total"]
+            summary.new_games_count = values["new"]
+            summary.total_games_tracked = values["tracked"]
+            summary.most_played_appid = appid
+            summary.most_played_name = names.get(appid)
+            summary.most_played_minutes = minutes
+            summary.average_playtime_per_game = round(values["total"] / values["tracked"], 2)
+            summary.total_playtime_change = values["total"] - prev_total
+        elif summary:
+            # nothing played that day (anymore), keep it as an empty day like finalize does
+            summary.total_playtime_minutes = 0
+            summary.most_played_appid = None
+            summary.most_played_name = None
+            summary.most_played_minutes = 0
+            summary.average_playtime_per_game = 0
+            summary.total_playtime_change = -prev_total
+
+        if summary:
+            summary.finalized = finalize_before is not None and current < finalize_before
+            prev_total = summary.total_playtime_minutes
+            written += 1
+        current += timedelta(days=1)
+
+    db.flush()
+    return written
+
 def get_latest_summary(session=None):
-    db = session or SessionLocal() # fallback to main db
+    db = session or ReadSessionLocal() # fallback to main db
     close_after = False
     if session is None:
         close_after = True # only close if we created it ourselves
     
     # check cache, use different cache key for demo
-    prefix = "demo-" if session else ""
+    prefix = "demo-" if db.info.get("db") == "demo" else ""
     cache_key = f"{prefix}daily-summary-latest"
 
     cached = cache.get_cache(cache_key)
@@ -115,12 +350,12 @@ def get_latest_summary(session=None):
             db.close()
 
 def get_top_games(period: str, page: int = 1, limit: int = 10, session=None, reference_date=None):
-    db = session or SessionLocal()
+    db = session or ReadSessionLocal()
     close_after = False
     if session is None:
         close_after = True
 
-    prefix = "demo-" if session else ""
+    prefix = "demo-" if db.info.get("db") == "demo" else ""
     cache_key = f"{prefix}top_games_{period}_{page}_{limit}"
     
     cached = cache.get_cache(cache_key)
@@ -144,15 +379,43 @@ def get_top_games(period: str, page: int = 1, limit: int = 10, session=None, ref
         else:  # lifetime
             start_date = None
 
-        if start_date:
-            # Get delta playtime in the period
+        store = timeseries.get_store(db) if start_date else None
+        if store:
+            # delta per game from the in-memory series, only the page's names are read
+            deltas = store.period_deltas(start_date.date())
+            total = len(deltas)
+            ranked = sorted(deltas.items(), key=lambda item: (-item[1], item[0]))[skip:skip + limit]
+            games = {
+                g.appid: g for g in
+                db.query(Game.appid, Game.name, Game.img_icon_url).filter(Game.appid.in_([a for a, _ in ranked])).all()
+            }
+            results = [(a, games[a].name, games[a].img_icon_url, delta) for a, delta in ranked if a in games]
+        elif start_date:
+            # Get delta playtime in the period: max - min over the value carried
+            # into it (latest snapshot up to the end of the start day, like the
+            # store) + every snapshot after that
+            bound = datetime.combine(start_date.date() + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+            # one (appid, date) index lookup per game, not a group by over the whole history
+            before = partitions.snapshot_table(db, end=bound)
+            carried_playtime = (
+                select(before.c.playtime_forever)
+                .where(before.c.appid == Game.appid, before.c.date < bound)
+                .order_by(before.c.date.desc())
+                .limit(1)
+                .scalar_subquery()
+            )
+            carried = select(Game.appid.label("appid"), carried_playtime.label("playtime")).subquery()
+            window = partitions.snapshot_table(db, start=bound)
+            points = union_all(
+                select(carried.c.appid, carried.c.playtime).where(carried.c.playtime != None),
+                select(window.c.appid, window.c.playtime_forever).where(window.c.date >= bound)
+            ).subquery()
             subq = (
                 db.query(
-                    Snapshot.appid,
-                    (func.max(Snapshot.playtime_forever) - func.min(Snapshot.playtime_forever)).label("delta_playtime")
+                    points.c.appid,
+                    (func.max(points.c.playtime) - func.min(points.c.playtime)).label("delta_playtime")
                 )
-                .filter(Snapshot.date >= start_date)
-                .group_by(Snapshot.appid)
+                .group_by(points.c.appid)
                 .subquery()
             )
 
@@ -165,14 +428,26 @@ def get_top_games(period: str, page: int = 1, limit: int = 10, session=None, ref
                 .limit(limit)
                 .all()
             )
+        elif has_table(db, GameStats.__tablename__):
+            # Lifetime: read the precomputed ranking, cost doesn't depend on history length
+            total = db.query(func.count(GameStats.id)).scalar()
+            results = (
+                db.query(Game.appid, Game.name, Game.img_icon_url, GameStats.current_playtime)
+                .join(GameStats, GameStats.appid == Game.appid)
+                .order_by(GameStats.lifetime_rank)
+                .offset(skip)
+                .limit(limit)
+                .all()
+            )
         else:
-            # Lifetime: total playtime for each game
+            # Lifetime without game_stats (older db): total playtime for each game
+            S = partitions.snapshots(db)
             subq = (
                 db.query(
-                    Snapshot.appid,
-                    func.max(Snapshot.playtime_forever).label("total_playtime")
+                    S.appid,
+                    func.max(S.playtime_forever).label("total_playtime")
                 )
-                .group_by(Snapshot.appid)
+                .group_by(S.appid)
                 .subquery()
             )
 
@@ -211,86 +486,190 @@ def get_top_games(period: str, page: int = 1, limit: int = 10, session=None, ref
         if close_after:
             db.close()
 
-def get_trends(session=None, reference_date=None):
-    db = session or SessionLocal()
+def library_as_of(as_of: date, page: int = 1, limit: int = 50, session=None):
+    '''
+    The library at the end of `as_of` (UTC): every game seen by then with its
+    cumulative playtime and rank (same order as lifetime_rank). Playtime =
+    latest snapshot at or before that day, read from the time series store or
+    one greatest-per-group query over (appid, date)
+    '''
+    db = session or ReadSessionLocal()
     close_after = False
     if session is None:
         close_after = True
 
-    prefix = "demo-" if session else ""
-    cache_key = f"{prefix}playtime_trends"
-
+    namespace = db_namespace(db) # a replica (may lag) caches apart from the primary
+    version = cache.get_data_version(db.info.get("db", "main"))
+    cache_key = f"{namespace}-library_{as_of.isoformat()}_{page}_{limit}_v{version}"
     cached = cache.get_cache(cache_key)
     if cached:
-        return {"cached": True, "trends": cached}
+        return {"cached": True, **cached}
 
     try:
-        # Use reference_date for demo mode
-        now = reference_date if reference_date else date.today()
-        week_ago = now - timedelta(days=7)
-        two_weeks_ago = now - timedelta(days=14)
-
-        def total_since(start):
-            q = (
-                db.query(func.sum(DailySummary.total_playtime_minutes))
-                .filter(DailySummary.date >= start)
+        store = timeseries.get_store(db)
+        if store:
+            playtimes = store.playtimes_at(as_of)
+        else:
+            bound = datetime.combine(as_of + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+            S = partitions.snapshots(db, end=bound)
+            latest = (
+                db.query(S.appid.label("appid"), func.max(S.date).label("date"))
+                .filter(S.date < bound)
+                .group_by(S.appid)
+                .subquery()
+            )
+            # max() only matters for two snapshots with the same timestamp
+            playtimes = dict(
+                db.query(S.appid, func.max(S.playtime_forever))
+                .join(latest, (S.appid == latest.c.appid) & (S.date == latest.c.date))
+                .group_by(S.appid)
+                .all()
             )
-            return q.scalar() or 0
+        if not playtimes:
+            return None
 
-        this_week = total_since(week_ago)
-        last_week = total_since(two_weeks_ago)
-        change = 0 if last_week == 0 else ((this_week - last_week) / last_week) * 100
+        ranked = sorted(playtimes.items(), key=lambda item: (-item[1], item[0]))
+        skip = (page - 1) * limit
+        page_games = ranked[skip:skip + limit]
+        games = {
+            g.appid: g for g in
+            db.query(Game.appid, Game.name, Game.img_icon_url).filter(Game.appid.in_([a for a, _ in page_games])).all()
+        }
 
-        trends = {
-            "this_week": {"total_playtime": this_week},
-            "last_week": {"total_playtime": last_week},
-            "change_vs_last_week": f"{change:+.1f}%"
+        response = {
+            "as_of": as_of.isoformat(),
+            "total_games": len(ranked),
+            "total_playtime": sum(playtimes.values()),
+            "page": page,
+            "limit": limit,
+            "total_pages": (len(ranked) + limit - 1) // limit,
+            "games": [
+                {
+                    "rank": skip + i + 1,
+                    "appid": appid,
+                    "name": games[appid].name if appid in games else None,
+                    "img_icon_url": games[appid].img_icon_url if appid in games else None,
+                    "playtime_forever": int(playtime)
+                }
+                for i, (appid, playtime) in enumerate(page_games)
+            ]
         }
+        # past days only change on imports, today's keeps moving
+        cache.set_cache(cache_key, response, ttl=86400 if as_of < datetime.now(timezone.utc).date() else 60)
+        return {"cached": False, **response}
+    finally:
+        if close_after:
+            db.close()
+
+def _compute_trends(db, now: date, windows: List[int]) -> dict:
+    # prefix-sum series, each window is O(1)
+    series = trends.get_series(db)
+    week = series.compare(now, 7)
+    return {
+        "this_week": {"total_playtime": week["total_playtime"]},
+        "last_week": {"total_playtime": week["previous_total_playtime"]},
+        "change_vs_last_week": week["change"],
+        "windows": [week if days == 7 else series.compare(now, days) for days in windows]
+    }
+
+def _recompute_trends(windows: List[int]) -> dict:
+    # background refresh of an expired entry, on its own session (never the cache)
+    db = ReadSessionLocal()
+    try:
+        return _compute_trends(db, date.today(), windows)
+    finally:
+        db.close()
+
+def get_trends(session=None, reference_date=None, windows: Optional[List[int]] = None):
+    db = session or ReadSessionLocal()
+    close_after = False
+    if session is None:
+        close_after = True
+
+    windows = windows or trends.DEFAULT_WINDOWS
+    prefix = "demo-" if db.info.get("db") == "demo" else ""
+    cache_key = f"{prefix}playtime_trends_{'-'.join(str(w) for w in windows)}"
+
+    if session is None and reference_date is None:
+        cached, fresh = cache.get_stale(cache_key)
+        if cached and not fresh:
+            # expired: serve it now, recompute in the background
+            cache.revalidate(cache_key, lambda: _recompute_trends(windows), ttl=1800)
+    else:
+        cached = cache.get_cache(cache_key)
+    if cached:
+        if close_after:
+            db.close()
+        return {"cached": True, "trends": cached}
 
-        cache.set_cache(cache_key, trends, ttl=1800) # 30 mins cache
-        return {"cached": False, "trends": trends}
+    try:
+        # Use reference_date for demo mode
+        now = reference_date if reference_date else date.today()
+        result = _compute_trends(db, now, windows)
+        cache.set_cache(cache_key, result, ttl=1800) # 30 mins cache
+        return {"cached": False, "trends": result}
     finally:
         if close_after:
             db.close()
 
+# hot read paths (summary history, heatmap, compare) are Core selects of
+# the needed columns, the rows go straight into the response dicts without
+# ORM entities / identity map. Statements are built once with bound
+# parameters, so SQLAlchemy's compiled cache serves them every call after
+# the first (see scripts/bench_read_paths.py)
+_summaries = DailySummary.__table__.c
+
+@lru_cache(maxsize=None)
+def _summary_history_select(has_start: bool, has_end: bool):
+    stmt = select(
+        _summaries.id, _summaries.new_games_count, _summaries.average_playtime_per_game,
+        _summaries.most_played_appid, _summaries.most_played_minutes, _summaries.date,
+        _summaries.total_playtime_minutes, _summaries.total_games_tracked,
+        _summaries.total_playtime_change, _summaries.most_played_name
+    ).order_by(_summaries.date.desc()).limit(bindparam("limit"))
+    if has_start:
+        stmt = stmt.where(_summaries.date >= bindparam("start_date"))
+    if has_end:
+        stmt = stmt.where(_summaries.date <= bindparam("end_date"))
+    return stmt
+
 def summary_history(
     start_date: Optional[date] = None,
     end_date: Optional[date] = None,
     limit: int = 90,
     session=None
     ):
-    db = session or SessionLocal() # fallback to main db
+    db = session or ReadSessionLocal() # fallback to main db
     close_after = False
     if session is None:
         close_after = True # only close if we created it ourselves
     
     try:
-        query = db.query(DailySummary).order_by(DailySummary.date.desc())
-        if start_date:
-            query = query.filter(DailySummary.date >= start_date)
-        if end_date:
-            query = query.filter(DailySummary.date <= end_date)
-        summaries = query.limit(limit).all()
-
-        # Convert summaries to dictionaries
+        stmt = _summary_history_select(start_date is not None, end_date is not None)
+        rows = db.execute(stmt, {"start_date": start_date, "end_date": end_date, "limit": limit}).all()
+
+        # newest first from the db, oldest first in the response
         return [{
-            'id': s.id,  # Add id
-            'new_games_count': s.new_games_count,  # Add new_games_count
-            'average_playtime_per_game': s.average_playtime_per_game,
-            'most_played_appid': s.most_played_appid,
-            'most_played_minutes': s.most_played_minutes,
-            'date': s.date.isoformat(),  # Ensure date is formatted as a string
-            'total_playtime_minutes': s.total_playtime_minutes,
-            'total_games_tracked': s.total_games_tracked,
-            'total_playtime_change': s.total_playtime_change,
-            'most_played_name': s.most_played_name
-        } for s in reversed(summaries)]
+            'id': id,
+            'new_games_count': new_games_count,
+            'average_playtime_per_game': average_playtime,
+            'most_played_appid': most_played_appid,
+            'most_played_minutes': most_played_minutes,
+            'date': day.isoformat(),
+            'total_playtime_minutes': total_playtime,
+            'total_games_tracked': games_tracked,
+            'total_playtime_change': playtime_change,
+            'most_played_name': most_played_name
+        } for (
+            id, new_games_count, average_playtime, most_played_appid, most_played_minutes,
+            day, total_playtime, games_tracked, playtime_change, most_played_name
+        ) in reversed(rows)]
     finally:
         if close_after:
             db.close()
 
 def get_streaks(appid: Optional[int] = None, session=None):
-    db = session or SessionLocal()
+    db = session or ReadSessionLocal()
     close_after = False
     if session is None:
         close_after = True
@@ -302,20 +681,44 @@ def get_streaks(appid: Optional[int] = None, session=None):
         current_streak = 0
         temp_streak = 0
 
-        for s in summaries:
+        # per game: playtime went up that day, one vectorized lookup in the series store
+        store = timeseries.get_store(db) if appid else None
+        played_days = store.played_on(appid, [s.date for s in summaries]) if store else None
+        previous = 0
+        if appid and played_days is None and summaries:
+            # playtime carried into the first day, compared against like any other day
+            first_day = datetime.combine(summaries[0].date, datetime.min.time(), tzinfo=timezone.utc)
+            before = partitions.snapshots(db, end=first_day)
+            previous = (
+                db.query(before.playtime_forever)
+                .filter(before.appid == appid, before.date < first_day)
+                .order_by(before.date.desc())
+                .limit(1)
+                .scalar()
+            ) or 0
+
+        for i, s in enumerate(summaries):
             # if appid is provided, check playtime delta for that game
             played = True
-            if appid:
-                # find snapshot for that day
-                snap = (
-                    db.query(Snapshot)
-                    .filter(Snapshot.appid == appid)
-                    .filter(Snapshot.date >= datetime.combine(s.date, datetime.min.time(), tzinfo=timezone.utc))
-                    .filter(Snapshot.date < datetime.combine(s.date + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc))
-                    .order_by(Snapshot.date.desc())
-                    .first()
+            if played_days is not None:
+                played = played_days[i]
+            elif appid:
+                # find snapshot for that day (none: nothing changed)
+                day_start = datetime.combine(s.date, datetime.min.time(), tzinfo=timezone.utc)
+                day_end = datetime.combine(s.date + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+                S = partitions.snapshots(db, day_start, day_end)
+                playtime = (
+                    db.query(S.playtime_forever)
+                    .filter(S.appid == appid)
+                    .filter(S.date >= day_start)
+                    .filter(S.date < day_end)
+                    .order_by(S.date.desc())
+                    .limit(1)
+                    .scalar()
                 )
-                played = snap.playtime_forever > 0 if snap else False
+                played = playtime is not None and playtime > previous
+                if playtime is not None:
+                    previous = playtime
             else:
                 # overall streak, any game played today?
                 played = s.total_playtime_minutes > 0
@@ -333,8 +736,38 @@ def get_streaks(appid: Optional[int] = None, session=None):
         if close_after:
             db.close()
 
-def compare_games(appids: List[int], start_date: Optional[date] = None, end_date: Optional[date] = None, session=None, reference_date=None):
-    db = session or SessionLocal()
+def _snapshot_range_select(S):
+    # S: the snapshots table or a partition union, the plain table's select is built once
+    if S is Snapshot.__table__:
+        return _SNAPSHOT_RANGE
+    return _build_snapshot_range_select(S)
+
+def _build_snapshot_range_select(S):
+    return (
+        select(S.c.date, S.c.playtime_forever)
+        .where(S.c.appid == bindparam("appid"), S.c.date >= bindparam("range_start"), S.c.date < bindparam("range_end"))
+        .order_by(S.c.date)
+    )
+
+def _snapshot_before_select(S):
+    # latest playtime before the range, the value carried into it
+    if S is Snapshot.__table__:
+        return _SNAPSHOT_BEFORE
+    return _build_snapshot_before_select(S)
+
+def _build_snapshot_before_select(S):
+    return (
+        select(S.c.playtime_forever)
+        .where(S.c.appid == bindparam("appid"), S.c.date < bindparam("range_start"))
+        .order_by(S.c.date.desc())
+        .limit(1)
+    )
+
+_SNAPSHOT_RANGE = _build_snapshot_range_select(Snapshot.__table__)
+_SNAPSHOT_BEFORE = _build_snapshot_before_select(Snapshot.__table__)
+
+def compare_games(appids: List[int], start_date: Optional[date] = None, end_date: Optional[date] = None, session=None, reference_date=None, resolution: str = "day", max_points: Optional[int] = None):
+    db = session or ReadSessionLocal()
     close_after = False
     if session is None:
         close_after = True
@@ -350,49 +783,54 @@ def compare_games(appids: List[int], start_date: Optional[date] = None, end_date
         if not end_date:
             end_date = today
 
-        all_dates = [
-            start_date + timedelta(days=i)
-            for i in range((end_date - start_date).days + 1)
-        ]
+        days = (end_date - start_date).days + 1
+        if days <= 0:
+            return {appid: [] for appid in appids}
 
         result = {}
+        store = timeseries.get_store(db)
         for appid in appids:
-            # fetch snapshots for this game within the range
-            snaps = (
-                db.query(Snapshot)
-                .filter(Snapshot.appid == appid)
-                .filter(Snapshot.date >= datetime.combine(start_date, datetime.min.time(), tzinfo=timezone.utc))
-                .filter(Snapshot.date < datetime.combine(end_date + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc))
-                .order_by(Snapshot.date)
-                .all()
-            )
-
-            # map date -> playtime
-            snap_map = {}
-            for snap in snaps:
-                snap_map[snap.date.date()] = snap.playtime_forever
-
-            daily_data = []
-            last_playtime = 0
-            for d in all_dates:
-                current_playtime = snap_map.get(d, last_playtime)
-                delta = max(current_playtime - last_playtime, 0)
-                daily_data.append({
-                    "date": d.isoformat(),
-                    "playtime_forever": current_playtime,
-                    "daily_delta": delta
-                })
-                last_playtime = current_playtime
-
-            result[appid] = daily_data
+            if store:
+                # carried forward from before the range, so the first day's delta is a real delta
+                playtime = store.daily(appid, start_date - timedelta(days=1), days + 1)
+                playtime, deltas = playtime[1:], np.maximum(np.diff(playtime), 0)
+            else:
+                # fetch snapshots for this game within the range
+                range_start = datetime.combine(start_date, datetime.min.time(), tzinfo=timezone.utc)
+                range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+                params = {"appid": appid, "range_start": range_start, "range_end": range_end}
+                snaps = db.execute(_snapshot_range_select(partitions.snapshot_table(db, range_start, range_end)), params)
+                carried = db.execute(_snapshot_before_select(partitions.snapshot_table(db, end=range_start)), params).scalar()
+
+                # map date -> playtime, the carried value sits on the day before the range
+                # (same as the store: the first day's delta is a real delta)
+                day_before = start_date - timedelta(days=1)
+                snap_map = {} if carried is None else {day_before: carried}
+                snap_map.update((snap_date.date(), playtime) for snap_date, playtime in snaps)
+                playtime, deltas = series.daily_series(day_before, days + 1, snap_map)
+                playtime, deltas = playtime[1:], deltas[1:]
+
+            # dense daily arrays, then bucketed down to the requested resolution / point count
+            dates, playtime, deltas = series.aggregate_daily(start_date, playtime, deltas, resolution, max_points)
+
+            result[appid] = [
+                {"date": d.isoformat(), "playtime_forever": p, "daily_delta": delta}
+                for d, p, delta in zip(dates, playtime.tolist(), deltas.tolist())
+            ]
 
         return result
     finally:
         if close_after:
             db.close()
 
+_HEATMAP = (
+    select(_summaries.date, _summaries.total_playtime_minutes, _summaries.total_games_tracked)
+    .where(_summaries.date >= bindparam("start_date"))
+    .order_by(_summaries.date)
+)
+
 def activity_heatmap(limit_days: int = 90, session=None, reference_date=None):
-    db = session or SessionLocal()
+    db = session or ReadSessionLocal()
     close_after = False
     if session is None:
         close_after = True
@@ -401,22 +839,45 @@ def activity_heatmap(limit_days: int = 90, session=None, reference_date=None):
     today = reference_date if reference_date else date.today()
     start_date = today - timedelta(days=limit_days)
     try:
-        # get summaries
-        summaries = (
-            db.query(DailySummary)
-            .filter(DailySummary.date >= start_date)
-            .order_by(DailySummary.date)
+        rows = db.execute(_HEATMAP, {"start_date": start_date})
+        return [
+            {"date": day.isoformat(), "total_playtime": total_playtime, "games_played": games_played}
+            for day, total_playtime, games_played in rows
+        ]
+    finally:
+        if close_after:
+            db.close()
+
+def playtime_by_genre(session=None):
+    db = session or ReadSessionLocal()
+    close_after = False
+    if session is None:
+        close_after = True
+
+    try:
+        # filled in the background by services/metadata.py, older dbs don't have it
+        if not has_table(db, GameGenre.__tablename__) or not has_table(db, GameStats.__tablename__):
+            return None
+
+        playtime = func.coalesce(func.sum(GameStats.current_playtime), 0)
+        rows = (
+            db.query(GameGenre.genre, func.count(GameGenre.appid), playtime)
+            .outerjoin(GameStats, GameStats.appid == GameGenre.appid)
+            .group_by(GameGenre.genre)
+            .order_by(playtime.desc(), GameGenre.genre)
             .all()
         )
-        heatmap = [
-            {
-                "date": s.date.isoformat(),
-                "total_playtime": s.total_playtime_minutes,
-                "games_played": s.total_games_tracked
-            }
-            for s in summaries
-        ]
-        return heatmap
+        # games can have several genres, so the totals overlap
+        without_metadata = (
+            db.query(func.count(Game.id))
+            .outerjoin(GameMetadata, GameMetadata.appid == Game.appid)
+            .filter(GameMetadata.fetched_at == None)
+            .scalar()
+        )
+        return {
+            "genres": [{"genre": genre, "games": games, "total_playtime": int(total)} for genre, games, total in rows],
+            "games_without_metadata": without_metadata
+        }
     finally:
         if close_after:
-            db.close()
\ No newline at end of file
+            db.close()
@@ -0,0 +1,206 @@
+# /backend/app/services/batch.py
+from datetime import date, datetime, timezone
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
+from backend.app import profiling
+from backend.app.services import analytics, coplay, forecast, games, heatmap, series, trends
+from backend.app.services.bundle import bundle_key
+
+'''
+Batch analytics: several dashboard sub-queries in one request.
+
+- identical sub-queries (same name + params) are only run once
+- sub-queries with a precomputed response (bundle / demo preload) are answered
+  straight from memory
+- everything else runs off the event loop in one worker thread sharing a
+  single session, i.e. one connection and one read snapshot
+  (a session can't be used from several threads, so they run back to back)
+- every item gets its own status, one failing sub-query doesn't fail the batch
+'''
+
+MAX_BATCH_SIZE = 20
+
+class BatchQuery(BaseModel):
+    id: Optional[str] = None
+    name: str
+    params: Dict[str, Any] = {}
+
+class BatchRequest(BaseModel):
+    queries: List[BatchQuery] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+class BatchItemError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+
+def _int(params, name, default, low=None, high=None):
+    value = params.get(name, default)
+    if value is None:
+        return None
+    value = int(value)
+    if (low is not None and value < low) or (high is not None and value > high):
+        raise ValueError(f"{name} must be between {low} and {high}")
+    return value
+
+def _date(params, name):
+    value = params.get(name)
+    return date.fromisoformat(value) if value else None
+
+def _windows(params):
+    value = params.get("windows")
+    if isinstance(value, list):
+        value = ",".join(str(v) for v in value)
+    return tuple(trends.parse_windows(value))
+
+def _resolution(params):
+    resolution = params.get("resolution", "day")
+    if resolution not in series.RESOLUTIONS:
+        raise ValueError("resolution must be one of " + ", ".join(series.RESOLUTIONS))
+    return resolution
+
+def _period(params):
+    period = params.get("period", "lifetime")
+    if period not in ("week", "month", "lifetime"):
+        raise ValueError("period must be one of week, month, lifetime")
+    return period
+
+def _metric(params):
+    metric = params.get("metric", "together")
+    if metric not in coplay.METRICS:
+        raise ValueError("metric must be one of " + ", ".join(coplay.METRICS))
+    return metric
+
+# name -> (parse params into args, compute(db, args, reference_date))
+# args (name first) double as the bundle key of the matching endpoint
+QUERIES = {
+    "summary_latest": (
+        lambda p: ("summary_latest",),
+        lambda db, a, ref: analytics.get_latest_summary(session=db)
+    ),
+    "summary_history": (
+        lambda p: ("summary_history", _date(p, "start_date"), _date(p, "end_date"), _int(p, "limit", 90, 1, 3650)),
+        lambda db, a, ref: analytics.summary_history(a[1], a[2], a[3], session=db)
+    ),
+    "top_games": (
+        lambda p: ("top_games", _period(p), _int(p, "page", 1, 1), _int(p, "limit", 10, 1, 100)),
+        lambda db, a, ref: analytics.get_top_games(a[1], a[2], a[3], db, reference_date=ref)
+    ),
+    "library": (
+        lambda p: ("library", _date(p, "as_of"), _int(p, "page", 1, 1), _int(p, "limit", 50, 1, 500)),
+        lambda db, a, ref: analytics.library_as_of(a[1] or ref or datetime.now(timezone.utc).date(), a[2], a[3], db)
+    ),
+    "trends": (
+        lambda p: ("trends", *_windows(p)),
+        lambda db, a, ref: analytics.get_trends(db, reference_date=ref, windows=list(a[1:]))
+    ),
+    "streaks": (
+        lambda p: ("streaks", _int(p, "appid", None)),
+        lambda db, a, ref: analytics.get_streaks(a[1], db)
+    ),
+    "heatmap": (
+        lambda p: ("heatmap", _int(p, "limit_days", 90, 1, 3650)),
+        lambda db, a, ref: analytics.activity_heatmap(a[1], db, reference_date=ref)
+    ),
+    "calendar": (
+        lambda p: ("calendar", _int(p, "years", 1, 1, heatmap.MAX_YEARS), _int(p, "top", 0, 0, heatmap.MAX_TOP_GAMES)),
+        lambda db, a, ref: heatmap.activity_calendar(a[1], a[2], db, reference_date=ref)
+    ),
+    "compare": (
+        lambda p: ("compare", tuple(int(x) for x in p["appids"]), _date(p, "start_date"), _date(p, "end_date"),
+                   _resolution(p), _int(p, "max_points", None, series.MIN_POINTS, series.MAX_POINTS)),
+        lambda db, a, ref: analytics.compare_games(list(a[1]), a[2], a[3], db, reference_date=ref, resolution=a[4], max_points=a[5])
+    ),
+    "game": (
+        lambda p: ("game", int(p["appid"]), _int(p, "days", 30, 1, 3650), _resolution(p), _int(p, "max_points", None, series.MIN_POINTS, series.MAX_POINTS)),
+        lambda db, a, ref: games.game_details(a[1], a[2], db, reference_date=ref, resolution=a[3], max_points=a[4])
+    ),
+    "related": (
+        lambda p: ("related", int(p["appid"]), _int(p, "days", coplay.DEFAULT_DAYS, 7, coplay.MAX_DAYS), _int(p, "limit", 10, 1, 100)),
+        lambda db, a, ref: coplay.related_games(a[1], a[2], a[3], db, reference_date=ref)
+    ),
+    "pairs": (
+        lambda p: ("pairs", _metric(p), _int(p, "days", coplay.DEFAULT_DAYS, 7, coplay.MAX_DAYS), _int(p, "limit", 20, 1, 100)),
+        lambda db, a, ref: coplay.top_pairs(a[1], a[2], a[3], db, reference_date=ref)
+    ),
+    "forecast": (
+        lambda p: ("forecast", _int(p, "appid", None), _int(p, "limit", 10, 1, 100)),
+        lambda db, a, ref: forecast.get_forecast(a[1], a[2], db)
+    ),
+    "search": (
+        lambda p: ("search", str(p["q"])),
+        lambda db, a, ref: games.search_games(a[1], db)
+    ),
+}
+
+def _check(result):
+    # same "nothing to show" rule the single endpoints use
+    if not result:
+        raise BatchItemError(404, "No data available.")
+    if isinstance(result, dict) and "error" in result:
+        raise BatchItemError(404, result["error"])
+    return result
+
+def _run_pending(pending, session_factory, reference_date):
+    db = session_factory()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            # one snapshot for every sub-query of the batch
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+        results = {}
+        for key, (name, args) in pending.items():
+            try:
+                results[key] = (200, jsonable_encoder(_check(QUERIES[name][1](db, args, reference_date))))
+            except BatchItemError as e:
+                results[key] = (e.status_code, e.detail)
+            except Exception as e:
+                db.rollback()
+                results[key] = (500, f"{name} failed: {e}")
+        return results
+    finally:
+        db.close()
+
+async def run_batch(queries: List[BatchQuery], session_factory, lookup=None, reference_date=None):
+    '''
+    session_factory: opens the session shared by the sub-queries
+    lookup: bundle key -> precomputed response (or None)
+    '''
+    items = []     # (id, name, key or None, error)
+    unique = {}    # key -> (name, args)
+    for i, query in enumerate(queries):
+        item_id = query.id or str(i)
+        if query.name not in QUERIES:
+            items.append((item_id, query.name, None, (422, f"Unknown query '{query.name}'")))
+            continue
+        try:
+            args = QUERIES[query.name][0](query.params)
+        except (KeyError, TypeError, ValueError) as e:
+            items.append((item_id, query.name, None, (422, f"Invalid params: {e}")))
+            continue
+        key = bundle_key(*args)
+        unique.setdefault(key, (query.name, args))
+        items.append((item_id, query.name, key, None))
+
+    results = {}
+    pending = {}
+    for key, (name, args) in unique.items():
+        precomputed = lookup(key) if lookup else None
+        if precomputed is not None:
+            results[key] = (200, precomputed)
+        else:
+            pending[key] = (name, args)
+
+    if pending:
+        results.update(await profiling.to_thread(_run_pending, pending, session_factory, reference_date))
+
+    response = []
+    for item_id, name, key, error in items:
+        status, body = error if error else results[key]
+        entry = {"id": item_id, "name": name, "status": status}
+        if status == 200:
+            entry["data"] = body
+        else:
+            entry["error"] = body
+        response.append(entry)
+
+    return {"results": response, "unique_queries": len(unique), "computed": len(pending)}
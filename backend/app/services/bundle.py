@@ -0,0 +1,127 @@
+# /backend/app/services/bundle.py
+import json
+import threading
+import time
+from datetime import datetime, timezone
+from fastapi.encoders import jsonable_encoder
+from backend.app import tracing
+from backend.app.db.database import SessionLocal
+from backend.app.db.models import AnalyticsBundle
+from backend.app.services import analytics, cache, forecast, heatmap, trends
+
+'''
+Write-time materialized analytics.
+
+Data only changes on ingest (or when a summary is generated), so right after
+that the standard dashboard responses (default parameters) are rendered once
+into a versioned JSON bundle stored in the analytics_bundles table. The
+analytics routes serve those from memory and only compute live for
+non-default parameters, or when no recent bundle exists.
+
+Every worker keeps the latest bundle in memory and checks for a newer version
+at most every BUNDLE_CHECK_INTERVAL seconds. A newer version built elsewhere
+(another worker's ingest, the import CLI) also drops this worker's caches.
+'''
+
+BUNDLE_CHECK_INTERVAL = 10      # seconds between "is there a newer bundle" checks
+BUNDLE_MAX_AGE = 6 * 3600       # older bundles are ignored (week/month windows move with time)
+BUNDLES_KEPT = 3
+
+def bundle_key(*parts) -> str:
+    return ":".join("" if p is None else str(p) for p in parts)
+
+def standard_responses(session, reference_date=None) -> dict:
+    '''
+    The responses every dashboard load asks for, keyed by bundle_key(...)
+    Shared by the bundle builder and the demo preload
+    '''
+    responses = {
+        bundle_key("summary_latest"): analytics.get_latest_summary(session=session),
+        bundle_key("summary_history", None, None, 90): analytics.summary_history(None, None, 90, session=session),
+        bundle_key("trends", *trends.DEFAULT_WINDOWS): analytics.get_trends(session, reference_date=reference_date),
+        bundle_key("streaks", None): analytics.get_streaks(None, session),
+        bundle_key("heatmap", 90): analytics.activity_heatmap(90, session, reference_date=reference_date),
+        bundle_key("calendar", 1, 0): heatmap.activity_calendar(1, 0, session, reference_date=reference_date),
+        bundle_key("forecast", None, 10): forecast.get_forecast(None, 10, session)
+    }
+    for period in ["week", "month", "lifetime"]:
+        responses[bundle_key("top_games", period, 1, 10)] = analytics.get_top_games(period, 1, 10, session, reference_date=reference_date)
+
+    # plain json so nothing holds on to the session
+    return {key: jsonable_encoder(value) for key, value in responses.items()}
+
+_current = {"version": 0, "created_at": 0.0, "responses": {}, "checked_at": 0.0}
+_lock = threading.Lock()
+
+def build_bundle():
+    '''Post-ingest stage: render the standard responses into a new bundle version'''
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        responses = standard_responses(db)
+
+        latest = db.query(AnalyticsBundle).order_by(AnalyticsBundle.version.desc()).first()
+        version = (latest.version if latest else 0) + 1
+        created_at = datetime.now(timezone.utc)
+        db.add(AnalyticsBundle(version=version, created_at=created_at, payload=json.dumps(responses)))
+
+        # only a few recent versions are kept
+        db.query(AnalyticsBundle).filter(AnalyticsBundle.version <= version - BUNDLES_KEPT).delete()
+        db.commit()
+
+        with _lock:
+            _current.update(version=version, created_at=created_at.timestamp(), responses=responses, checked_at=time.time())
+        print(f"Built analytics bundle v{version} ({len(responses)} responses, {(time.perf_counter() - started) * 1000:.1f} ms)")
+        return version
+    except Exception as e:
+        db.rollback()
+        print(f"Error building analytics bundle: {e}")
+        return None
+    finally:
+        db.close()
+
+def _refresh():
+    db = SessionLocal()
+    try:
+        latest_version = db.query(AnalyticsBundle.version).order_by(AnalyticsBundle.version.desc()).limit(1).scalar()
+        if latest_version and latest_version > _current["version"]:
+            row = db.query(AnalyticsBundle).filter_by(version=latest_version).first()
+            created_at = row.created_at.replace(tzinfo=timezone.utc) if row.created_at.tzinfo is None else row.created_at
+            had_bundle = _current["version"] > 0
+            _current.update(version=row.version, created_at=created_at.timestamp(), responses=json.loads(row.payload))
+            if had_bundle:
+                # data changed since this worker last looked
+                cache.delete_cache("daily-summary-latest")
+                cache.delete_prefix("top_games_")
+                cache.delete_prefix("playtime_trends")
+                cache.bump_data_version()
+    except Exception as e:
+        print(f"Error loading analytics bundle: {e}")
+    finally:
+        _current["checked_at"] = time.time()
+        db.close()
+
+def get_response(key: str):
+    now = time.time()
+    if now - _current["checked_at"] >= BUNDLE_CHECK_INTERVAL:
+        with _lock:
+            if now - _current["checked_at"] >= BUNDLE_CHECK_INTERVAL:
+                _refresh()
+    if now - _current["created_at"] > BUNDLE_MAX_AGE:
+        return None
+    return _current["responses"].get(key)
+
+def serve(key: str, compute):
+    '''Bundle response for key when there is one, live computation otherwise'''
+    with tracing.span("cache.get", op="cache", layer="bundle", key=key) as span:
+        response = get_response(key)
+        cache.count("bundle", response is not None)
+        span.set("hit", response is not None)
+    if response is not None:
+        return response
+    return compute()
+
+def current_version() -> int:
+    '''Latest bundle version (checked against the db at most every BUNDLE_CHECK_INTERVAL)'''
+    get_response(bundle_key("summary_latest"))
+    return _current["version"]
@@ -1,20 +1,237 @@
 # /backend/app/services/cache.py
+import asyncio
+import json
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+from backend.app import tracing
+
+'''
+Small in-process TTL cache.
+
+Entries stay around for STALE_GRACE seconds past their expiry: get_cache()
+ignores them, but get_or_revalidate() / aget_or_revalidate() serve them right
+away and refresh the key in the background (stale-while-revalidate).
+
+The host sleeps when idle, so the cache is snapshotted to CACHE_SNAPSHOT_PATH
+(JSON, expiries are absolute timestamps) periodically and on shutdown, and
+loaded again on startup (see main.py). Values that aren't JSON are skipped.
+
+Lookups are counted per layer (this cache, the analytics bundle, the demo's
+precomputed responses) for stats(), e.g. the load test's hit ratio.
+'''
+
+load_dotenv()
+
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", "./cache_snapshot.json")
+CACHE_SNAPSHOT_INTERVAL = int(os.getenv("CACHE_SNAPSHOT_INTERVAL", "300")) # seconds
+STALE_GRACE = int(os.getenv("CACHE_STALE_GRACE", "86400")) # seconds an expired entry may still be served
+
+# keys that don't depend on our own data, kept even if the data changed while we were down
+DATA_INDEPENDENT = ("steam-profile",)
 
 _cache = {}
 
+# layer -> [hits, stale hits, misses], per process
+_stats = {}
+
+def count(layer: str, hit: bool, stale: bool = False):
+    counters = _stats.setdefault(layer, [0, 0, 0])
+    counters[0 if hit and not stale else 1 if hit else 2] += 1
+
+def stats() -> dict:
+    '''Lookup counts and hit ratio (stale hits count as hits) per layer and overall'''
+    layers = {}
+    for layer, (hits, stale_hits, misses) in list(_stats.items()):
+        total = hits + stale_hits + misses
+        layers[layer] = {
+            "hits": hits,
+            "stale_hits": stale_hits,
+            "misses": misses,
+            "hit_ratio": round((hits + stale_hits) / total, 4) if total else None
+        }
+    lookups = sum(l["hits"] + l["stale_hits"] + l["misses"] for l in layers.values())
+    hits = sum(l["hits"] + l["stale_hits"] for l in layers.values())
+    return {"hit_ratio": round(hits / lookups, 4) if lookups else None, "lookups": lookups, "entries": len(_cache), "layers": layers}
+
 def set_cache(key, value, ttl=3600):
     _cache[key] = {"value": value, "expires": time.time() + ttl}
 
 def get_cache(key):
-    data = _cache.get(key)
-    if not data:
-        return None
-    if time.time() > data["expires"]:
-        del _cache[key]
-        return None
-    return data["value"]
+    with tracing.span("cache.get", op="cache", layer="cache", key=key) as span:
+        data = _cache.get(key)
+        if not data:
+            count("cache", False)
+            span.set("hit", False)
+            return None
+        if time.time() > data["expires"]:
+            if time.time() > data["expires"] + STALE_GRACE:
+                _cache.pop(key, None)
+            count("cache", False)
+            span.set("hit", False)
+            return None
+        count("cache", True)
+        span.set("hit", True)
+        return data["value"]
+
+def get_stale(key):
+    '''(value, fresh) even for an expired entry still in its grace period, (None, False) when missing'''
+    with tracing.span("cache.get", op="cache", layer="cache", key=key) as span:
+        data = _cache.get(key)
+        if not data or time.time() > data["expires"] + STALE_GRACE:
+            count("cache", False)
+            span.set("hit", False)
+            return None, False
+        fresh = time.time() <= data["expires"]
+        count("cache", True, stale=not fresh)
+        span.set("hit", True)
+        span.set("stale", not fresh)
+        return data["value"], fresh
 
 def delete_cache(key):
     if key in _cache:
-        del _cache[key]
\ No newline at end of file
+        del _cache[key]
+
+def delete_prefix(prefix):
+    # drop every key starting with prefix (keys are often suffixed with query params)
+    for key in [k for k in _cache if k.startswith(prefix)]:
+        del _cache[key]
+
+
+# stale-while-revalidate, at most one refresh per key in flight
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+_refresher = ThreadPoolExecutor(max_workers=2, thread_name_prefix="cache-refresh")
+
+def _claim(key) -> bool:
+    with _refreshing_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+        return True
+
+def _release(key):
+    with _refreshing_lock:
+        _refreshing.discard(key)
+
+def _refresh(key, compute, ttl):
+    try:
+        value = compute()
+        if value is not None:
+            set_cache(key, value, ttl)
+    except Exception as e:
+        print(f"Error refreshing cache key {key}: {e}")
+    finally:
+        _release(key)
+
+def revalidate(key, compute, ttl=3600):
+    '''
+    Recompute key with compute() (blocking) on a background thread, unless
+    that is already happening. compute must not use a caller's (request
+    scoped) session.
+    '''
+    if _claim(key):
+        _refresher.submit(_refresh, key, compute, ttl)
+
+def get_or_revalidate(key, compute, ttl=3600):
+    '''
+    (value, cached) for key, compute() fills it when missing. An expired
+    value is returned as is while it is recomputed in the background.
+    '''
+    value, fresh = get_stale(key)
+    if value is not None:
+        if not fresh:
+            revalidate(key, compute, ttl)
+        return value, True
+    value = compute()
+    if value is not None:
+        set_cache(key, value, ttl)
+    return value, False
+
+async def _arefresh(key, compute, ttl):
+    try:
+        value = await compute()
+        if value is not None:
+            set_cache(key, value, ttl)
+    except Exception as e:
+        print(f"Error refreshing cache key {key}: {e}")
+    finally:
+        _release(key)
+
+async def aget_or_revalidate(key, compute, ttl=3600):
+    '''get_or_revalidate for an async compute(), refreshed in a background task'''
+    value, fresh = get_stale(key)
+    if value is not None:
+        if not fresh and _claim(key):
+            asyncio.get_running_loop().create_task(_arefresh(key, compute, ttl))
+        return value, True
+    value = await compute()
+    if value is not None:
+        set_cache(key, value, ttl)
+    return value, False
+
+
+# bumped whenever the underlying data changes (ingest, new summary),
+# cache keys that include it never serve results from older data
+_data_versions = {}
+
+def get_data_version(namespace="main"):
+    return _data_versions.get(namespace, 0)
+
+def bump_data_version(namespace="main"):
+    _data_versions[namespace] = _data_versions.get(namespace, 0) + 1
+    return _data_versions[namespace]
+
+
+def save_snapshot(tag=None, path: str = CACHE_SNAPSHOT_PATH) -> int:
+    '''
+    Write the live entries (+ data versions) to disk, returns how many.
+    tag: what the data looked like (bundle version), checked on load
+    '''
+    now = time.time()
+    entries = {}
+    for key, data in list(_cache.items()):
+        if now > data["expires"] + STALE_GRACE:
+            continue
+        try:
+            entries[key] = json.loads(json.dumps(data))
+        except (TypeError, ValueError):
+            continue
+
+    # written next to the target and swapped in, a crash never leaves half a file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"saved_at": now, "tag": tag, "data_versions": _data_versions, "entries": entries}, f)
+    os.replace(tmp_path, path)
+    return len(entries)
+
+def load_snapshot(tag=None, path: str = CACHE_SNAPSHOT_PATH) -> int:
+    '''
+    Load a snapshot written by save_snapshot, returns how many entries came back.
+    When the tag differs the data changed in between, only DATA_INDEPENDENT keys are kept.
+    '''
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring unreadable cache snapshot {path}: {e}")
+        return 0
+
+    same_data = snapshot.get("tag") == tag
+    now = time.time()
+    loaded = 0
+    for key, data in snapshot.get("entries", {}).items():
+        if not same_data and not key.startswith(DATA_INDEPENDENT):
+            continue
+        if now > data["expires"] + STALE_GRACE or key in _cache:
+            continue
+        _cache[key] = data
+        loaded += 1
+    if same_data:
+        for namespace, version in snapshot.get("data_versions", {}).items():
+            _data_versions[namespace] = max(_data_versions.get(namespace, 0), version)
+    return loaded
@@ -0,0 +1,233 @@
+# /backend/app/services/coplay.py
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+import numpy as np
+from backend.app.db.database import ReadSessionLocal, db_namespace
+from backend.app.db.models import Game
+from backend.app.services import cache, timeseries
+
+'''
+Which games get played on the same days, and which ones replace each other.
+
+Per game per day minutes played (only the days playtime went up) come from
+the in-memory time series store (one query over the snapshots of the window
+when it is disabled), numpy builds a day x game matrix from them:
+- together: days both games were played (B.T @ B on the played/not played
+  matrix) and the jaccard index of their played days
+- correlation: pearson correlation of the games' weekly minutes. Strongly
+  negative = one took over when the other stopped (replaced)
+
+Only games with at least MIN_ACTIVE_DAYS played days in the window take part,
+at most MAX_GAMES of them (most played days first) so the game x game
+matrices stay a few MB (2000 games = 16 MB each). The matrices are built once
+per database / window / data version (the last MATRICES_KEPT are kept), the
+endpoint responses are cached on top.
+'''
+
+DEFAULT_DAYS = 365
+MAX_DAYS = 3650
+MIN_ACTIVE_DAYS = 3
+MAX_GAMES = 2000
+MIN_WEEKS = 4            # fewer weeks than this => no correlation
+REPLACED_BELOW = -0.2    # correlation below this counts as "replaced"
+MATRICES_KEPT = 4        # windows kept in memory, across databases
+METRICS = ["together", "correlated", "replaced"]
+
+class CoPlayMatrix:
+    def __init__(self, start: date, end: date, appids, minutes):
+        # minutes: days x games (float32), column i = appids[i]
+        self.start = start
+        self.end = end
+        self.appids = appids
+        self.column = {appid: i for i, appid in enumerate(appids)}
+
+        played = (minutes > 0).astype(np.float32)
+        self.active_days = played.sum(axis=0).astype(np.int64)
+        self.together = (played.T @ played).astype(np.int32)
+        union = self.active_days[:, None] + self.active_days[None, :] - self.together
+        self.jaccard = np.divide(self.together, union, out=np.zeros(self.together.shape, dtype=np.float32), where=union > 0)
+
+        # weeks end on `end`, the incomplete first week is dropped
+        weeks = minutes.shape[0] // 7
+        self.weeks = weeks
+        self.correlation = None
+        if weeks >= MIN_WEEKS:
+            weekly = minutes[minutes.shape[0] - weeks * 7:].reshape(weeks, 7, -1).sum(axis=1)
+            centered = weekly - weekly.mean(axis=0)
+            norms = np.sqrt((centered ** 2).sum(axis=0))
+            z = np.divide(centered, norms, out=np.zeros_like(centered), where=norms > 0)
+            self.correlation = np.clip(z.T @ z, -1.0, 1.0)
+
+    def pair(self, i: int, j: int) -> dict:
+        return {
+            "days_together": int(self.together[i, j]),
+            "jaccard": round(float(self.jaccard[i, j]), 3),
+            "correlation": round(float(self.correlation[i, j]), 3) if self.correlation is not None else None
+        }
+
+def _load(db, start: date, end: date):
+    '''
+    (start, appids, days x games minutes) of the games played at least
+    MIN_ACTIVE_DAYS days. start moves up to the first played day, leading
+    empty weeks would only make every pair look correlated
+    '''
+    appid_of_row, offsets, values = timeseries.played_days(db, start, end)
+    if not len(offsets):
+        return end, [], np.zeros((1, 0), dtype=np.float32)
+
+    first = int(offsets.min())
+    start, offsets = start + timedelta(days=first), offsets - first
+
+    appids, columns = np.unique(appid_of_row, return_inverse=True)
+    active = np.bincount(columns, minlength=len(appids))
+    keep = np.flatnonzero(active >= MIN_ACTIVE_DAYS)
+    if len(keep) > MAX_GAMES:
+        # most played days first, appid breaks ties
+        keep = np.sort(keep[np.lexsort((appids[keep], -active[keep]))[:MAX_GAMES]])
+    remap = np.full(len(appids), -1, dtype=np.int64)
+    remap[keep] = np.arange(len(keep))
+
+    minutes = np.zeros(((end - start).days + 1, len(keep)), dtype=np.float32)
+    selected = remap[columns] >= 0
+    minutes[offsets[selected], remap[columns[selected]]] = values[selected]
+    return start, appids[keep].tolist(), minutes
+
+_matrices = OrderedDict()   # (namespace, days, end, data version) -> CoPlayMatrix, most recent last
+_lock = threading.Lock()
+
+def get_matrix(db, days: int = DEFAULT_DAYS, reference_date=None) -> CoPlayMatrix:
+    # a replica's matrix is kept apart (it may lag), the data version is the primary's
+    namespace = db_namespace(db)
+    end = reference_date if reference_date else date.today()
+    key = (namespace, days, end, cache.get_data_version(db.info.get("db", "main")))
+    with _lock:
+        if key in _matrices:
+            _matrices.move_to_end(key)
+            return _matrices[key]
+        started = time.perf_counter()
+        start, appids, minutes = _load(db, end - timedelta(days=days - 1), end)
+        matrix = _matrices[key] = CoPlayMatrix(start, end, appids, minutes)
+        while len(_matrices) > MATRICES_KEPT:
+            _matrices.popitem(last=False)
+        print(f"Built co-play matrix: {len(appids)} games x {minutes.shape[0]} days ({(time.perf_counter() - started) * 1000:.0f} ms)")
+        return matrix
+
+def _names(db, appids) -> dict:
+    if not appids:
+        return {}
+    return dict(db.query(Game.appid, Game.name).filter(Game.appid.in_(appids)).all())
+
+def _window(matrix: CoPlayMatrix) -> dict:
+    return {"start": matrix.start.isoformat(), "end": matrix.end.isoformat(), "weeks": matrix.weeks}
+
+def related_games(appid: int, days: int = DEFAULT_DAYS, limit: int = 10, session=None, reference_date=None):
+    '''Games played on the same days as `appid`, and the ones that replaced it (or it replaced)'''
+    db = session or ReadSessionLocal()
+    close_after = False
+    if session is None:
+        close_after = True
+
+    namespace = db_namespace(db)
+    end = reference_date if reference_date else date.today()
+    version = cache.get_data_version(db.info.get("db", "main"))
+    cache_key = f"{namespace}-coplay_related_{appid}_{days}_{limit}_{end.isoformat()}_v{version}"
+    cached = cache.get_cache(cache_key)
+    if cached:
+        return {"cached": True, **cached}
+
+    try:
+        name = db.query(Game.name).filter(Game.appid == appid).scalar()
+        if name is None:
+            return None
+
+        matrix = get_matrix(db, days, reference_date)
+        played_with, replaced = [], []
+        i = matrix.column.get(appid)
+        if i is not None:
+            others = np.arange(len(matrix.appids)) != i
+
+            # jaccard first, more days together breaks ties
+            candidates = np.flatnonzero(others & (matrix.together[i] > 0))
+            order = candidates[np.lexsort((-matrix.together[i, candidates], -matrix.jaccard[i, candidates]))][:limit]
+            played_with = [(j, matrix.pair(i, j)) for j in order]
+
+            if matrix.correlation is not None:
+                candidates = np.flatnonzero(others & (matrix.correlation[i] < REPLACED_BELOW))
+                order = candidates[np.argsort(matrix.correlation[i, candidates], kind="stable")][:limit]
+                replaced = [(j, matrix.pair(i, j)) for j in order]
+
+        names = _names(db, [matrix.appids[j] for j, _ in played_with + replaced])
+        def entry(j, pair):
+            return {"appid": matrix.appids[j], "name": names.get(matrix.appids[j]), **pair}
+
+        result = {
+            "appid": appid,
+            "name": name,
+            **_window(matrix),
+            "active_days": int(matrix.active_days[i]) if i is not None else 0,
+            "played_with": [entry(j, pair) for j, pair in played_with],
+            "replaced": [entry(j, pair) for j, pair in replaced]
+        }
+        cache.set_cache(cache_key, result, ttl=86400)
+        return {"cached": False, **result}
+    finally:
+        if close_after:
+            db.close()
+
+def top_pairs(metric: str = "together", days: int = DEFAULT_DAYS, limit: int = 20, session=None, reference_date=None):
+    '''
+    Strongest pairs across the library:
+    together = jaccard of played days (at least MIN_ACTIVE_DAYS together),
+    correlated / replaced = highest / lowest weekly correlation
+    '''
+    db = session or ReadSessionLocal()
+    close_after = False
+    if session is None:
+        close_after = True
+
+    namespace = db_namespace(db)
+    end = reference_date if reference_date else date.today()
+    version = cache.get_data_version(db.info.get("db", "main"))
+    cache_key = f"{namespace}-coplay_pairs_{metric}_{days}_{limit}_{end.isoformat()}_v{version}"
+    cached = cache.get_cache(cache_key)
+    if cached:
+        return {"cached": True, **cached}
+
+    try:
+        matrix = get_matrix(db, days, reference_date)
+        if len(matrix.appids) < 2 or (metric != "together" and matrix.correlation is None):
+            return None
+
+        # upper triangle only, every pair once
+        rows, cols = np.triu_indices(len(matrix.appids), k=1)
+        if metric == "together":
+            valid = matrix.together[rows, cols] >= MIN_ACTIVE_DAYS
+            rows, cols = rows[valid], cols[valid]
+            order = np.lexsort((-matrix.together[rows, cols], -matrix.jaccard[rows, cols]))
+        elif metric == "correlated":
+            order = np.argsort(-matrix.correlation[rows, cols], kind="stable")
+        else:
+            valid = matrix.correlation[rows, cols] < REPLACED_BELOW
+            rows, cols = rows[valid], cols[valid]
+            order = np.argsort(matrix.correlation[rows, cols], kind="stable")
+        order = order[:limit]
+
+        names = _names(db, {matrix.appids[k] for k in np.concatenate([rows[order], cols[order]]).tolist()})
+        pairs = []
+        for i, j in zip(rows[order].tolist(), cols[order].tolist()):
+            pairs.append({
+                "games": [
+                    {"appid": matrix.appids[i], "name": names.get(matrix.appids[i])},
+                    {"appid": matrix.appids[j], "name": names.get(matrix.appids[j])}
+                ],
+                **matrix.pair(i, j)
+            })
+
+        result = {"metric": metric, **_window(matrix), "games_compared": len(matrix.appids), "pairs": pairs}
+        cache.set_cache(cache_key, result, ttl=86400)
+        return {"cached": False, **result}
+    finally:
+        if close_after:
+            db.close()
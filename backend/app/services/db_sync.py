@@ -1,87 +1,319 @@
 # /backend/app/services/db_sync.py
-from backend.app.db.database import SessionLocal
-from backend.app.db.models import Game, Snapshot, DailySummary
-from backend.app.services import cache
+from backend.app.db.database import SessionLocal, mark_primary_write
+from backend.app.db.models import Game, Snapshot, DailySummary, GameStats
+from backend.app.services import cache, analytics, timeseries, steam_api, partitions, sparse
+from array import array
 from datetime import datetime, date, timezone
-from sqlalchemy import func
+from sqlalchemy import func, select, update
 
-def save_game_to_db(game_list: list):
+# events only carry the changed games list up to this size, the rest is counted
+MAX_LISTED_CHANGES = 50
+
+def _state_changed(game, stats) -> bool:
+    '''sparse mode: does this ingest differ from the game's last known state (its stats row)'''
+    if stats is None:
+        return True
+    if game.playtime != (stats.current_playtime or 0):
+        return True
+    return game.last_played is not None and game.last_played != stats.last_played
+
+class SnapshotWriter:
     '''
-    Insert or update game rows and add snapshots
-    Only one snapshot per game per day
+    Writes one ingest batch by batch (see services/ingest.py), so the whole
+    owned games list never has to be in memory at once:
+
+        writer = SnapshotWriter()
+        writer.write(batch)   # per batch of steam_api.OwnedGame, as they arrive
+        changes = writer.finish()
+        writer.close()        # always (abort() first on errors)
+
+    All batches share one transaction. Per batch the games, today's snapshots
+    and stats rows are read with one query each and flushed at the end.
+    Only one snapshot per game per day. With SNAPSHOT_MODE=sparse (see
+    services/sparse.py) only games whose playtime / last_played differ from
+    their stats row get one, today's snapshots are only read for those.
     '''
-    db = SessionLocal()
-    try:
-        today = date.today()
 
-        for g in game_list:
-            appid = g["appid"]
+    def __init__(self):
+        self.db = SessionLocal()
+        self.today = date.today()
+        self.summary_day = datetime.now(timezone.utc).date()
+        # partitioned postgres: this month's partition has to exist before the first insert
+        partitions.ensure_partitions(self.db, self.summary_day, self.summary_day)
 
-            # check if game exists
-            game = db.query(Game).filter_by(appid=appid).first()
+        # what this ingest adds to today's summary
+        self.minutes_added = 0
+        self.games_tracked = 0
+        self.new_games = 0
+        self.top = None
+        self.snapshots_created = 0
+        self.games_written = 0
+        self.games_changed = 0
+        self.changed_games = []
+        # (appid, playtime) for the time series store, 8 bytes per game
+        self.ingested = (array("i"), array("i"))
 
+    def write(self, games):
+        db = self.db
+        appids = [g.appid for g in games]
+        game_rows = {g.appid: g for g in db.query(Game).filter(Game.appid.in_(appids)).all()}
+        stats_rows = {s.appid: s for s in db.query(GameStats).filter(GameStats.appid.in_(appids)).all()}
+        changed = set()
+        if sparse.SPARSE:
+            # the stats row is the game's last known state, no snapshot needed to compare
+            changed = {g.appid for g in games if _state_changed(g, stats_rows.get(g.appid))}
+            # only games that already changed earlier today have a row to update
+            appids = [
+                a for a in changed
+                if stats_rows.get(a) and stats_rows[a].last_snapshot_date and stats_rows[a].last_snapshot_date.date() == self.today
+            ]
+        # today's snapshot per game (the last one if there are several)
+        today_snapshots = {
+            s.appid: s for s in
+            db.query(Snapshot)
+            .filter(Snapshot.appid.in_(appids), func.date(Snapshot.date) == self.today)
+            # same rows, but lets the date index / partition pruning do the work
+            .filter(Snapshot.date >= datetime.combine(self.today, datetime.min.time()))
+            .order_by(Snapshot.date)
+            .all()
+        } if appids else {}
+        now_utc = datetime.now(timezone.utc)
+
+        for g in games:
+            appid = g.appid
+            game = game_rows.get(appid)
             if not game:
-                game = Game(
-                    appid=appid,
-                    name=g.get("name") or "Unknown",
-                    img_icon_url=g.get("img_icon_url")
-                )
+                game = game_rows[appid] = Game(appid=appid, name=g.name or "Unknown", img_icon_url=g.icon_url)
                 db.add(game)
-                db.flush()
+                self.new_games += 1
             else:
-                updated = False
-                if g.get("name") and game.name != g.get("name"):
-                    game.name = g.get("name")
-                    updated = True
-                if g.get("icon_url") and game.img_icon_url != g.get("icon_url"):
-                    game.img_icon_url = g.get("icon_url")
-                    updated = True
-                if updated:
-                    db.add(game)
-
-            # parse last_played
-            last_played_dt = None
-            if g.get("last_played"):
-                try:
-                    last_played_dt = datetime.fromisoformat(g.get("last_played"))
-                except Exception:
-                    last_played_dt = None
-
-            # check if a snapshot for today exists
-            existing_snapshot = db.query(Snapshot).filter(
-                Snapshot.appid == appid,
-                func.date(Snapshot.date) == today
-            ).first()
-            now_utc = datetime.now(timezone.utc)
-            playtime_now = int(g.get("playtime_minutes", 0))
+                if g.name and game.name != g.name:
+                    game.name = g.name
+                if g.icon_url and game.img_icon_url != g.icon_url:
+                    game.img_icon_url = g.icon_url
 
+            existing_snapshot = today_snapshots.get(appid)
+            written = False
             if existing_snapshot:
-                # Only update if playtime changed
-                if existing_snapshot.playtime_forever != playtime_now:
-                    existing_snapshot.playtime_forever = playtime_now
-                    existing_snapshot.last_played = last_played_dt
+                # Only update if playtime changed (sparse: or last_played)
+                if existing_snapshot.playtime_forever != g.playtime or appid in changed:
+                    existing_snapshot.playtime_forever = g.playtime
+                    existing_snapshot.last_played = g.last_played
                     existing_snapshot.date = now_utc
-                    db.add(existing_snapshot)
-            else:
-                snapshot = Snapshot(
-                    appid=appid,
-                    playtime_forever=playtime_now,
-                    last_played=last_played_dt,
-                    date=now_utc
-                )
-                db.add(snapshot)
+                    written = True
+            elif not sparse.SPARSE or appid in changed:
+                today_snapshots[appid] = Snapshot(appid=appid, playtime_forever=g.playtime, last_played=g.last_played, date=now_utc)
+                db.add(today_snapshots[appid])
+                self.snapshots_created += 1
+                written = True
+
+            # keep the precomputed stats row in sync with what we just wrote
+            stats = stats_rows.get(appid)
+            if not stats:
+                stats = stats_rows[appid] = GameStats(appid=appid, first_snapshot_date=now_utc, current_playtime=0)
+                db.add(stats)
+
+            # minutes played today = playtime - baseline (end of previous day),
+            # only the change since the last ingest goes into the summary.
+            # The first ingest of the day also counts the game as tracked today
+            if stats.baseline_date != self.summary_day:
+                stats.baseline_date = self.summary_day
+                stats.baseline_playtime = stats.current_playtime or 0
+                self.games_tracked += 1
+            played_before = max((stats.current_playtime or 0) - stats.baseline_playtime, 0)
+            played_today = max(g.playtime - stats.baseline_playtime, 0)
+            self.minutes_added += played_today - played_before
+            if played_today > 0 and (self.top is None or played_today > self.top[2]):
+                self.top = (appid, game.name, played_today)
 
+            if g.playtime != (stats.current_playtime or 0):
+                self.games_changed += 1
+                if len(self.changed_games) < MAX_LISTED_CHANGES:
+                    self.changed_games.append({
+                        "appid": appid,
+                        "name": game.name,
+                        "playtime_forever": g.playtime,
+                        "played_today": played_today
+                    })
 
+            self.ingested[0].append(appid)
+            self.ingested[1].append(g.playtime)
+            stats.current_playtime = g.playtime
+            if written or not sparse.SPARSE:
+                # sparse: the game's newest snapshot, not its last ingest
+                stats.last_snapshot_date = now_utc
+            if g.last_played:
+                stats.last_played = g.last_played
+
+        # rows go out now, the session doesn't keep them once we let go
+        db.flush()
+        self.games_written += len(games)
+
+    def finish(self):
+        '''Rank, update today's summary and commit. Returns what changed'''
+        db = self.db
+        rerank_game_stats(db)
+        analytics.upsert_daily_summary(db, self.summary_day, self.minutes_added, self.games_tracked, self.new_games, self.top)
         db.commit()
+        mark_primary_write()
+        analytics.after_summary_upsert(db, self.summary_day)
+        timeseries.record_ingest(db, datetime.now(timezone.utc), zip(*self.ingested))
+
+        return {
+            "games": self.changed_games, # first MAX_LISTED_CHANGES
+            "games_changed": self.games_changed,
+            "new_games": self.new_games,
+            "snapshots_created": self.snapshots_created,
+            "games_written": self.games_written
+        }
+
+    def abort(self):
+        self.db.rollback()
+
+    def close(self):
+        cache.delete_cache("daily-summary-latest")
+        cache.delete_prefix("top_games_")
+        cache.delete_prefix("playtime_trends")
+        cache.bump_data_version()
+
+        self.db.close()
+
+def save_game_to_db(game_list: list):
+    '''
+    Insert or update game rows and add snapshots for a whole list of games
+    (dicts with appid, name, playtime_minutes, icon_url, last_played as iso string)
+    Returns what changed (see SnapshotWriter.finish)
+    '''
+    writer = SnapshotWriter()
+    try:
+        for i in range(0, len(game_list), steam_api.INGEST_BATCH_SIZE):
+            writer.write([
+                steam_api.OwnedGame(
+                    g["appid"],
+                    g.get("name"),
+                    int(g.get("playtime_minutes", 0)),
+                    g.get("icon_url") or g.get("img_icon_url"),
+                    _parse_last_played(g.get("last_played"))
+                )
+                for g in game_list[i:i + steam_api.INGEST_BATCH_SIZE]
+            ])
+        return writer.finish()
+    except Exception:
+        writer.abort()
+        raise
+    finally:
+        writer.close()
+
+def _parse_last_played(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except Exception:
+        return None
+
+
+def rank_game_stats(stats_rows):
+    '''
+    Assign lifetime_rank (1 = most played) by current playtime
+    Ties are broken by appid so ranks are stable between ingests
+    '''
+    ordered = sorted(stats_rows, key=lambda s: (-(s.current_playtime or 0), s.appid))
+    for rank, stats in enumerate(ordered, start=1):
+        if stats.lifetime_rank != rank:
+            stats.lifetime_rank = rank
+
+def rerank_game_stats(db):
+    '''
+    rank_game_stats in one UPDATE, without loading every stats row
+    (same order: playtime desc, appid). Runs inside the caller's transaction
+    '''
+    ranked = select(
+        GameStats.id.label("id"),
+        func.row_number().over(order_by=(GameStats.current_playtime.desc(), GameStats.appid)).label("rank")
+    ).subquery()
+    db.execute(
+        update(GameStats)
+        .where(GameStats.id == ranked.c.id, GameStats.lifetime_rank.is_distinct_from(ranked.c.rank))
+        .values(lifetime_rank=ranked.c.rank)
+    )
+
+def backfill_game_stats(session=None):
+    '''
+    Build game_stats from the snapshot history in one aggregate query
+    Only runs when the table is empty (fresh table on an existing db)
+    '''
+    db = session or SessionLocal()
+    close_after = False
+    if session is None:
+        close_after = True
+    try:
+        if db.query(GameStats.id).first():
+            return 0
 
+        S = partitions.snapshots(db)
+        rows = (
+            db.query(
+                S.appid,
+                func.max(S.playtime_forever),
+                func.min(S.date),
+                func.max(S.date),
+                func.max(S.last_played)
+            )
+            .group_by(S.appid)
+            .all()
+        )
+        stats_rows = [
+            GameStats(
+                appid=appid,
+                current_playtime=playtime or 0,
+                first_snapshot_date=first_seen,
+                last_snapshot_date=last_seen,
+                last_played=last_played
+            )
+            for appid, playtime, first_seen, last_seen, last_played in rows
+        ]
+        rank_game_stats(stats_rows)
+        db.add_all(stats_rows)
+        db.commit()
+        print(f"Backfilled game_stats for {len(stats_rows)} games")
+        return len(stats_rows)
     except Exception:
         db.rollback()
         raise
     finally:
-        cache.delete_cache("daily-summary-latest")
-        cache.delete_cache("top_games_week")
-        cache.delete_cache("top_games_month")
-        cache.delete_cache("top_games_lifetime")
-        cache.delete_cache("playtime_trends")
+        if close_after:
+            db.close()
+
+def refresh_game_stats(db, appids=None):
+    '''
+    Recompute game_stats from the snapshot history for `appids` (all games by
+    default) after snapshots were written outside of save_game_to_db (bulk
+    imports). Today's baselines are left alone. Caller commits
+    '''
+    S = partitions.snapshots(db)
+    query = db.query(
+        S.appid,
+        func.max(S.playtime_forever),
+        func.min(S.date),
+        func.max(S.date),
+        func.max(S.last_played)
+    )
+    if appids is not None:
+        query = query.filter(S.appid.in_(list(appids)))
+    aggregates = query.group_by(S.appid).all()
+
+    stats_by_appid = {s.appid: s for s in db.query(GameStats).all()}
+    for appid, playtime, first_seen, last_seen, last_played in aggregates:
+        stats = stats_by_appid.get(appid)
+        if not stats:
+            stats = stats_by_appid[appid] = GameStats(appid=appid)
+            db.add(stats)
+        stats.current_playtime = playtime or 0
+        stats.first_snapshot_date = first_seen
+        stats.last_snapshot_date = last_seen
+        stats.last_played = last_played
 
-        db.close()
+    rank_game_stats(stats_by_appid.values())
+    db.flush()
+    return len(aggregates)
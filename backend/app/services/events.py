@@ -0,0 +1,122 @@
+# /backend/app/services/events.py
+import asyncio
+import os
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from backend.app import profiling
+from backend.app.services import bundle
+
+'''
+Server push for dashboards, so they don't have to poll the analytics endpoints.
+
+Data only changes when an ingest runs (or a summary is generated/finalized),
+right after that a compact "data_changed" event is published to every
+connected client (SSE or WebSocket, see routes/events.py), optionally with
+the games whose playtime changed and the new latest summary.
+
+Memory per connection is bounded: each subscriber has a small queue, when a
+slow client falls behind the oldest events are dropped and the next event it
+gets says how many it missed (=> refetch everything instead of applying diffs).
+
+Ingest runs in one worker, clients can be connected to any of them, so while
+anyone is subscribed each worker also watches the analytics bundle version
+and publishes a (diff-less) event when another worker produced new data.
+'''
+
+load_dotenv()
+
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "8"))
+EVENTS_MAX_CONNECTIONS = int(os.getenv("EVENTS_MAX_CONNECTIONS", "500"))
+EVENTS_HEARTBEAT = int(os.getenv("EVENTS_HEARTBEAT", "25"))           # seconds, keeps proxies from closing idle streams
+EVENTS_WATCH_INTERVAL = int(os.getenv("EVENTS_WATCH_INTERVAL", "15"))  # seconds between bundle version checks
+MAX_DIFF_GAMES = 50     # bigger diffs are sent without the game list
+
+class TooManySubscribers(Exception):
+    pass
+
+class Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.missed = 0
+
+    def push(self, event):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.missed += 1
+        self.queue.put_nowait(event)
+
+    async def next_event(self, timeout=None):
+        '''Next event, None on timeout (time for a heartbeat)'''
+        try:
+            event = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        if self.missed:
+            event = {**event, "missed": self.missed}
+            self.missed = 0
+        return event
+
+_subscribers = set()
+_state = {"version": 0, "watcher": None}
+
+def current_version():
+    return _state["version"]
+
+def subscribe() -> Subscriber:
+    if len(_subscribers) >= EVENTS_MAX_CONNECTIONS:
+        raise TooManySubscribers()
+    subscriber = Subscriber()
+    _subscribers.add(subscriber)
+    if _state["watcher"] is None or _state["watcher"].done():
+        _state["watcher"] = asyncio.get_running_loop().create_task(_watch_bundle())
+    return subscriber
+
+def unsubscribe(subscriber: Subscriber):
+    _subscribers.discard(subscriber)
+
+def subscriber_count():
+    return len(_subscribers)
+
+def publish(event: dict):
+    '''Push an event to every subscriber of this worker (call from the event loop)'''
+    for subscriber in list(_subscribers):
+        subscriber.push(event)
+
+def publish_data_changed(version=None, changes=None, summary=None):
+    '''
+    version: analytics bundle version the new data is in (None if it failed to build)
+    changes: what the ingest wrote (SnapshotWriter.finish)
+    summary: the new latest summary
+    '''
+    if version:
+        _state["version"] = max(_state["version"], version)
+    event = {
+        "type": "data_changed",
+        "version": version or _state["version"],
+        "at": datetime.now(timezone.utc).isoformat()
+    }
+    if changes is not None:
+        event["new_games"] = changes.get("new_games", 0)
+        games = changes.get("games", [])
+        changed = changes.get("games_changed", len(games))
+        if changed <= MAX_DIFF_GAMES and changed == len(games):
+            event["games"] = games
+        else:
+            event["games_changed"] = changed
+    if summary is not None:
+        event["summary"] = summary
+    publish(event)
+    return event
+
+async def _watch_bundle():
+    # stops by itself once the last subscriber is gone
+    while _subscribers:
+        try:
+            version = await profiling.to_thread(bundle.current_version)
+            if _state["version"] == 0:
+                _state["version"] = version
+            elif version > _state["version"]:
+                publish_data_changed(version, summary=bundle.get_response(bundle.bundle_key("summary_latest")))
+        except Exception as e:
+            print(f"Error watching analytics bundle: {e}")
+        await asyncio.sleep(EVENTS_WATCH_INTERVAL)
@@ -0,0 +1,207 @@
+# /backend/app/services/forecast.py
+import json
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import func, insert
+from backend.app.db.database import SessionLocal, ReadSessionLocal, has_table, mark_primary_write
+from backend.app.db.models import Forecast, Game, GameStats
+from backend.app.services import timeseries
+
+'''
+Playtime projections ("at this pace you hit 1,000 hours of X by March"),
+fitted nightly for every game at once and stored in the forecasts table.
+
+The daily minutes of the last FORECAST_WINDOW_DAYS come from the time series
+store as one day x game matrix (+ a column for the whole library), every
+model is then a couple of matrix operations over all games:
+- daily_rate: exponentially weighted mean of the daily minutes (half-life
+  FORECAST_HALF_LIFE days), "the current pace"
+- trend: slope of a least squares line through the daily minutes
+- weekly: the next WEEKS weeks, pace + trend (never below 0 a day)
+- milestone: next round number of hours and the day daily_rate reaches it
+
+Only games played inside the window get a row. Runs after the nightly
+finalize (POST /analytics/summary/finalize) or on demand, a few ms per
+thousand games.
+'''
+
+load_dotenv()
+
+WINDOW_DAYS = int(os.getenv("FORECAST_WINDOW_DAYS", "84"))
+HALF_LIFE = float(os.getenv("FORECAST_HALF_LIFE", "14")) # days
+WEEKS = 4
+MILESTONE_HOURS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+MILESTONE_STEP = 5000 # hours, above the list
+MAX_ETA_DAYS = 3650
+
+def _milestones(current, rate, as_of: date):
+    '''next milestone (hours) and the day it is reached at `rate`, None when it's out of reach'''
+    steps = np.array(MILESTONE_HOURS, dtype=np.int64) * 60
+    idx = np.searchsorted(steps, current, side="right")
+    beyond = (current // (MILESTONE_STEP * 60) + 1) * MILESTONE_STEP
+    hours = np.where(idx < len(steps), steps[np.minimum(idx, len(steps) - 1)] // 60, beyond)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eta = np.ceil((hours * 60 - current) / rate)
+    reachable = (rate > 0) & (eta <= MAX_ETA_DAYS)
+    dates = [as_of + timedelta(days=int(days)) if ok else None for days, ok in zip(eta, reachable)]
+    return hours, dates
+
+def fit(minutes) -> dict:
+    '''
+    minutes: days x series matrix of daily minutes (last row = latest day),
+    returns the model outputs per series (numpy arrays)
+    '''
+    days = minutes.shape[0]
+    t = np.arange(days, dtype=np.float64)
+
+    # exponentially weighted pace, the last day weighs the most
+    weights = 0.5 ** ((days - 1 - t) / HALF_LIFE)
+    rate = (weights / weights.sum()) @ minutes
+
+    # least squares slope, all series in one product
+    centered = t - t.mean()
+    trend = (centered @ minutes) / (centered @ centered) if days > 1 else np.zeros(minutes.shape[1])
+
+    ahead = np.arange(1, WEEKS * 7 + 1, dtype=np.float64)[:, None]
+    daily = np.maximum(rate[None, :] + trend[None, :] * ahead, 0)
+    weekly = daily.reshape(WEEKS, 7, -1).sum(axis=1)
+    return {"rate": rate, "trend": trend, "weekly": weekly}
+
+def compute_forecasts(db, reference_date=None, timings=None) -> list:
+    '''
+    Forecast rows (dicts) of every game played in the window + the library
+    row (appid None). timings: dict that gets the load / fit ms
+    '''
+    started = time.perf_counter()
+    as_of = reference_date if reference_date else datetime.now(timezone.utc).date() - timedelta(days=1)
+    start = as_of - timedelta(days=WINDOW_DAYS - 1)
+    appid_of_row, offsets, values = timeseries.played_days(db, start, as_of)
+
+    appids, columns = np.unique(appid_of_row, return_inverse=True)
+    minutes = np.zeros((WINDOW_DAYS, len(appids) + 1), dtype=np.float64)
+    minutes[offsets, columns] = values
+    minutes[:, -1] = minutes[:, :-1].sum(axis=1) # the whole library
+
+    playtimes = dict(db.query(GameStats.appid, GameStats.current_playtime).all())
+    current = np.array([playtimes.get(int(a), 0) for a in appids] + [sum(playtimes.values())], dtype=np.int64)
+
+    loaded = time.perf_counter()
+    model = fit(minutes)
+    hours, dates = _milestones(current, model["rate"], as_of)
+
+    rows = []
+    for i, appid in enumerate(appids.tolist() + [None]):
+        rows.append({
+            "appid": appid,
+            "as_of": as_of,
+            "current_playtime": int(current[i]),
+            "daily_rate": round(float(model["rate"][i]), 2),
+            "trend": round(float(model["trend"][i]), 4),
+            "weekly": json.dumps([int(round(w)) for w in model["weekly"][:, i]]),
+            "milestone_hours": int(hours[i]),
+            "milestone_date": dates[i]
+        })
+    if timings is not None:
+        timings["load"] = round((loaded - started) * 1000, 1)
+        timings["fit"] = round((time.perf_counter() - loaded) * 1000, 1)
+    return rows
+
+def run_forecasts(session=None, reference_date=None):
+    '''Nightly job: fit every game, replace the forecasts table. Returns the run stats'''
+    db = session or SessionLocal()
+    close_after = False
+    if session is None:
+        close_after = True
+
+    try:
+        started = time.perf_counter()
+        timings = {}
+        rows = compute_forecasts(db, reference_date, timings)
+        runtime_ms = round((time.perf_counter() - started) * 1000, 1)
+
+        computed_at = datetime.now(timezone.utc)
+        for row in rows:
+            row["computed_at"] = computed_at
+        rows[-1].update(games=len(rows) - 1, runtime_ms=runtime_ms)
+
+        db.query(Forecast).delete()
+        db.execute(insert(Forecast), rows)
+        db.commit()
+        mark_primary_write()
+
+        games = len(rows) - 1
+        per_thousand = timings["fit"] / games * 1000 if games else 0
+        print(f"Forecast {games} games in {runtime_ms} ms (load {timings['load']} ms, fit {timings['fit']} ms = {per_thousand:.1f} ms per 1000 games)")
+        return {"as_of": rows[-1]["as_of"].isoformat(), "games": games, "runtime_ms": runtime_ms, "timings_ms": timings}
+    except Exception as e:
+        db.rollback()
+        print(f"Error computing forecasts: {e}")
+        return None
+    finally:
+        if close_after:
+            db.close()
+
+def _row(forecast: Forecast, name=None) -> dict:
+    return {
+        "appid": forecast.appid,
+        "name": name,
+        "current_playtime": forecast.current_playtime,
+        "daily_rate": forecast.daily_rate,
+        "trend": forecast.trend,
+        "weekly": json.loads(forecast.weekly) if forecast.weekly else [],
+        "milestone_hours": forecast.milestone_hours,
+        "milestone_date": forecast.milestone_date.isoformat() if forecast.milestone_date else None
+    }
+
+def get_forecast(appid=None, limit: int = 10, session=None):
+    '''Stored forecasts: one game, or the library + the games with the highest pace'''
+    db = session or ReadSessionLocal()
+    close_after = False
+    if session is None:
+        close_after = True
+
+    try:
+        if not has_table(db, Forecast.__tablename__):
+            return None
+        library = db.query(Forecast).filter(Forecast.appid == None).first()
+        if library is None:
+            return None
+
+        result = {
+            "as_of": library.as_of.isoformat(),
+            "computed_at": library.computed_at.isoformat(),
+            "window_days": WINDOW_DAYS
+        }
+        if appid is not None:
+            row = (
+                db.query(Forecast, Game.name)
+                .join(Game, Game.appid == Forecast.appid)
+                .filter(Forecast.appid == appid)
+                .first()
+            )
+            if row is None:
+                return None
+            return {**result, **_row(*row)}
+
+        games = (
+            db.query(Forecast, Game.name)
+            .join(Game, Game.appid == Forecast.appid)
+            .order_by(Forecast.daily_rate.desc(), Forecast.appid)
+            .limit(limit)
+            .all()
+        )
+        total = db.query(func.count(Forecast.id)).filter(Forecast.appid != None).scalar()
+        return {
+            **result,
+            "games_forecast": total,
+            "runtime_ms": library.runtime_ms,
+            "library": {k: v for k, v in _row(library).items() if k not in ("appid", "name")},
+            "games": [_row(forecast, name) for forecast, name in games]
+        }
+    finally:
+        if close_after:
+            db.close()
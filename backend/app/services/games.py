@@ -1,46 +1,151 @@
 # /backend/app/services/games.py
+import json
+from functools import lru_cache
 from fastapi import APIRouter, Query
-from typing import List
-from backend.app.db.database import SessionLocal
-from backend.app.db.models import Game, Snapshot
+from typing import List, Optional
+from sqlalchemy import select, bindparam
+from backend.app.db.database import SessionLocal, ReadSessionLocal, has_table
+from backend.app.db.models import Game, GameStats, GameMetadata
+from backend.app.services import series, partitions
 from datetime import datetime, timedelta, timezone
 
+# Core selects of the needed columns, rows go straight into the response
+# (no ORM entities). Built once with bound parameters so the compiled cache
+# serves them, see analytics.summary_history
+_games = Game.__table__.c
+_stats = GameStats.__table__.c
+_metadata = GameMetadata.__table__.c
+
+@lru_cache(maxsize=None)
+def _search_select(with_stats: bool):
+    if not with_stats:
+        return select(_games.appid, _games.name, _games.img_icon_url).where(_games.name.ilike(bindparam("pattern")))
+    # enrich results with the precomputed stats in the same query
+    return (
+        select(_games.appid, _games.name, _games.img_icon_url, _stats.current_playtime, _stats.last_played)
+        .select_from(Game.__table__.outerjoin(GameStats.__table__, _stats.appid == _games.appid))
+        .where(_games.name.ilike(bindparam("pattern")))
+    )
+
 def search_games(q: str, session=None):
-    db = session or SessionLocal()
+    db = session or ReadSessionLocal()
     close_after = False
     if session is None:
         close_after = True
     try:
-        games = db.query(Game).filter(Game.name.ilike(f"%{q}%")).all()
-        return [{"appid": g.appid, "name": g.name, "img_icon_url": g.img_icon_url} for g in games]
+        pattern = {"pattern": f"%{q}%"}
+        if not has_table(db, GameStats.__tablename__):
+            rows = db.execute(_search_select(False), pattern)
+            return [{"appid": appid, "name": name, "img_icon_url": img_icon_url, "playtime_forever": None, "last_played": None} for appid, name, img_icon_url in rows]
+
+        rows = db.execute(_search_select(True), pattern)
+        return [{
+            "appid": appid,
+            "name": name,
+            "img_icon_url": img_icon_url,
+            "playtime_forever": playtime,
+            "last_played": last_played.isoformat() if last_played else None
+        } for appid, name, img_icon_url, playtime, last_played in rows]
     finally:
         if close_after:
             db.close()
 
-def game_details(appid: int, days: int = 30, session=None):
-    db = session or SessionLocal()
+def _history(db, appid: int, cutoff, resolution: str = "day", max_points: Optional[int] = None, end=None):
+    # one point per day from the cutoff day to `end`, each the playtime at the
+    # end of that day carried forward from the game's latest snapshot, so a
+    # dense (daily) and a sparse (change-only) history give the same points
+    # (services/sparse.py). Dated like the stored snapshots: naive, the day at midnight
+    start = cutoff.date()
+    since = datetime.combine(start, datetime.min.time(), tzinfo=timezone.utc)
+    S = partitions.snapshot_table(db, start=since)
+    rows = db.execute(
+        select(S.c.date, S.c.playtime_forever)
+        .where(S.c.appid == bindparam("appid"), S.c.date >= bindparam("since"))
+        .order_by(S.c.date),
+        {"appid": appid, "since": since}
+    ).all()
+    H = partitions.snapshot_table(db, end=since)
+    carried = db.execute(
+        select(H.c.playtime_forever)
+        .where(H.c.appid == bindparam("appid"), H.c.date < bindparam("since"))
+        .order_by(H.c.date.desc())
+        .limit(1),
+        {"appid": appid, "since": since}
+    ).scalar()
+
+    playtime_by_day = {start: carried} if carried is not None else {}
+    for d, p in rows:
+        playtime_by_day[d.date()] = p # ordered, the day's last snapshot wins
+    if not playtime_by_day:
+        return []
+    first = min(playtime_by_day)
+    last = max(max(playtime_by_day), end or first)
+    playtime, deltas = series.daily_series(first, (last - first).days + 1, playtime_by_day)
+    dates = [first + timedelta(days=i) for i in range(len(playtime))]
+    if resolution != "day":
+        # one point per week / month: the playtime at its last day in range
+        starts, playtime, _ = series.aggregate_daily(first, playtime, deltas, resolution)
+        dates = [s - timedelta(days=1) for s in starts[1:]] + [last]
+
+    playtime = playtime.tolist()
+    if max_points and len(playtime) > max_points:
+        keep = series.minmax_indices(playtime, max_points)
+        dates, playtime = [dates[i] for i in keep], [playtime[i] for i in keep]
+    return [{"date": datetime.combine(d, datetime.min.time()).isoformat(), "playtime_forever": p} for d, p in zip(dates, playtime)]
+
+@lru_cache(maxsize=None)
+def _details_select(with_stats: bool, with_metadata: bool):
+    # game + its stats + store details in one round trip (the tables are missing on older dbs)
+    columns = [_games.appid, _games.name, _games.img_icon_url]
+    joined = Game.__table__
+    if with_stats:
+        columns += [_stats.current_playtime, _stats.first_snapshot_date, _stats.last_played, _stats.lifetime_rank]
+        joined = joined.outerjoin(GameStats.__table__, _stats.appid == _games.appid)
+    if with_metadata:
+        columns += [_metadata.header_image, _metadata.genres, _metadata.categories]
+        joined = joined.outerjoin(GameMetadata.__table__, _metadata.appid == _games.appid)
+    return select(*columns).select_from(joined).where(_games.appid == bindparam("appid"))
+
+def game_details(appid: int, days: int = 30, session=None, reference_date=None, resolution: str = "day", max_points: Optional[int] = None):
+    db = session or ReadSessionLocal()
     close_after = False
     if session is None:
         close_after = True
     try:
-        game = db.query(Game).filter_by(appid=appid).first()
-        if not game:
+        with_stats = has_table(db, GameStats.__tablename__)
+        with_metadata = has_table(db, GameMetadata.__tablename__)
+        row = db.execute(_details_select(with_stats, with_metadata), {"appid": appid}).first()
+        if not row:
             return {"error": "Game not found"}
+        appid, name, img_icon_url = row[:3]
+        playtime = first_seen = last_played = rank = None
+        if with_stats:
+            playtime, first_seen, last_played, rank = row[3:7]
+        header_image = genres = categories = None
+        if with_metadata:
+            header_image, genres, categories = row[-3:]
 
-        # last `days` snapshots
-        cutoff = datetime.now(timezone.utc) - timedelta(days=days)
-        snapshots = (
-            db.query(Snapshot)
-            .filter(Snapshot.appid == appid, Snapshot.date >= cutoff)
-            .order_by(Snapshot.date)
-            .all()
-        )
+        # daily playtime of the last `days` days
+        # Use reference_date for demo mode
+        if reference_date:
+            now = datetime.combine(reference_date, datetime.min.time(), tzinfo=timezone.utc)
+        else:
+            now = datetime.now(timezone.utc)
+        cutoff = now - timedelta(days=days)
         return {
-            "appid": game.appid,
-            "name": game.name,
-            "img_icon_url": game.img_icon_url,
-            "history": [{"date": s.date.isoformat(), "playtime_forever": s.playtime_forever} for s in snapshots]
+            "appid": appid,
+            "name": name,
+            "img_icon_url": img_icon_url,
+            "playtime_forever": playtime,
+            "first_seen": first_seen.isoformat() if first_seen else None,
+            "last_played": last_played.isoformat() if last_played else None,
+            "lifetime_rank": rank,
+            "header_image": header_image,
+            "genres": json.loads(genres) if genres else [],
+            "categories": json.loads(categories) if categories else [],
+            "resolution": resolution,
+            "history": _history(db, appid, cutoff, resolution, max_points, end=now.date())
         }
     finally:
         if close_after:
-            db.close()
\ No newline at end of file
+            db.close()
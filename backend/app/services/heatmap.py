@@ -0,0 +1,142 @@
+# /backend/app/services/heatmap.py
+from backend.app.db.database import ReadSessionLocal, db_namespace
+from backend.app.db.models import Game, DailySummary
+from backend.app.services import cache, partitions
+from datetime import date, datetime, timedelta, timezone
+from collections import defaultdict
+from sqlalchemy import DateTime, func, literal, select, union_all
+
+'''
+Multi-year activity calendar.
+
+Instead of one dict per day the calendar is array encoded:
+- `start` + `minutes[i]` = minutes played on start + i days (dense)
+- `games` = top-K games of the range, each as sparse `offsets` / `minutes`
+  arrays (only days the game was played), so a 3 year / top 10 payload stays
+  a few KB.
+
+Per-game daily minutes come from one window query over the snapshots of the
+range plus the playtime each game carried into it (each snapshot compared
+with the game's previous one, so days without a snapshot just carry
+forward), results are cached per data version.
+'''
+
+MAX_YEARS = 10
+MAX_TOP_GAMES = 25
+
+def _day_start(d: date) -> datetime:
+    return datetime.combine(d, datetime.min.time(), tzinfo=timezone.utc)
+
+def _game_stacks(db, start: date, end: date, top: int):
+    # per game daily delta = playtime - previous snapshot's playtime (0 before the first one)
+    lower, upper = _day_start(start), _day_start(end + timedelta(days=1))
+    # the previous snapshot of a game's first one in range: one (appid, date)
+    # index lookup per game instead of reading the history before the range
+    before = partitions.snapshot_table(db, end=lower)
+    carried_playtime = (
+        select(before.c.playtime_forever)
+        .where(before.c.appid == Game.appid, before.c.date < lower)
+        .order_by(before.c.date.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    carried = select(Game.appid.label("appid"), carried_playtime.label("playtime")).subquery()
+    window = partitions.snapshot_table(db, start=lower, end=upper)
+    in_range = select(window.c.appid, window.c.date, window.c.playtime_forever.label("playtime")).where(window.c.date < upper)
+    if db.execute(select(before.c.id).where(before.c.date < lower).limit(1)).first():
+        points = union_all(
+            # dated just before the range, only compared against
+            select(carried.c.appid, literal(lower.replace(tzinfo=None) - timedelta(days=1), DateTime).label("date"), carried.c.playtime)
+            .where(carried.c.playtime != None),
+            in_range.where(window.c.date >= lower)
+        ).subquery()
+    else:
+        # the range starts before the first snapshot, nothing to carry in
+        points = in_range.subquery()
+    prev_playtime = func.lag(points.c.playtime, 1, 0).over(
+        partition_by=points.c.appid,
+        order_by=points.c.date
+    )
+    deltas = (
+        db.query(
+            points.c.appid.label("appid"),
+            points.c.date.label("date"),
+            (points.c.playtime - prev_playtime).label("delta")
+        )
+        .subquery()
+    )
+    rows = (
+        db.query(deltas.c.appid, Game.name, deltas.c.date, deltas.c.delta)
+        .join(Game, Game.appid == deltas.c.appid)
+        .filter(deltas.c.date >= lower, deltas.c.delta > 0)
+        .all()
+    )
+
+    per_game = defaultdict(dict)
+    names = {}
+    for appid, name, snap_date, delta in rows:
+        offset = (snap_date.date() - start).days
+        per_game[appid][offset] = per_game[appid].get(offset, 0) + delta
+        names[appid] = name
+
+    totals = {appid: sum(days.values()) for appid, days in per_game.items()}
+    top_appids = sorted(totals, key=lambda a: (-totals[a], a))[:top]
+
+    stacks = []
+    for appid in top_appids:
+        offsets = sorted(per_game[appid])
+        stacks.append({
+            "appid": appid,
+            "name": names[appid],
+            "total": totals[appid],
+            "offsets": offsets,
+            "minutes": [per_game[appid][o] for o in offsets]
+        })
+    return stacks
+
+def activity_calendar(years: int = 1, top: int = 0, session=None, reference_date=None):
+    db = session or ReadSessionLocal()
+    close_after = False
+    if session is None:
+        close_after = True
+
+    namespace = db_namespace(db) # a replica (may lag) caches apart from the primary
+    end = reference_date if reference_date else date.today()
+    version = cache.get_data_version(db.info.get("db", "main"))
+    cache_key = f"{namespace}-activity_calendar_{years}_{top}_{end.isoformat()}_v{version}"
+
+    cached = cache.get_cache(cache_key)
+    if cached:
+        return {"cached": True, **cached}
+
+    try:
+        start = end - timedelta(days=365 * years - 1)
+        summaries = (
+            db.query(DailySummary.date, DailySummary.total_playtime_minutes)
+            .filter(DailySummary.date >= start, DailySummary.date <= end)
+            .order_by(DailySummary.date)
+            .all()
+        )
+        if not summaries:
+            return None
+
+        # no point shipping leading empty days
+        start = summaries[0][0]
+        minutes = [0] * ((end - start).days + 1)
+        for day, total in summaries:
+            minutes[(day - start).days] = total or 0
+
+        calendar = {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "days": len(minutes),
+            "minutes": minutes,
+            "games": _game_stacks(db, start, end, top) if top else [],
+            "version": version
+        }
+
+        cache.set_cache(cache_key, calendar, ttl=86400)
+        return {"cached": False, **calendar}
+    finally:
+        if close_after:
+            db.close()
@@ -0,0 +1,363 @@
+# /backend/app/services/importer.py
+import csv
+import io
+import json
+import os
+import time
+from functools import lru_cache
+from itertools import islice
+from operator import itemgetter
+from datetime import date, datetime, timedelta, timezone
+from dotenv import load_dotenv
+from sqlalchemy import func, insert, text
+from backend.app.db.database import SessionLocal, mark_primary_write
+from backend.app.db.models import Game
+from backend.app.services import analytics, bundle, cache, db_sync, partitions, sparse, timeseries, trends
+
+'''
+Bulk history import (years of playtime exported from other trackers).
+
+Input: CSV with a header row or NDJSON, one (appid, date, playtime) row per
+line, optional `name`. `date` is a day (2021-03-04, taken as the end of that
+day) or a full ISO timestamp, `playtime` is the cumulative playtime in minutes
+(`playtime_forever` / `playtime_minutes` work too).
+
+The file is streamed in chunks of CHUNK_SIZE rows, each chunk is:
+1. validated (bad rows are counted and skipped, the first few are reported)
+2. missing games are inserted
+3. loaded into a temp staging table (COPY on Postgres, executemany on SQLite)
+4. moved into snapshots in one INSERT ... SELECT that skips days already
+   having a snapshot for that game (one snapshot per game per day, the live
+   data and the first row of the file win), in (appid, date) order so the
+   index inserts stay local
+5. committed, then progress is written to `<file>.checkpoint.json`
+
+A failed/killed import resumes after the last committed chunk (steps 3-4 are
+idempotent, so redoing a chunk is harmless). Once everything is loaded the
+derived daily summaries and game_stats are rebuilt in one pass. With
+SNAPSHOT_MODE=sparse the imported days are deduplicated first (rows equal to
+the game's previous snapshot, see services/sparse.py).
+'''
+
+load_dotenv()
+
+CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "100000"))
+# sqlite page cache of the importing connection, the snapshot indexes are
+# updated for every row (the default ~2 MB cache keeps re-reading them)
+SQLITE_CACHE_MB = int(os.getenv("IMPORT_SQLITE_CACHE_MB", "256"))
+IMPORT_DIR = os.getenv("IMPORT_DIR", "./imports")
+MAX_ERRORS_KEPT = 20
+FORMATS = ("csv", "ndjson")
+
+PLAYTIME_FIELDS = ("playtime", "playtime_forever", "playtime_minutes")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+class ImportFormatError(ValueError):
+    pass
+
+def detect_format(path: str, fmt=None) -> str:
+    fmt = fmt or {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson"}.get(os.path.splitext(path)[1].lower())
+    if fmt not in FORMATS:
+        raise ImportFormatError(f"Unknown import format for {path}, expected one of {', '.join(FORMATS)}")
+    return fmt
+
+# ---------------------------------------------------------------- parsing
+
+def _read_csv(f):
+    reader = csv.reader(f)
+    header = [h.strip().lower() for h in next(reader, [])]
+    if "appid" not in header or "date" not in header:
+        raise ImportFormatError("CSV header must contain appid, date and playtime columns")
+    playtime_col = next((header.index(c) for c in PLAYTIME_FIELDS if c in header), None)
+    if playtime_col is None:
+        raise ImportFormatError("CSV header must contain appid, date and playtime columns")
+    appid_col, date_col = header.index("appid"), header.index("date")
+    name_col = header.index("name") if "name" in header else None
+    # all four columns picked in one call, rows without the name fall back
+    pick = itemgetter(appid_col, date_col, playtime_col, name_col) if name_col is not None else None
+
+    for line_no, row in enumerate(reader, start=2):
+        if not row:
+            continue
+        try:
+            if pick:
+                try:
+                    yield line_no, pick(row)
+                    continue
+                except IndexError:
+                    pass
+            yield line_no, (row[appid_col], row[date_col], row[playtime_col], None)
+        except IndexError:
+            yield line_no, None
+
+def _read_ndjson(f):
+    for line_no, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+            playtime = next(obj[c] for c in PLAYTIME_FIELDS if c in obj)
+            yield line_no, (obj["appid"], obj["date"], playtime, obj.get("name"))
+        except (ValueError, KeyError, TypeError, StopIteration):
+            yield line_no, None
+
+def _records(f, fmt):
+    return _read_csv(f) if fmt == "csv" else _read_ndjson(f)
+
+@lru_cache(maxsize=65536)
+def _day_timestamp(day: str) -> str:
+    # a file has a few thousand distinct days, each is validated once
+    date.fromisoformat(day)
+    return f"{day} 23:59:59.000000"
+
+def _parse(record):
+    '''(appid, date, playtime, name) strings -> (appid, snapshot timestamp, ISO day, playtime, name)'''
+    if record is None:
+        raise ValueError("malformed row")
+    appid, raw_date, playtime, name = record
+    appid = int(appid)
+    playtime = int(playtime)
+    if appid <= 0:
+        raise ValueError(f"invalid appid {appid}")
+    if playtime < 0:
+        raise ValueError(f"negative playtime {playtime}")
+
+    raw_date = str(raw_date).strip()
+    if len(raw_date) == 10:
+        # plain day (the common case), only validated, kept as a string
+        return appid, _day_timestamp(raw_date), raw_date, playtime, (name or None)
+
+    dt = datetime.fromisoformat(raw_date)
+    if dt.tzinfo:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return appid, dt.strftime(TIMESTAMP_FORMAT), dt.date().isoformat(), playtime, (name or None)
+
+# ---------------------------------------------------------------- checkpoints
+
+def checkpoint_path(path: str) -> str:
+    return f"{path}.checkpoint.json"
+
+def load_checkpoint(path: str):
+    try:
+        with open(checkpoint_path(path)) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    st = os.stat(path)
+    if checkpoint.get("size") != st.st_size or checkpoint.get("mtime") != st.st_mtime:
+        print(f"{path} changed since the last import attempt, starting over")
+        return None
+    return checkpoint["stats"]
+
+def _save_checkpoint(path: str, stats: dict):
+    st = os.stat(path)
+    tmp = checkpoint_path(path) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"size": st.st_size, "mtime": st.st_mtime, "stats": stats}, f)
+    os.replace(tmp, checkpoint_path(path))
+
+def _new_stats(path: str, fmt: str) -> dict:
+    return {
+        "file": os.path.basename(path),
+        "format": fmt,
+        "status": "running",   # running / failed / done
+        "stage": "load",       # load -> rebuild -> done
+        "rows_read": 0,
+        "rows_invalid": 0,
+        "snapshots_inserted": 0,
+        "duplicates_skipped": 0,
+        "games_created": 0,
+        "chunks": 0,
+        "first_day": None,
+        "last_day": None,
+        "summaries_rebuilt": 0,
+        "rows_per_second": 0,
+        "errors": []
+    }
+
+# ---------------------------------------------------------------- loading
+
+def _create_staging(db, dialect: str):
+    # temp tables live per connection, so this runs at the start of every chunk
+    if dialect == "postgresql":
+        db.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS import_staging "
+            "(appid integer, snap_date timestamp, day date, playtime integer) ON COMMIT DELETE ROWS"
+        ))
+    else:
+        db.execute(text(
+            "CREATE TEMP TABLE IF NOT EXISTS import_staging "
+            "(appid INTEGER, snap_date TEXT, day TEXT, playtime INTEGER)"
+        ))
+
+def _stage(db, dialect: str, rows):
+    if dialect == "postgresql":
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        buffer.seek(0)
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert("COPY import_staging (appid, snap_date, day, playtime) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+    else:
+        db.connection().exec_driver_sql("INSERT INTO import_staging VALUES (?, ?, ?, ?)", rows)
+
+# same game, same day: s.date within [day, next day), an (appid, date) index range scan.
+# sqlite stores timestamps as "YYYY-MM-DD HH:MM:SS.ffffff" text, everything on
+# that day sorts between "YYYY-MM-DD" and "YYYY-MM-DDT"
+_SAME_DAY = {
+    "postgresql": "s.date >= st.day AND s.date < st.day + 1",
+    "sqlite": "s.date >= st.day AND s.date < (st.day || 'T')"
+}
+
+def _move_staged(db, dialect: str, first_day: str, last_day: str) -> int:
+    # month partitions: postgres needs them to exist, on sqlite older months
+    # live in their own tables and are checked for duplicates too
+    first, last = date.fromisoformat(first_day), date.fromisoformat(last_day)
+    partitions.ensure_partitions(db, first, last)
+    tables = ["snapshots"]
+    if dialect == "sqlite":
+        tables += [partitions.partition_name(m) for m in partitions.months_in_use(db, first, last)]
+    not_exists = " AND ".join(
+        f"NOT EXISTS (SELECT 1 FROM {table} s WHERE s.appid = st.appid AND {_SAME_DAY[dialect]})" for table in tables
+    )
+    return db.execute(text(
+        "INSERT INTO snapshots (appid, date, playtime_forever) "
+        "SELECT st.appid, st.snap_date, st.playtime FROM import_staging st "
+        f"WHERE {not_exists} ORDER BY st.appid, st.snap_date"
+    )).rowcount
+
+def _load_chunk(db, dialect: str, chunk, known_appids: set, stats: dict):
+    rows = {}     # (appid, day) -> staging row, first one wins
+    names = {}
+    for line_no, record in chunk:
+        try:
+            appid, snap_date, day, playtime, name = _parse(record)
+        except (ValueError, TypeError) as e:
+            stats["rows_invalid"] += 1
+            if len(stats["errors"]) < MAX_ERRORS_KEPT:
+                stats["errors"].append(f"line {line_no}: {e}")
+            continue
+        key = (appid, day)
+        if key in rows:
+            stats["duplicates_skipped"] += 1
+            continue
+        rows[key] = (appid, snap_date, day, playtime)
+        if name and appid not in names:
+            names[appid] = name
+
+    new_appids = {appid for appid, _ in rows} - known_appids
+    if new_appids:
+        db.execute(insert(Game), [{"appid": a, "name": names.get(a) or "Unknown"} for a in sorted(new_appids)])
+        known_appids.update(new_appids)
+        stats["games_created"] += len(new_appids)
+
+    if rows:
+        # ISO days sort chronologically as strings
+        days = [day for _, day in rows]
+        first, last = min(days), max(days)
+        _create_staging(db, dialect)
+        _stage(db, dialect, list(rows.values()))
+        inserted = _move_staged(db, dialect, first, last)
+        db.execute(text("DELETE FROM import_staging"))
+        stats["snapshots_inserted"] += inserted
+        stats["duplicates_skipped"] += len(rows) - inserted
+        if inserted:
+            stats["first_day"] = min(stats["first_day"] or first, first)
+            stats["last_day"] = max(stats["last_day"] or last, last)
+
+def _load(db, path: str, fmt: str, chunk_size: int, stats: dict, progress=None):
+    dialect = db.get_bind().dialect.name
+    known_appids = {appid for (appid,) in db.query(Game.appid).all()}
+    started, done_this_run = time.perf_counter(), 0
+    if dialect == "sqlite":
+        cache_size = db.execute(text("PRAGMA cache_size")).scalar()
+        db.execute(text(f"PRAGMA cache_size = {-SQLITE_CACHE_MB * 1024}"))
+
+    def flush(chunk):
+        nonlocal done_this_run
+        try:
+            _load_chunk(db, dialect, chunk, known_appids, stats)
+            stats["rows_read"] += len(chunk)
+            stats["chunks"] += 1
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        done_this_run += len(chunk)
+        stats["rows_per_second"] = int(done_this_run / max(time.perf_counter() - started, 1e-9))
+        _save_checkpoint(path, stats)
+        if progress:
+            progress(stats)
+
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            records = _records(f, fmt)
+            # rows already committed by a previous attempt
+            next(islice(records, stats["rows_read"], stats["rows_read"]), None)
+            while chunk := list(islice(records, chunk_size)):
+                flush(chunk)
+    finally:
+        if dialect == "sqlite":
+            db.execute(text(f"PRAGMA cache_size = {cache_size}"))
+
+    mark_primary_write()
+    stats["stage"] = "rebuild"
+    _save_checkpoint(path, stats)
+
+def _rebuild(db, path: str, stats: dict):
+    '''Derived tables for everything the import touched'''
+    if stats["first_day"]:
+        # imported months go into their partitions before anything is recomputed
+        partitions.maintain(db)
+        if sparse.SPARSE:
+            stats["snapshots_deduplicated"] = sparse.dedupe(db, since=date.fromisoformat(stats["first_day"]))
+        today = datetime.now(timezone.utc).date()
+        S = partitions.snapshots(db)
+        last_snapshot = db.query(func.max(S.date)).scalar()
+        # today's row belongs to the live ingest (incremental upsert), it is left alone
+        end = min(last_snapshot.date(), today - timedelta(days=1))
+        stats["summaries_rebuilt"] = analytics.rebuild_daily_summaries(db, date.fromisoformat(stats["first_day"]), end, finalize_before=today)
+        db_sync.refresh_game_stats(db)
+        db.commit()
+        mark_primary_write()
+
+        cache.delete_cache("daily-summary-latest")
+        cache.delete_prefix("top_games_")
+        cache.delete_prefix("playtime_trends")
+        cache.bump_data_version()
+        trends.reset_series(db)
+        timeseries.reset_store(db)
+        stats["bundle_version"] = bundle.build_bundle()
+
+    stats["stage"] = stats["status"] = "done"
+    _save_checkpoint(path, stats)
+
+def import_history(path: str, fmt=None, chunk_size: int = CHUNK_SIZE, resume: bool = True, progress=None, session_factory=SessionLocal) -> dict:
+    '''
+    Import a CSV / NDJSON history file, resuming a previous attempt on the
+    same (unchanged) file unless resume=False. Returns the import stats,
+    `progress(stats)` is called after every chunk
+    '''
+    fmt = detect_format(path, fmt)
+    stats = (load_checkpoint(path) if resume else None) or _new_stats(path, fmt)
+    if stats["stage"] == "done":
+        return stats
+    stats["status"] = "running"
+    stats.pop("error", None)
+
+    db = session_factory()
+    try:
+        if stats["stage"] == "load":
+            _load(db, path, fmt, chunk_size, stats, progress)
+        _rebuild(db, path, stats)
+        return stats
+    except Exception as e:
+        db.rollback()
+        stats["status"] = "failed"
+        stats["error"] = str(e)
+        _save_checkpoint(path, stats)
+        raise
+    finally:
+        db.close()
@@ -0,0 +1,226 @@
+# /backend/app/services/ingest.py
+import asyncio
+import contextvars
+import os
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from backend.app import tracing
+from backend.app.services import steam_api, bundle, events, metadata
+from backend.app.services.db_sync import SnapshotWriter
+
+'''
+Ingest (Steam fetch -> snapshots -> analytics bundle -> events) as a job,
+followed by a background metadata run (services/metadata.py).
+
+Triggers (POST /fetch/jobs, the cron's GET /fetch/, startup) don't run the
+pipeline themselves, they get a job:
+- a job that is queued, or running and started less than COALESCE_WINDOW
+  seconds ago, is simply joined (same Steam data, no second fetch)
+- otherwise one new job is queued behind the running one, further triggers
+  join that queued job
+
+Jobs run one at a time in a single worker task; the blocking parts (db
+writes, bundle build) run on a dedicated one-thread executor, so an ingest
+never holds more than one thread and never uses the default pool the
+request handlers offload to. Coalescing is per process, the cron only hits
+one worker.
+
+The Steam response is never held as a whole: it is parsed while it streams
+in and written in INGEST_BATCH_SIZE batches as they arrive (see _save).
+
+Finished jobs are kept (last JOB_HISTORY) with per stage timings and row
+counts for GET /fetch/jobs/{id}. download and save overlap, so they add up
+to more than total. With tracing on, every job is a trace (trace_id) with a
+span per stage and per written batch.
+'''
+
+load_dotenv()
+
+COALESCE_WINDOW = int(os.getenv("INGEST_COALESCE_WINDOW", "60")) # seconds
+JOB_HISTORY = 50
+PIPELINE_DEPTH = 2 # parsed batches waiting for the writer
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingest")
+
+class IngestJob:
+    def __init__(self, trigger: str):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"        # queued -> running -> done / failed
+        self.stage = None
+        self.triggers = {trigger: 1}  # who asked for it, coalesced ones included
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at = None
+        self.finished_at = None
+        self.stages = {}              # stage -> ms
+        self.rows = {}
+        self.version = None
+        self.error = None
+        self.trace_id = None
+        self.changes = None           # what the ingest changed (changed games list is capped)
+        self.done = asyncio.get_running_loop().create_future()
+
+    def joinable(self) -> bool:
+        if self.status == "queued":
+            return True
+        return self.status == "running" and (datetime.now(timezone.utc) - self.started_at).total_seconds() < COALESCE_WINDOW
+
+    def to_dict(self, details: bool = False):
+        result = {
+            "job_id": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "triggers": self.triggers,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "stages_ms": self.stages,
+            "rows": self.rows,
+            "version": self.version,
+            "trace_id": self.trace_id,
+            "error": self.error
+        }
+        if details:
+            result["changes"] = self.changes
+        return result
+
+_jobs = OrderedDict()   # job id -> job, newest last
+_state = {"running": None, "queued": None, "worker": None}
+
+def get_job(job_id: str):
+    return _jobs.get(job_id)
+
+def trigger(source: str = "api") -> tuple:
+    '''Job that will pick up fresh Steam data, (job, coalesced) (call from the event loop)'''
+    for job in (_state["queued"], _state["running"]):
+        if job is not None and job.joinable():
+            job.triggers[source] = job.triggers.get(source, 0) + 1
+            return job, True
+
+    job = IngestJob(source)
+    _jobs[job.id] = job
+    while len(_jobs) > JOB_HISTORY:
+        old_id = next(iter(_jobs))
+        if _jobs[old_id].status in ("queued", "running"):
+            break
+        _jobs.pop(old_id)
+    _state["queued"] = job
+    if _state["worker"] is None or _state["worker"].done():
+        _state["worker"] = asyncio.get_running_loop().create_task(_worker())
+    return job, False
+
+async def _worker():
+    # stops once there is nothing queued, trigger() starts it again
+    while _state["queued"] is not None:
+        job = _state["running"] = _state["queued"]
+        _state["queued"] = None
+        try:
+            await _run(job)
+        finally:
+            _state["running"] = None
+
+async def _stage(job: IngestJob, name: str, func, *args, blocking: bool = False):
+    job.stage = name
+    started = time.perf_counter()
+    with tracing.span(name, op="ingest.stage"):
+        if blocking:
+            result = await _blocking(func, *args)
+        else:
+            result = await func(*args)
+    job.stages[name] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+def _blocking(func, *args):
+    # run_in_executor doesn't carry contextvars over, the current span goes with a copy
+    context = contextvars.copy_context()
+    return asyncio.get_running_loop().run_in_executor(_executor, context.run, func, *args)
+
+async def _download(job: IngestJob, queue: asyncio.Queue):
+    # producer: parsed batches go into the (bounded) queue while the body streams in
+    started = time.perf_counter()
+    cancelled = False
+    try:
+        with tracing.span("download", op="http.client", **{"http.url": steam_api.OWNED_GAMES_URL}) as span:
+            async for batch in steam_api.stream_owned_games():
+                job.rows["games_fetched"] += len(batch)
+                span.set("games", job.rows["games_fetched"])
+                await queue.put(batch)
+    except asyncio.CancelledError:
+        # the writer gave up, nobody drains the queue anymore
+        cancelled = True
+        raise
+    finally:
+        job.stages["download"] = round((time.perf_counter() - started) * 1000, 1)
+        if not cancelled:
+            await queue.put(None)
+
+async def _save(job: IngestJob):
+    '''
+    Steam download and db writes overlap: one task parses the response into
+    batches, this one writes them as they come. At most PIPELINE_DEPTH batches
+    wait in between, memory doesn't grow with the library size
+    '''
+    job.stage = "download+save"
+    job.rows.update(games_fetched=0, batches=0)
+    writer = await _blocking(SnapshotWriter)
+    queue = asyncio.Queue(maxsize=PIPELINE_DEPTH)
+    producer = asyncio.create_task(_download(job, queue))
+    write_ms = 0.0
+    try:
+        with tracing.span("save", op="ingest.stage"):
+            while (batch := await queue.get()) is not None:
+                started = time.perf_counter()
+                with tracing.span("save.batch", op="ingest.batch", games=len(batch)):
+                    await _blocking(writer.write, batch)
+                write_ms += (time.perf_counter() - started) * 1000
+                job.rows["batches"] += 1
+            await producer # download errors surface here
+        job.stages["save"] = round(write_ms, 1)
+        return await _stage(job, "commit", writer.finish, blocking=True)
+    except BaseException:
+        producer.cancel()
+        # let it unwind (closes the Steam response), its error was already raised or doesn't matter now
+        await asyncio.gather(producer, return_exceptions=True)
+        await _blocking(writer.abort)
+        raise
+    finally:
+        await _blocking(writer.close)
+
+async def _run(job: IngestJob):
+    job.status = "running"
+    job.started_at = datetime.now(timezone.utc)
+    with tracing.trace("ingest", op="job", sampled=True, job_id=job.id) as root:
+        job.trace_id = root.trace_id
+        try:
+            changes = await _save(job)
+            job.changes = changes
+            job.rows["games_changed"] = changes["games_changed"]
+            job.rows["new_games"] = changes["new_games"]
+            job.rows["snapshots_created"] = changes["snapshots_created"]
+
+            # render the standard analytics responses for the new data
+            job.version = await _stage(job, "bundle", bundle.build_bundle, blocking=True)
+
+            # tell connected dashboards instead of making them poll
+            events.publish_data_changed(job.version, changes, summary=bundle.get_response(bundle.bundle_key("summary_latest")))
+            job.status = "done"
+
+            # store metadata for new / stale games, in the background
+            metadata.schedule()
+        except Exception as e:
+            print(f"Ingest job {job.id} failed in {job.stage}: {e}")
+            job.status = "failed"
+            job.error = getattr(e, "detail", None) or str(e)
+            root.fail(e)
+        finally:
+            job.stage = None
+            job.finished_at = datetime.now(timezone.utc)
+            job.stages["total"] = round((job.finished_at - job.started_at).total_seconds() * 1000, 1)
+            root.set("triggers", ",".join(job.triggers))
+            for key, value in job.rows.items():
+                root.set(key, value)
+            if not job.done.done():
+                job.done.set_result(job)
@@ -0,0 +1,214 @@
+# /backend/app/services/metadata.py
+import asyncio
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+import httpx
+from dotenv import load_dotenv
+from sqlalchemy import func
+from backend.app import tracing
+from backend.app.db.database import SessionLocal
+from backend.app.db.models import Game, GameStats, GameMetadata, GameGenre
+
+'''
+Background enrichment of games with Steam store details (genres, categories,
+header image, ...), which GetOwnedGames doesn't return.
+
+The store's appdetails endpoint takes one appid per call and is rate limited
+(roughly 200 calls / 5 min), so:
+- only games without metadata or past their refresh_after are fetched, the
+  most played first, at most METADATA_BATCH per run
+- at most METADATA_CONCURRENCY calls in flight, started no faster than
+  METADATA_RATE_PER_MINUTE; a 429 ends the run, the rest waits for the next one
+- results land in game_metadata (refresh_after = now + METADATA_REFRESH_DAYS,
+  failures are retried after METADATA_RETRY_HOURS) and game_genres
+
+A run is scheduled after every ingest (services/ingest.py), one at a time.
+`transport` takes any httpx transport, e.g. httpx.MockTransport in tests.
+'''
+
+load_dotenv()
+
+STORE_URL = "https://store.steampowered.com/api/appdetails"
+METADATA_BATCH = int(os.getenv("METADATA_BATCH", "200"))
+METADATA_CONCURRENCY = int(os.getenv("METADATA_CONCURRENCY", "4"))
+METADATA_RATE_PER_MINUTE = int(os.getenv("METADATA_RATE_PER_MINUTE", "40"))
+METADATA_REFRESH_DAYS = int(os.getenv("METADATA_REFRESH_DAYS", "30"))
+METADATA_RETRY_HOURS = int(os.getenv("METADATA_RETRY_HOURS", "24"))
+
+class RateLimiter:
+    '''Spaces out calls to at most `per_minute`'''
+
+    def __init__(self, per_minute: int):
+        self.interval = 60.0 / max(per_minute, 1)
+        self.next_at = 0.0
+        self.lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self.lock:
+            now = time.monotonic()
+            delay = self.next_at - now
+            self.next_at = max(now, self.next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class RateLimited(Exception):
+    pass
+
+def due_appids(db, limit: int = METADATA_BATCH, now=None):
+    '''Games without metadata or past refresh_after, most played first'''
+    now = now or datetime.now(timezone.utc)
+    return [
+        appid for (appid,) in (
+            db.query(Game.appid)
+            .outerjoin(GameMetadata, GameMetadata.appid == Game.appid)
+            .outerjoin(GameStats, GameStats.appid == Game.appid)
+            .filter((GameMetadata.id == None) | (GameMetadata.refresh_after <= now))
+            .order_by((GameMetadata.id != None), func.coalesce(GameStats.current_playtime, 0).desc(), Game.appid)
+            .limit(limit)
+            .all()
+        )
+    ]
+
+def _names(items):
+    return [i["description"] for i in items or [] if i.get("description")]
+
+def parse_details(appid: int, body: dict):
+    '''appdetails response -> metadata fields, None for "no store page"'''
+    entry = body.get(str(appid)) or {}
+    if not entry.get("success"):
+        return None
+    data = entry.get("data") or {}
+    return {
+        "header_image": data.get("header_image"),
+        "genres": _names(data.get("genres")),
+        "categories": _names(data.get("categories")),
+        "developers": data.get("developers") or [],
+        "release_date": (data.get("release_date") or {}).get("date") or None,
+    }
+
+async def _fetch_one(client, limiter: RateLimiter, semaphore: asyncio.Semaphore, appid: int):
+    async with semaphore:
+        await limiter.wait()
+        with tracing.span("GET appdetails", op="http.client", appid=appid, **{"http.url": STORE_URL}) as span:
+            resp = await client.get(STORE_URL, params={"appids": appid, "l": "english"})
+            span.set("http.status_code", resp.status_code)
+    if resp.status_code == 429:
+        raise RateLimited()
+    resp.raise_for_status()
+    return parse_details(appid, resp.json() or {})
+
+def save_metadata(results: dict, failed, session_factory=SessionLocal):
+    '''
+    results: appid -> parsed details (None = not on the store)
+    failed: appids whose call errored, retried after METADATA_RETRY_HOURS
+    '''
+    now = datetime.now(timezone.utc)
+    db = session_factory()
+    try:
+        appids = list(results) + list(failed)
+        rows = {m.appid: m for m in db.query(GameMetadata).filter(GameMetadata.appid.in_(appids)).all()}
+        for appid in failed:
+            row = rows.get(appid)
+            if row is None:
+                row = GameMetadata(appid=appid)
+                db.add(row)
+            row.refresh_after = now + timedelta(hours=METADATA_RETRY_HOURS)
+
+        if results:
+            db.query(GameGenre).filter(GameGenre.appid.in_(list(results))).delete(synchronize_session=False)
+        for appid, details in results.items():
+            row = rows.get(appid)
+            if row is None:
+                row = GameMetadata(appid=appid)
+                db.add(row)
+            row.fetched_at = now
+            row.refresh_after = now + timedelta(days=METADATA_REFRESH_DAYS)
+            row.on_store = details is not None
+            if details is None:
+                continue
+            row.header_image = details["header_image"]
+            row.genres = json.dumps(details["genres"])
+            row.categories = json.dumps(details["categories"])
+            row.developers = json.dumps(details["developers"])
+            row.release_date = details["release_date"]
+            for genre in dict.fromkeys(details["genres"]):
+                db.add(GameGenre(appid=appid, genre=genre))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+async def enrich(appids=None, transport=None, limit: int = METADATA_BATCH, session_factory=SessionLocal):
+    '''
+    Fetch and store metadata for `appids` (default: whatever is due).
+    Returns counts: fetched, not_on_store, failed, skipped (left for the next run after a 429)
+    '''
+    started = time.perf_counter()
+    if appids is None:
+        db = session_factory()
+        try:
+            appids = await asyncio.to_thread(due_appids, db, limit)
+        finally:
+            db.close()
+    stats = {"requested": len(appids), "fetched": 0, "not_on_store": 0, "failed": 0, "skipped": 0}
+    if not appids:
+        return stats
+
+    limiter = RateLimiter(METADATA_RATE_PER_MINUTE)
+    semaphore = asyncio.Semaphore(METADATA_CONCURRENCY)
+    results, failed = {}, []
+    rate_limited = False
+    async with httpx.AsyncClient(transport=transport, timeout=15) as client:
+        tasks = {appid: asyncio.create_task(_fetch_one(client, limiter, semaphore, appid)) for appid in appids}
+        for appid, task in tasks.items():
+            try:
+                results[appid] = await task
+            except RateLimited:
+                # stop starting new calls, the rest stays due
+                rate_limited = True
+                stats["skipped"] += 1
+                for other in tasks.values():
+                    other.cancel()
+            except asyncio.CancelledError:
+                if not rate_limited:
+                    raise
+                stats["skipped"] += 1
+            except (httpx.HTTPError, ValueError) as e:
+                print(f"Metadata fetch failed for {appid}: {e}")
+                failed.append(appid)
+
+    await asyncio.to_thread(save_metadata, results, failed, session_factory)
+    stats["fetched"] = sum(1 for d in results.values() if d is not None)
+    stats["not_on_store"] = sum(1 for d in results.values() if d is None)
+    stats["failed"] = len(failed)
+    stats["seconds"] = round(time.perf_counter() - started, 2)
+    print(f"Game metadata: {stats}")
+    return stats
+
+_state = {"task": None, "last": None}
+
+def schedule():
+    '''Start a background run unless one is going (call from the event loop)'''
+    if _state["task"] is None or _state["task"].done():
+        _state["task"] = asyncio.get_running_loop().create_task(_run())
+        return True
+    return False
+
+def status():
+    running = _state["task"] is not None and not _state["task"].done()
+    return {"running": running, "last_run": _state["last"]}
+
+async def _run():
+    with tracing.trace("metadata", op="job", sampled=True) as root:
+        try:
+            _state["last"] = await enrich()
+            for key, value in _state["last"].items():
+                root.set(key, value)
+        except Exception as e:
+            print(f"Game metadata run failed: {e}")
+            root.fail(e)
+            _state["last"] = {"error": str(e)}
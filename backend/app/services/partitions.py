@@ -0,0 +1,383 @@
+# /backend/app/services/partitions.py
+import os
+import sqlite3
+import threading
+import time
+from datetime import date, datetime, timezone
+from dotenv import load_dotenv
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, select, text, union_all
+from sqlalchemy.orm import aliased
+from backend.app.db.database import SessionLocal, db_namespace, has_table
+from backend.app.db.models import Snapshot, SnapshotPartition
+
+'''
+Month partitions of the snapshots table, so time range queries and the
+ingest only touch the months they need and old months can be taken offline.
+
+Opt-in, backend/scripts/partition_snapshots.py enable converts an existing db:
+- Postgres: `snapshots` becomes a native RANGE (date) partitioned table with
+  one partition per month (snapshots_YYYY_MM, primary key (id, date)).
+  Partitions are created SNAPSHOT_PARTITIONS_AHEAD months in advance, the
+  planner prunes by the date filters, no query changes needed
+- SQLite: the last SNAPSHOT_HOT_MONTHS months stay in `snapshots` (ingest
+  writes, recent reads), older months are moved into snapshots_YYYY_MM tables
+  by rollover(). Reads go through snapshots(db, start, end), which unions
+  `snapshots` with just the month tables the range overlaps
+
+Archiving a month (archive()) takes it out of the live data: on Postgres the
+partition is detached and moved to the `archive` schema (metadata only), on
+SQLite the month table is copied to its own file in SNAPSHOT_ARCHIVE_DIR and
+dropped. restore() brings it back. snapshot_partitions keeps track of both.
+
+Derived data (daily summaries, game stats) is kept when a month is archived.
+'''
+
+load_dotenv()
+
+SNAPSHOT_HOT_MONTHS = max(int(os.getenv("SNAPSHOT_HOT_MONTHS", "2")), 2) # current + previous month at least
+SNAPSHOT_PARTITIONS_AHEAD = int(os.getenv("SNAPSHOT_PARTITIONS_AHEAD", "2"))
+SNAPSHOT_ARCHIVE_DIR = os.getenv("SNAPSHOT_ARCHIVE_DIR", "./archive")
+ARCHIVE_SCHEMA = "archive"
+CHECK_INTERVAL = 60 # seconds another process's rollover may go unnoticed
+
+def month_start(d) -> date:
+    return date(d.year, d.month, 1)
+
+def next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def months_between(first: date, last: date):
+    month = month_start(first)
+    while month <= last:
+        yield month
+        month = next_month(month)
+
+def partition_name(month: date) -> str:
+    return f"snapshots_{month:%Y_%m}"
+
+def _bound(month: date) -> datetime:
+    return datetime.combine(month, datetime.min.time(), tzinfo=timezone.utc)
+
+def _dialect(db) -> str:
+    return db.get_bind().dialect.name
+
+# sqlite month tables (same columns as snapshots), not part of Base.metadata
+_month_metadata = MetaData()
+
+def _month_table(month: date) -> Table:
+    name = partition_name(month)
+    if name not in _month_metadata.tables:
+        Table(
+            name, _month_metadata,
+            Column("id", Integer, primary_key=True),
+            Column("date", DateTime, nullable=False),
+            Column("appid", Integer, nullable=False),
+            Column("playtime_forever", Integer, nullable=False),
+            Column("last_played", DateTime, nullable=True),
+        )
+    return _month_metadata.tables[name]
+
+# attached sqlite month tables per database, re-read every CHECK_INTERVAL
+_attached = {}
+_attached_lock = threading.Lock()
+
+def _db_key(db):
+    return db_namespace(db)
+
+def _attached_months(db) -> list:
+    key = _db_key(db)
+    cached = _attached.get(key)
+    if cached and time.time() - cached[0] < CHECK_INTERVAL:
+        return cached[1]
+    months = []
+    if has_table(db, SnapshotPartition.__tablename__):
+        months = [m for (m,) in db.query(SnapshotPartition.month).filter(SnapshotPartition.status == "attached").order_by(SnapshotPartition.month)]
+    with _attached_lock:
+        _attached[key] = (time.time(), months)
+    return months
+
+def _forget(db):
+    _attached.pop(_db_key(db), None)
+
+def months_in_use(db, first: date, last: date) -> list:
+    '''SQLite month tables holding days first..last'''
+    return [m for m in _attached_months(db) if month_start(first) <= m <= last]
+
+def snapshots(db, start=None, end=None):
+    '''
+    What to query snapshots with for rows with start <= date < end (either
+    may be None): Snapshot itself, or on a partitioned SQLite db an alias
+    over `snapshots` + the month tables in range, used the same way
+    (S.appid, S.date, db.query(S), ...). Results are read only
+    '''
+    table = snapshot_table(db, start, end)
+    return Snapshot if table is Snapshot.__table__ else aliased(Snapshot, table)
+
+def snapshot_table(db, start=None, end=None):
+    '''
+    Same as snapshots() for Core selects: the snapshots Table, or the union
+    subquery over the month tables in range (both have .c.appid, .c.date, ...)
+    '''
+    if _dialect(db) != "sqlite":
+        return Snapshot.__table__
+    start, end = _as_bound(start), _as_bound(end)
+    months = [
+        m for m in _attached_months(db)
+        if (start is None or _bound(next_month(m)) > start) and (end is None or _bound(m) < end)
+    ]
+    if not months:
+        return Snapshot.__table__
+
+    columns = ("id", "date", "appid", "playtime_forever", "last_played")
+    parts = []
+    for table in [Snapshot.__table__] + [_month_table(m) for m in months]:
+        part = select(*(table.c[c] for c in columns))
+        if start is not None:
+            part = part.where(table.c.date >= start)
+        if end is not None:
+            part = part.where(table.c.date < end)
+        parts.append(part)
+    return union_all(*parts).subquery("snapshots_in_range")
+
+def live_tables(db) -> list:
+    '''
+    The tables live snapshot rows are stored in, for writes that snapshots()
+    can't do: `snapshots` (on Postgres the partitions are behind it) + the
+    attached SQLite month tables. Row ids are only unique per table
+    '''
+    if _dialect(db) != "sqlite":
+        return [Snapshot.__table__]
+    return [Snapshot.__table__] + [_month_table(m) for m in _attached_months(db)]
+
+def _as_bound(value):
+    # dates are midnight UTC, naive datetimes are taken as UTC
+    if value is None or not isinstance(value, datetime):
+        return value if value is None else _bound(value)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def is_partitioned(db) -> bool:
+    if _dialect(db) == "postgresql":
+        return db.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass('snapshots')")).scalar() == "p"
+    return has_table(db, SnapshotPartition.__tablename__) and db.query(SnapshotPartition.id).first() is not None
+
+def _register(db, month: date, rows=None):
+    row = db.query(SnapshotPartition).filter(SnapshotPartition.month == month).first()
+    if row is None:
+        row = SnapshotPartition(month=month, table_name=partition_name(month), status="attached")
+        db.add(row)
+    if rows is not None:
+        row.rows = rows
+    return row
+
+
+# ------------------------------------------------------------------ postgres
+
+_created = set() # months known to have a partition, per process
+
+def ensure_partitions(db, first, last):
+    '''Postgres: partitions for every month from first to last (dates). No-op elsewhere / unpartitioned'''
+    if _dialect(db) != "postgresql":
+        return 0
+    months = [m for m in months_between(first, last) if m not in _created]
+    if not months or not is_partitioned(db):
+        return 0
+    # an archived month has to be restored first, its rows would end up in a second partition
+    archived = {m for (m,) in db.query(SnapshotPartition.month).filter(SnapshotPartition.status == "archived")}
+    months = [m for m in months if m not in archived]
+    for month in months:
+        db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {partition_name(month)} PARTITION OF snapshots "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+        ))
+        _register(db, month)
+    db.flush()
+    _created.update(months)
+    return len(months)
+
+def _partition_postgres(db):
+    # everything in one transaction, the old table is dropped at the end
+    db.execute(text("ALTER TABLE snapshots RENAME TO snapshots_unpartitioned"))
+    for (index,) in db.execute(text("SELECT indexname FROM pg_indexes WHERE tablename = 'snapshots_unpartitioned'")).all():
+        db.execute(text(f'ALTER INDEX "{index}" RENAME TO "{index}_unpartitioned"'))
+    sequence = db.execute(text("SELECT pg_get_serial_sequence('snapshots_unpartitioned', 'id')")).scalar()
+
+    db.execute(text("CREATE TABLE snapshots (LIKE snapshots_unpartitioned INCLUDING DEFAULTS) PARTITION BY RANGE (date)"))
+    db.execute(text("ALTER TABLE snapshots ADD PRIMARY KEY (id, date)"))
+    db.execute(text("ALTER TABLE snapshots ADD FOREIGN KEY (appid) REFERENCES games (appid)"))
+    if sequence:
+        db.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY snapshots.id"))
+
+    oldest, newest = db.execute(text("SELECT min(date), max(date) FROM snapshots_unpartitioned")).one()
+    today = datetime.now(timezone.utc).date()
+    last = add_months(month_start(today), SNAPSHOT_PARTITIONS_AHEAD)
+    _created.clear()
+    ensure_partitions(db, oldest.date() if oldest else today, max(last, newest.date()) if newest else last)
+    copied = db.execute(text("INSERT INTO snapshots SELECT * FROM snapshots_unpartitioned")).rowcount
+    for index in Snapshot.__table__.indexes:
+        index.create(db.connection())
+    db.execute(text("DROP TABLE snapshots_unpartitioned"))
+    return copied
+
+
+# -------------------------------------------------------------------- sqlite
+
+def _create_month_table(db, month: date):
+    table = _month_table(month)
+    table.create(db.connection(), checkfirst=True)
+    name = table.name
+    db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{name}_appid_date ON {name} (appid, date)"))
+    db.execute(text(f"CREATE INDEX IF NOT EXISTS ix_{name}_date ON {name} (date)"))
+    return table
+
+def rollover(db, today=None, keep_months: int = SNAPSHOT_HOT_MONTHS) -> dict:
+    '''
+    SQLite: move snapshots older than the last keep_months months out of
+    `snapshots` into their month tables (also picks up imported history).
+    Postgres: create the partitions for the months ahead. Caller commits.
+    Returns {month: rows moved}
+    '''
+    today = today or datetime.now(timezone.utc).date()
+    if _dialect(db) == "postgresql":
+        ensure_partitions(db, today, add_months(month_start(today), SNAPSHOT_PARTITIONS_AHEAD))
+        return {}
+
+    boundary = _bound(add_months(month_start(today), -(keep_months - 1)))
+    oldest = db.query(Snapshot.date).filter(Snapshot.date < boundary).order_by(Snapshot.date).first()
+    moved = {}
+    if oldest is not None:
+        archived = {row[0] for row in db.query(SnapshotPartition.month).filter(SnapshotPartition.status == "archived")}
+        for month in months_between(oldest[0].date(), boundary.date()):
+            if _bound(month) >= boundary:
+                break
+            if month in archived:
+                # rows imported into an archived month stay hot (and visible) until it is restored
+                continue
+            in_month = (Snapshot.date >= _bound(month)) & (Snapshot.date < _bound(next_month(month)))
+            rows = db.query(Snapshot.id).filter(in_month).count()
+            if not rows:
+                continue
+            table = _create_month_table(db, month)
+            columns = [table.c[c.name] for c in Snapshot.__table__.columns]
+            db.execute(table.insert().from_select(columns, select(*Snapshot.__table__.columns).where(in_month)))
+            db.query(Snapshot).filter(in_month).delete(synchronize_session=False)
+            partition = _register(db, month)
+            partition.rows = (partition.rows or 0) + rows
+            moved[month.isoformat()] = rows
+    _forget(db)
+    return moved
+
+def archive(db, month: date) -> dict:
+    '''Take one month out of the live data. Caller commits'''
+    month = month_start(month)
+    partition = db.query(SnapshotPartition).filter(SnapshotPartition.month == month, SnapshotPartition.status == "attached").first()
+    if partition is None:
+        raise ValueError(f"No attached partition for {month:%Y-%m}")
+    if month >= add_months(month_start(datetime.now(timezone.utc).date()), -(SNAPSHOT_HOT_MONTHS - 1)):
+        raise ValueError(f"{month:%Y-%m} is still receiving snapshots")
+
+    name = partition.table_name
+    if _dialect(db) == "postgresql":
+        db.execute(text(f"ALTER TABLE snapshots DETACH PARTITION {name}"))
+        db.execute(text(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}"))
+        db.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        partition.archive_path = f"{ARCHIVE_SCHEMA}.{name}"
+        _created.discard(month)
+    else:
+        # the month's rows go to a file of their own, which can then be moved anywhere
+        os.makedirs(SNAPSHOT_ARCHIVE_DIR, exist_ok=True)
+        path = os.path.abspath(os.path.join(SNAPSHOT_ARCHIVE_DIR, f"{name}.db"))
+        if os.path.exists(path):
+            raise ValueError(f"{path} already exists")
+        target = sqlite3.connect(path)
+        try:
+            target.execute("CREATE TABLE snapshots (id INTEGER PRIMARY KEY, date DATETIME NOT NULL, appid INTEGER NOT NULL, playtime_forever INTEGER NOT NULL, last_played DATETIME)")
+            source = db.execute(text(f"SELECT id, date, appid, playtime_forever, last_played FROM {name}"))
+            while rows := source.fetchmany(50000):
+                target.executemany("INSERT INTO snapshots VALUES (?, ?, ?, ?, ?)", [tuple(r) for r in rows])
+            target.execute("CREATE INDEX ix_snapshots_appid_date ON snapshots (appid, date)")
+            target.commit()
+        finally:
+            target.close()
+        db.execute(text(f"DROP TABLE {name}"))
+        partition.archive_path = path
+    partition.status = "archived"
+    partition.archived_at = datetime.now(timezone.utc)
+    _forget(db)
+    return {"month": month.isoformat(), "rows": partition.rows, "archive": partition.archive_path}
+
+def restore(db, month: date) -> dict:
+    '''Put an archived month back into the live data. Caller commits'''
+    month = month_start(month)
+    partition = db.query(SnapshotPartition).filter(SnapshotPartition.month == month, SnapshotPartition.status == "archived").first()
+    if partition is None:
+        raise ValueError(f"No archived partition for {month:%Y-%m}")
+
+    name = partition.table_name
+    if _dialect(db) == "postgresql":
+        db.execute(text(f"ALTER TABLE {ARCHIVE_SCHEMA}.{name} SET SCHEMA public"))
+        db.execute(text(
+            f"ALTER TABLE snapshots ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{next_month(month).isoformat()}')"
+        ))
+        _created.add(month)
+    else:
+        _create_month_table(db, month)
+        source = sqlite3.connect(f"file:{partition.archive_path}?mode=ro", uri=True)
+        try:
+            rows = source.execute("SELECT id, date, appid, playtime_forever, last_played FROM snapshots")
+            while batch := rows.fetchmany(50000):
+                db.connection().exec_driver_sql(f"INSERT OR IGNORE INTO {name} VALUES (?, ?, ?, ?, ?)", batch)
+        finally:
+            source.close()
+    partition.status = "attached"
+    partition.archived_at = None
+    _forget(db)
+    return {"month": month.isoformat(), "rows": partition.rows}
+
+def enable(db) -> dict:
+    '''One time conversion of an existing database. Caller commits'''
+    if is_partitioned(db):
+        return {"partitioned": True, "converted": False}
+    if _dialect(db) == "postgresql":
+        rows = _partition_postgres(db)
+        return {"partitioned": True, "converted": True, "rows": rows}
+    moved = rollover(db)
+    if not moved:
+        # nothing old enough yet, an (empty) table for this month marks the db as partitioned
+        month = month_start(datetime.now(timezone.utc).date())
+        _create_month_table(db, month)
+        _register(db, month, rows=0)
+        _forget(db)
+    return {"partitioned": True, "converted": True, "moved": moved}
+
+def status(db) -> list:
+    return [{
+        "month": p.month.isoformat(),
+        "table": p.table_name,
+        "status": p.status,
+        "rows": p.rows,
+        "archive": p.archive_path,
+        "archived_at": p.archived_at.isoformat() if p.archived_at else None
+    } for p in db.query(SnapshotPartition).order_by(SnapshotPartition.month)]
+
+def maintain(session=None):
+    '''Rollover / create upcoming partitions if the db is partitioned (startup, nightly finalize)'''
+    db = session or SessionLocal()
+    try:
+        if not is_partitioned(db):
+            return {}
+        moved = rollover(db)
+        db.commit()
+        if moved:
+            print(f"Moved snapshots into month partitions: {moved}")
+        return moved
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if session is None:
+            db.close()
@@ -0,0 +1,97 @@
+# /backend/app/services/series.py
+import numpy as np
+from datetime import date, timedelta
+from typing import Literal, get_args
+
+'''
+Helpers to keep long history series small.
+
+A chart is a few hundred pixels wide, so there is no point shipping one point
+per day for a 5 year range. Two ways to bound a series:
+- `resolution` = week / month: one point per calendar period
+  (cumulative playtime = value at the end of the period, deltas are summed)
+- `max_points`: cap on the number of points
+    * cumulative series (game history): min/max bucketing, per bucket the
+      lowest and highest point are kept so the shape (and the jumps) survive
+    * daily deltas (compare): consecutive days are merged into equal sized
+      buckets so the minutes still add up
+
+Everything is one vectorized pass over numpy arrays.
+'''
+
+Resolution = Literal["day", "week", "month"]
+RESOLUTIONS = get_args(Resolution)
+MIN_POINTS = 10
+MAX_POINTS = 5000
+
+def period_start(d: date, resolution: str) -> date:
+    if resolution == "week":
+        return d - timedelta(days=d.weekday())
+    if resolution == "month":
+        return d.replace(day=1)
+    return d
+
+def daily_series(start: date, days: int, playtime_by_day: dict):
+    '''
+    Dense per day cumulative playtime (carried forward, 0 before the first
+    snapshot) and daily deltas, from a {date: playtime_forever} map
+    '''
+    offsets = np.array(sorted((d - start).days for d in playtime_by_day), dtype=np.int64)
+    values = np.array([playtime_by_day[start + timedelta(days=int(o))] for o in offsets], dtype=np.int64)
+
+    # marker[i] = 1-based index of the last snapshot at or before day i (0 = none yet)
+    marker = np.zeros(days, dtype=np.int64)
+    marker[offsets] = np.arange(1, len(offsets) + 1)
+    marker = np.maximum.accumulate(marker)
+    playtime = np.concatenate(([0], values))[marker]
+    deltas = np.maximum(np.diff(playtime, prepend=0), 0)
+    return playtime, deltas
+
+def _group_starts(keys):
+    # index where each run of equal keys starts
+    return np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+
+def aggregate_daily(start: date, playtime, deltas, resolution: str = "day", max_points=None):
+    '''
+    Bucket dense daily arrays by calendar period and/or into at most
+    max_points equal buckets. Returns (bucket start dates, playtime at bucket
+    end, summed deltas)
+    '''
+    days = len(playtime)
+    dates = [start + timedelta(days=i) for i in range(days)]
+    if resolution != "day":
+        keys = np.array([period_start(d, resolution).toordinal() for d in dates])
+        starts = _group_starts(keys)
+    else:
+        starts = np.arange(days)
+
+    if max_points and len(starts) > max_points:
+        # merge consecutive buckets, `per` of them at a time
+        per = -(-len(starts) // max_points)
+        starts = starts[::per]
+
+    if not len(starts):
+        return [], playtime, deltas
+    ends = np.concatenate((starts[1:], [days])) - 1
+    bucket_dates = [period_start(dates[i], resolution) if resolution != "day" else dates[i] for i in starts]
+    return bucket_dates, playtime[ends], np.add.reduceat(deltas, starts)
+
+def minmax_indices(values, max_points: int):
+    '''
+    Indices of the points to keep so at most ~max_points remain:
+    values are split into equal buckets, per bucket the min and the max are
+    kept (plus the first and last point of the series)
+    '''
+    values = np.asarray(values)
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+
+    per = -(-2 * n // max(max_points - 2, 2))   # points per bucket, 2 kept each
+    buckets = -(-n // per)
+    padded = np.full(buckets * per, values[-1], dtype=values.dtype)
+    padded[:n] = values
+    grid = padded.reshape(buckets, per)
+    base = np.arange(buckets) * per
+    keep = np.concatenate((base + grid.argmin(axis=1), base + grid.argmax(axis=1), [0, n - 1]))
+    return np.unique(np.minimum(keep, n - 1))
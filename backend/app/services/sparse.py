@@ -0,0 +1,97 @@
+# /backend/app/services/sparse.py
+import os
+from datetime import datetime, timezone
+from dotenv import load_dotenv
+from sqlalchemy import Column, Integer, MetaData, Table, delete, func, insert, literal, select, text, union_all
+from backend.app.db.models import SnapshotPartition
+from backend.app.services import partitions
+
+'''
+Change-only ("sparse") snapshot storage.
+
+Dense (the default) writes a snapshot of every owned game on every ingest
+day, whether it was played or not. With SNAPSHOT_MODE=sparse the ingest only
+writes a snapshot when a game's playtime or last_played changed: the game's
+game_stats row is its last known state, so the check costs no extra read
+(see db_sync.SnapshotWriter). A game's first snapshot is always written.
+
+Every reader treats the history as change points and carries the last value
+forward (playtime on a day = latest snapshot at or before it, see
+timeseries.py), so dense and sparse histories give the same responses and a
+dense db can be converted any time: dedupe() deletes every snapshot equal to
+its game's previous one, backend/scripts/dedupe_snapshots.py runs it with a
+before/after size and query time report. Bulk imports in sparse mode dedupe
+the days they added.
+
+Counts that used to be "games with a snapshot that day" are "games seen by
+then" (total_games_tracked, the top games totals), the same number as long
+as every owned game is snapshotted daily.
+'''
+
+load_dotenv()
+
+SNAPSHOT_MODE = os.getenv("SNAPSHOT_MODE", "dense").lower()
+SPARSE = SNAPSHOT_MODE == "sparse"
+
+# (table index in partitions.live_tables(), row id) of the rows to delete
+_redundant_rows = Table(
+    "snapshot_dedupe", MetaData(),
+    Column("part", Integer),
+    Column("id", Integer)
+)
+
+def _redundant(tables, since=None):
+    '''
+    Select of (part, id) of every snapshot whose playtime and last_played are
+    the same as its game's previous snapshot (optionally only rows from the
+    day `since` on, they are still compared with older ones)
+    '''
+    parts = [
+        select(literal(i).label("part"), t.c.id, t.c.appid, t.c.date, t.c.playtime_forever, t.c.last_played)
+        for i, t in enumerate(tables)
+    ]
+    S = union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    order = (S.c.date, S.c.part, S.c.id)
+    ranked = select(
+        S.c.part, S.c.id, S.c.date,
+        S.c.playtime_forever.label("playtime"),
+        S.c.last_played,
+        func.lag(S.c.playtime_forever).over(partition_by=S.c.appid, order_by=order).label("previous"),
+        func.lag(S.c.last_played).over(partition_by=S.c.appid, order_by=order).label("previous_played")
+    ).subquery()
+
+    # a game's first snapshot has no previous one (NULL), it is never redundant
+    redundant = (ranked.c.previous == ranked.c.playtime) & ranked.c.previous_played.is_not_distinct_from(ranked.c.last_played)
+    if since is not None:
+        redundant &= ranked.c.date >= datetime.combine(since, datetime.min.time(), tzinfo=timezone.utc)
+    return select(ranked.c.part, ranked.c.id).where(redundant)
+
+def count_redundant(db, since=None) -> int:
+    '''Snapshots dedupe() would delete'''
+    query = _redundant(partitions.live_tables(db), since).subquery()
+    return db.execute(select(func.count()).select_from(query)).scalar() or 0
+
+def dedupe(db, since=None) -> int:
+    '''
+    Delete every snapshot that repeats its game's previous one (all history,
+    or rows from `since` on). The redundant rows are picked out once into a
+    temp table, then deleted from each live table. Caller commits. Returns the
+    number of rows deleted
+    '''
+    tables = partitions.live_tables(db)
+    db.execute(text("CREATE TEMP TABLE IF NOT EXISTS snapshot_dedupe (part integer, id integer)"))
+    db.execute(text("DELETE FROM snapshot_dedupe"))
+    db.execute(insert(_redundant_rows).from_select(["part", "id"], _redundant(tables, since)))
+
+    removed = 0
+    for i, table in enumerate(tables):
+        ids = select(_redundant_rows.c.id).where(_redundant_rows.c.part == i)
+        deleted = db.execute(delete(table).where(table.c.id.in_(ids))).rowcount
+        if i and deleted:
+            # sqlite month table, keep its row count in snapshot_partitions right
+            db.query(SnapshotPartition).filter(SnapshotPartition.table_name == table.name).update(
+                {SnapshotPartition.rows: SnapshotPartition.rows - deleted}, synchronize_session=False
+            )
+        removed += deleted
+    db.execute(text("DROP TABLE snapshot_dedupe"))
+    return removed
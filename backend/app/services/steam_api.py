@@ -1,20 +1,20 @@
 # /backend/app/services/steam_api.py
 from dotenv import load_dotenv
-import httpx, os
+import httpx, json, os, re
 from datetime import datetime
 from fastapi import HTTPException
+from typing import NamedTuple, Optional
+from backend.app import tracing
 
 load_dotenv()
 
 STEAM_API_KEY = os.getenv("STEAM_API_KEY")
 STEAM_ID = os.getenv("STEAM_ID")
+OWNED_GAMES_URL = "https://api.steampowered.com/IPlayerService/GetOwnedGames/v0001/"
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "500"))
 
-async def get_owned_games():
-    if not STEAM_API_KEY or not STEAM_ID:
-        raise ValueError("Missing STEAM_API_KEY or STEAM_ID")
-
-    url = "https://api.steampowered.com/IPlayerService/GetOwnedGames/v0001/"
-    params = {
+def _owned_games_params():
+    return {
         "key": STEAM_API_KEY,
         "steamid": STEAM_ID,
         "include_appinfo": "true",
@@ -22,44 +22,124 @@ async def get_owned_games():
         "format": "json"
     }
 
-    try:
-        # get data from Steam API
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url, params=params)
-            resp.raise_for_status()
-            data = resp.json()
-    except httpx.RequestError as e:
-        raise HTTPException(status_code=503, detail=f"SteamAPI Request failed: {e}")
-    except httpx.HTTPStatusError as e:
-        raise HTTPException(status_code=e.response.status_code, detail=f"SteamAPI Error: {e.response.text}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Unexpected problem occured: {e}")
+# one owned game, what the ingest needs and nothing else
+class OwnedGame(NamedTuple):
+    appid: int
+    name: Optional[str]
+    playtime: int                   # minutes
+    icon_url: Optional[str]
+    last_played: Optional[datetime]
+
+def owned_game(game: dict) -> OwnedGame:
+    icon = game.get("img_icon_url")
+    return OwnedGame(
+        game["appid"],
+        game.get("name"),
+        game.get("playtime_forever", 0),
+        f"https://media.steampowered.com/steamcommunity/public/images/apps/{game['appid']}/{icon}.jpg" if icon else None,
+        datetime.fromtimestamp(game["rtime_last_played"]) if game.get("rtime_last_played") else None
+    )
 
-    # TODO: validate the structure matches what was expected
+class JsonArrayStream:
+    '''
+    Pulls the elements of one array (the value of `key`, elements are objects)
+    out of a JSON byte stream as they complete, so the document is never held
+    as a whole: feed() chunks, get back the raw bytes of each finished element.
+    '''
+    _TOKENS = re.compile(rb'[{}"\]]')
+    _IN_STRING = re.compile(rb'["\\]')
 
-    return data
+    def __init__(self, key: str):
+        self.marker = re.compile(rb'"' + re.escape(key.encode()) + rb'"\s*:\s*\[')
+        self.buf = b""
+        self.pos = 0            # scan position in buf
+        self.state = "seek"     # seek -> array -> done
+        self.depth = 0
+        self.in_string = False
+        self.start = None       # start of the element being read
 
-async def process_owned_games(raw_response: dict):
-    # extract correct data
-    games = raw_response.get("response", {}).get("games", [])
-    processed = []
+    def feed(self, chunk: bytes) -> list:
+        self.buf += chunk
+        if self.state == "seek":
+            m = self.marker.search(self.buf)
+            if not m:
+                self.buf = self.buf[-256:] # enough to catch a marker split over two chunks
+                return []
+            self.buf, self.pos, self.state = self.buf[m.end():], 0, "array"
+        if self.state != "array":
+            return []
 
-    for game in games:
-        processed.append({
-            "appid": game["appid"],
-            "name": game.get("name"), # may not always be present
-            "playtime_minutes": game.get("playtime_forever", 0), # minutes
-            "icon_url": (
-                f"https://media.steampowered.com/steamcommunity/public/images/apps/{game["appid"]}/{game.get("img_icon_url", "")}.jpg"
-                if game.get("img_icon_url") else None
-            ),
-            "last_played": ( # orginally posix
-                datetime.fromtimestamp(game["rtime_last_played"]).isoformat()
-                if game.get("rtime_last_played") else None
-            )
-        })
+        elements = []
+        buf, pos = self.buf, self.pos
+        while True:
+            if self.in_string:
+                m = self._IN_STRING.search(buf, pos)
+                if not m:
+                    pos = len(buf)
+                    break
+                if m.group() == b"\\":
+                    if m.end() >= len(buf):
+                        pos = m.start() # escaped char is in the next chunk
+                        break
+                    pos = m.end() + 1
+                    continue
+                self.in_string, pos = False, m.end()
+                continue
+            m = self._TOKENS.search(buf, pos)
+            if not m:
+                pos = len(buf)
+                break
+            token, pos = m.group(), m.end()
+            if token == b'"':
+                self.in_string = True
+            elif token == b"{":
+                if self.depth == 0:
+                    self.start = m.start()
+                self.depth += 1
+            elif token == b"}":
+                self.depth -= 1
+                if self.depth == 0:
+                    elements.append(buf[self.start:pos])
+                    self.start = None
+            elif self.depth == 0: # the array's closing ]
+                self.state = "done"
+                break
 
-    return {"game_count": len(processed), "games": processed}
+        # only the unfinished element (or nothing) is kept
+        cut = self.start if self.start is not None else pos
+        self.buf, self.pos = buf[cut:], pos - cut
+        if self.start is not None:
+            self.start = 0
+        return elements
+
+async def stream_owned_games(batch_size: int = INGEST_BATCH_SIZE, transport=None):
+    '''
+    Owned games as lists of OwnedGame, batch_size at a time, parsed while the
+    response is still downloading
+    '''
+    if not STEAM_API_KEY or not STEAM_ID:
+        raise ValueError("Missing STEAM_API_KEY or STEAM_ID")
+
+    try:
+        async with httpx.AsyncClient(transport=transport) as client:
+            async with client.stream("GET", OWNED_GAMES_URL, params=_owned_games_params()) as resp:
+                if resp.is_error:
+                    await resp.aread()
+                    resp.raise_for_status()
+                games = JsonArrayStream("games")
+                batch = []
+                async for chunk in resp.aiter_bytes():
+                    for element in games.feed(chunk):
+                        batch.append(owned_game(json.loads(element)))
+                        if len(batch) >= batch_size:
+                            yield batch
+                            batch = []
+                if batch:
+                    yield batch
+    except httpx.RequestError as e:
+        raise HTTPException(status_code=503, detail=f"SteamAPI Request failed: {e}")
+    except httpx.HTTPStatusError as e:
+        raise HTTPException(status_code=e.response.status_code, detail=f"SteamAPI Error: {e.response.text}")
 
 async def get_player_summary(steam_id: str):
     url = "http://api.steampowered.com/ISteamUser/GetPlayerSummaries/v0002/" # ?key=XXXXXXXXXXXXXXXXXXXXXXX&steamids=76561197960435530"
@@ -67,7 +147,9 @@ async def get_player_summary(steam_id: str):
 
     # get data from Steam API
     async with httpx.AsyncClient() as client:
-        resp = await client.get(url, params=params)
+        with tracing.span("GET GetPlayerSummaries", op="http.client", **{"http.url": url}) as span:
+            resp = await client.get(url, params=params)
+            span.set("http.status_code", resp.status_code)
         data = resp.json()
     
     players = data.get("response", {}).get("players", [])
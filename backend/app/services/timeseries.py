@@ -0,0 +1,351 @@
+# /backend/app/services/timeseries.py
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from datetime import date, datetime, timedelta, timezone
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import func, cast, Date
+from backend.app.db.database import SessionLocal, db_namespace
+from backend.app.db.models import Snapshot
+from backend.app.services import partitions
+
+'''
+Process-local per game playtime series, so the read endpoints don't have to
+re-derive them from Snapshot rows on every request.
+
+Every game keeps two int32 arrays: `days` (days since 1970-01-01) and
+`minutes` (cumulative playtime at the end of that day), but only for the days
+its playtime changed (+ its first day). A game is snapshotted every day
+whether it was played or not (unless SNAPSHOT_MODE=sparse, services/sparse.py),
+storing only the changes is what keeps this small: value on any day = last
+change at or before it (carried forward). `last_seen` is the last day the
+game had a snapshot or was ingested.
+
+Memory: 8 bytes per change point + ~250 bytes per game. A 10k game, 3 year
+library where a game is played on 5% of days is ~0.6M points = ~5 MB + 2.5 MB;
+even the worst case (every game changes every day, 11M points) is ~90 MB,
+the same rows as ORM objects would be well over 1 GB. The store refuses to
+load more than TIMESERIES_MAX_POINTS points, callers then fall back to SQL.
+
+Loaded with one bulk query per database (change points are picked out in
+sql, window functions), appended to by db_sync on ingest
+and topped up from the db every REFRESH_INTERVAL seconds (snapshots since the
+high-water mark day). Older history only changes on bulk imports, a
+fingerprint of it triggers a full reload.
+'''
+
+load_dotenv()
+
+EPOCH = date(1970, 1, 1)
+REFRESH_INTERVAL = 60 # seconds
+MAX_POINTS = int(os.getenv("TIMESERIES_MAX_POINTS", "20000000"))
+
+def day_number(d: date) -> int:
+    return (d - EPOCH).days
+
+def day_column(db, snapshots=Snapshot):
+    # calendar (UTC) day of a snapshot (snapshots: Snapshot or partitions.snapshots())
+    if db.get_bind().dialect.name == "postgresql":
+        return cast(snapshots.date, Date)
+    return func.date(snapshots.date, type_=Date)
+
+def _day_start(day: int) -> datetime:
+    return datetime.combine(EPOCH + timedelta(days=day), datetime.min.time(), tzinfo=timezone.utc)
+
+class GameSeries:
+    __slots__ = ("days", "minutes", "last_seen")
+
+    def __init__(self):
+        self.days = array("i")
+        self.minutes = array("i")
+        self.last_seen = None
+
+    def record(self, day: int, playtime: int):
+        # snapshots arrive in date order, several on one day => the last one wins
+        if self.days and self.days[-1] == day:
+            if len(self.days) > 1 and self.minutes[-2] == playtime:
+                # the day's change was undone, drop the point again
+                self.days.pop()
+                self.minutes.pop()
+            else:
+                self.minutes[-1] = playtime
+        elif not self.days or self.minutes[-1] != playtime:
+            self.days.append(day)
+            self.minutes.append(playtime)
+        if self.last_seen is None or day > self.last_seen:
+            self.last_seen = day
+
+    def value_at(self, day: int) -> int:
+        '''Cumulative playtime at the end of `day`, 0 before the first snapshot'''
+        idx = bisect_right(self.days, day) - 1
+        return self.minutes[idx] if idx >= 0 else 0
+
+    def values_at(self, days):
+        '''value_at for a numpy array of days, in one vectorized pass'''
+        # copies, a view would block appends to the arrays while it lives
+        points = np.array(self.days, dtype=np.int32)
+        minutes = np.array(self.minutes, dtype=np.int64)
+        idx = np.searchsorted(points, days, side="right") - 1
+        return np.where(idx >= 0, minutes[np.maximum(idx, 0)], 0)
+
+class TimeSeriesStore:
+    def __init__(self):
+        self.games = {}
+        self.points = 0
+        self.high_water = None     # latest snapshot day applied
+        self.fingerprint = None    # (day, count, sum) of the snapshots before that day
+        self.loaded = False
+        self.disabled = False
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def _apply(self, rows):
+        # rows: (appid, snapshot datetime, playtime) in (appid, date) order
+        for appid, snap_date, playtime in rows:
+            series = self.games.get(appid)
+            if series is None:
+                series = self.games[appid] = GameSeries()
+            before = len(series.days)
+            day = day_number(snap_date.date())
+            series.record(day, playtime)
+            self.points += len(series.days) - before
+            if self.high_water is None or day > self.high_water:
+                self.high_water = day
+
+    def _fingerprint(self, db, day: int):
+        S = partitions.snapshots(db, end=_day_start(day))
+        count, total = (
+            db.query(func.count(S.id), func.coalesce(func.sum(S.playtime_forever), 0))
+            .filter(S.date < _day_start(day))
+            .one()
+        )
+        return (day, count, total)
+
+    def load(self, db):
+        started = time.perf_counter()
+        self.games, self.points, self.high_water, self.disabled = {}, 0, None, False
+        S = partitions.snapshots(db)
+        total = db.query(func.count(S.id)).scalar() or 0
+
+        # only the change points leave the db: last snapshot of each game-day,
+        # kept when it differs from the game's previous day
+        day = day_column(db, S)
+        next_day = func.lead(day).over(partition_by=S.appid, order_by=S.date)
+        per_snapshot = db.query(
+            S.appid.label("appid"),
+            day.label("day"),
+            S.playtime_forever.label("playtime"),
+            next_day.label("next_day"),
+        ).subquery()
+        per_day = (
+            db.query(
+                per_snapshot.c.appid,
+                per_snapshot.c.day,
+                per_snapshot.c.playtime,
+                func.lag(per_snapshot.c.playtime).over(partition_by=per_snapshot.c.appid, order_by=per_snapshot.c.day).label("previous"),
+            )
+            .filter((per_snapshot.c.next_day == None) | (per_snapshot.c.next_day != per_snapshot.c.day))
+            .subquery()
+        )
+        rows = (
+            db.query(per_day.c.appid, per_day.c.day, per_day.c.playtime)
+            .filter((per_day.c.previous == None) | (per_day.c.previous != per_day.c.playtime))
+            .order_by(per_day.c.appid, per_day.c.day)
+            .yield_per(50000)
+        )
+        for appid, snap_day, playtime in rows:
+            series = self.games.get(appid)
+            if series is None:
+                series = self.games[appid] = GameSeries()
+            series.days.append(day_number(snap_day))
+            series.minutes.append(playtime)
+            self.points += 1
+            if self.points > MAX_POINTS:
+                print(f"Time series store disabled, more than {MAX_POINTS} change points")
+                self.games, self.points, self.disabled = {}, 0, True
+                break
+
+        for appid, last_seen in db.query(S.appid, func.max(day)).group_by(S.appid):
+            if appid in self.games:
+                self.games[appid].last_seen = day_number(last_seen)
+        self.high_water = max((s.last_seen for s in self.games.values()), default=None)
+        self.fingerprint = self._fingerprint(db, self.high_water) if self.high_water is not None else None
+        self.loaded = True
+        self.checked_at = time.time()
+        print(f"Loaded time series store: {len(self.games)} games, {self.points} change points from {total} snapshots ({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+    def refresh(self, db, force: bool = False):
+        if not force and time.time() - self.checked_at < REFRESH_INTERVAL:
+            return
+        with self.lock:
+            if not self.loaded or self.disabled or self.high_water is None:
+                self.load(db)
+                return
+            if self._fingerprint(db, self.fingerprint[0]) != self.fingerprint:
+                # history before the high-water mark changed (bulk import)
+                self.load(db)
+                return
+            # the high-water day is re-read since its snapshots can still change
+            S = partitions.snapshots(db, start=_day_start(self.high_water))
+            rows = (
+                db.query(S.appid, S.date, S.playtime_forever)
+                .filter(S.date >= _day_start(self.high_water))
+                .order_by(S.appid, S.date)
+                .all()
+            )
+            self._apply(rows)
+            self.fingerprint = self._fingerprint(db, self.high_water)
+            self.checked_at = time.time()
+
+    def record_ingest(self, snap_date: datetime, playtimes):
+        '''Apply an ingest (appid, playtime pairs at snap_date) right away'''
+        with self.lock:
+            if self.loaded and not self.disabled:
+                self._apply((appid, snap_date, playtime) for appid, playtime in playtimes)
+
+    # reads take the lock too, an ingest may be appending to the arrays
+
+    def daily(self, appid: int, start: date, count: int):
+        '''Cumulative playtime of a game for `count` days from `start` (numpy int64)'''
+        days = np.arange(day_number(start), day_number(start) + count, dtype=np.int32)
+        with self.lock:
+            series = self.games.get(appid)
+            if series is None:
+                return np.zeros(count, dtype=np.int64)
+            return series.values_at(days)
+
+    def played_on(self, appid: int, days) -> list:
+        '''For each date in `days`: did the game's playtime go up that day'''
+        day_numbers = np.array([day_number(d) for d in days], dtype=np.int32)
+        with self.lock:
+            series = self.games.get(appid)
+            if series is None or not len(day_numbers):
+                return [False] * len(day_numbers)
+            return (series.values_at(day_numbers) > series.values_at(day_numbers - 1)).tolist()
+
+    def period_deltas(self, start: date) -> dict:
+        '''
+        appid -> max - min playtime from `start` on, for every game seen so far
+        (same as the sql version, at day granularity)
+        '''
+        start_day = day_number(start)
+        deltas = {}
+        with self.lock:
+            for appid, series in self.games.items():
+                if not series.days:
+                    continue
+                # the value carried into the window + every change inside it
+                window = series.minutes[max(bisect_right(series.days, start_day) - 1, 0):]
+                deltas[appid] = max(window) - min(window)
+        return deltas
+
+    def playtimes_at(self, day: date) -> dict:
+        '''appid -> cumulative playtime at the end of `day`, for the games seen by then'''
+        number = day_number(day)
+        with self.lock:
+            return {
+                appid: series.value_at(number)
+                for appid, series in self.games.items()
+                if series.days and series.days[0] <= number
+            }
+
+    def played_days(self, start: date, end: date):
+        '''
+        Every day from start to end a game's playtime went up, as three numpy
+        arrays: appid, day offset from start, minutes played that day
+        (a game's first day isn't counted, nothing to compare it to)
+        '''
+        first, last = day_number(start), day_number(end)
+        appids, offsets, minutes = [], [], []
+        with self.lock:
+            for appid, series in self.games.items():
+                if len(series.days) < 2 or series.days[-1] < first:
+                    continue
+                days = np.array(series.days, dtype=np.int32)
+                deltas = np.diff(np.array(series.minutes, dtype=np.int64))
+                # deltas[k] happened on days[k + 1]
+                played = (deltas > 0) & (days[1:] >= first) & (days[1:] <= last)
+                if played.any():
+                    offsets.append(days[1:][played] - first)
+                    minutes.append(deltas[played])
+                    appids.append(np.full(int(played.sum()), appid, dtype=np.int64))
+        if not appids:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return np.concatenate(appids), np.concatenate(offsets).astype(np.int64), np.concatenate(minutes)
+
+# one store per database (main db, demo db), like the trend series
+_stores = {}
+_stores_lock = threading.Lock()
+
+def _store_key(db):
+    return db_namespace(db)
+
+def get_store(db):
+    '''Up to date store for the session's database, None if it is too big to keep in memory'''
+    key = _store_key(db)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = TimeSeriesStore()
+    store.refresh(db)
+    return None if store.disabled else store
+
+def played_days(db, start: date, end: date):
+    '''
+    (appid, day offset from start, minutes) numpy arrays of every day from
+    start to end a game was played: from the store, or one query when the
+    store is disabled (same arrays)
+    '''
+    store = get_store(db)
+    if store:
+        return store.played_days(start, end)
+
+    # the whole history up to end is read, so the first change of the range
+    # is compared with the snapshot carried into it, however old it is
+    upper = _day_start(day_number(end) + 1)
+    S = partitions.snapshots(db, end=upper)
+    deltas = (
+        db.query(
+            S.appid.label("appid"),
+            day_column(db, S).label("day"),
+            (S.playtime_forever - func.lag(S.playtime_forever).over(partition_by=S.appid, order_by=S.date)).label("delta")
+        )
+        .filter(S.date < upper)
+        .subquery()
+    )
+    rows = (
+        db.query(deltas.c.appid, deltas.c.day, func.sum(deltas.c.delta))
+        .filter(deltas.c.day >= start, deltas.c.delta > 0)
+        .group_by(deltas.c.appid, deltas.c.day)
+        .all()
+    )
+    return (
+        np.array([r[0] for r in rows], dtype=np.int64),
+        np.array([(r[1] - start).days for r in rows], dtype=np.int64),
+        np.array([r[2] for r in rows], dtype=np.int64)
+    )
+
+def record_ingest(db, snap_date: datetime, playtimes):
+    store = _stores.get(_store_key(db))
+    if store is not None:
+        store.record_ingest(snap_date, playtimes)
+
+def reset_store(db):
+    '''Full reload on next use (after a bulk import), the replicas' stores too'''
+    key = _store_key(db)
+    for name, store in list(_stores.items()):
+        if name == key or name.startswith(f"{key}@"):
+            with store.lock:
+                store.loaded = False
+                store.checked_at = 0.0
+
+def preload():
+    '''Load the main db's store at startup instead of on the first request'''
+    db = SessionLocal()
+    try:
+        get_store(db)
+    finally:
+        db.close()
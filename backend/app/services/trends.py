@@ -0,0 +1,180 @@
+# /backend/app/services/trends.py
+import threading
+import time
+from array import array
+from datetime import date, timedelta
+
+from sqlalchemy import func
+from backend.app.db.database import db_namespace
+from backend.app.db.models import DailySummary
+
+'''
+Rolling window trends over DailySummary.total_playtime_minutes.
+
+The daily totals are loaded once per database into a dense array (one slot per
+calendar day, missing days are 0) along with its prefix sums, so the total of
+any window is prefix[end] - prefix[start], O(1) no matter the window size.
+
+New summaries are applied in place (record_summary) and the array is topped up
+incrementally from the db every REFRESH_INTERVAL seconds, so a summary written
+by another worker shows up without a full reload. Older days only change when
+summaries are rebuilt (bulk import), a count/sum fingerprint of them catches
+that and triggers a full reload.
+'''
+
+DEFAULT_WINDOWS = [7]
+MAX_WINDOW_DAYS = 3650
+REFRESH_INTERVAL = 60 # seconds
+
+class TrendSeries:
+    def __init__(self):
+        self.start = None            # date of index 0
+        self.totals = array("q")     # minutes per day
+        self.prefix = array("q", [0])  # prefix[i] = sum(totals[:i])
+        self.last_date = None        # latest summary date loaded
+        self.fingerprint = None      # (count, sum) of the rows before last_date
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def _set_day(self, day: date, total: int):
+        if self.start is None:
+            self.start = day
+        if day < self.start:
+            # older than anything loaded, shift everything right
+            pad = (self.start - day).days
+            self.totals = array("q", [0] * pad) + self.totals
+            self.start = day
+        idx = (day - self.start).days
+        if idx >= len(self.totals):
+            self.totals.extend([0] * (idx - len(self.totals) + 1))
+        self.totals[idx] = total or 0
+        if self.last_date is None or day > self.last_date:
+            self.last_date = day
+        return idx
+
+    def _rebuild_prefix(self, from_idx: int = 0):
+        # only the tail after the first changed day needs recomputing
+        del self.prefix[from_idx + 1:]
+        running = self.prefix[from_idx]
+        for value in self.totals[from_idx:]:
+            running += value
+            self.prefix.append(running)
+
+    def apply(self, rows):
+        with self.lock:
+            first_idx = None
+            for day, total in rows:
+                start_before = self.start
+                idx = self._set_day(day, total)
+                if start_before is not None and self.start != start_before:
+                    first_idx = 0
+                first_idx = idx if first_idx is None else min(first_idx, idx)
+            if first_idx is not None:
+                self._rebuild_prefix(first_idx)
+
+    def reset(self):
+        with self.lock:
+            self.start = None
+            self.totals = array("q")
+            self.prefix = array("q", [0])
+            self.last_date = None
+            self.fingerprint = None
+
+    def _fingerprint(self, db):
+        return tuple(
+            db.query(func.count(DailySummary.id), func.coalesce(func.sum(DailySummary.total_playtime_minutes), 0))
+            .filter(DailySummary.date < self.last_date)
+            .one()
+        )
+
+    def refresh(self, db, force: bool = False):
+        if not force and time.time() - self.checked_at < REFRESH_INTERVAL:
+            return
+        if self.last_date is not None and self._fingerprint(db) != self.fingerprint:
+            self.reset()
+        query = db.query(DailySummary.date, DailySummary.total_playtime_minutes)
+        if self.last_date is not None:
+            # the latest day is re-read since its row can still change
+            query = query.filter(DailySummary.date >= self.last_date)
+        self.apply(query.order_by(DailySummary.date).all())
+        if self.last_date is not None:
+            self.fingerprint = self._fingerprint(db)
+        self.checked_at = time.time()
+
+    def window_total(self, end: date, days: int) -> int:
+        # sum of the `days` days ending at `end` (inclusive)
+        if self.start is None:
+            return 0
+        end_idx = (end - self.start).days
+        hi = min(end_idx + 1, len(self.totals))
+        lo = max(end_idx - days + 1, 0)
+        if hi <= lo:
+            return 0
+        return self.prefix[hi] - self.prefix[lo]
+
+    def compare(self, end: date, days: int) -> dict:
+        # window vs the window right before it
+        with self.lock:
+            current = self.window_total(end, days)
+            previous = self.window_total(end - timedelta(days=days), days)
+        return {
+            "days": days,
+            "start": (end - timedelta(days=days - 1)).isoformat(),
+            "end": end.isoformat(),
+            "total_playtime": current,
+            "previous_total_playtime": previous,
+            "change": _format_change(current, previous)
+        }
+
+def _format_change(current: int, previous: int) -> str:
+    change = 0 if previous == 0 else ((current - previous) / previous) * 100
+    return f"{change:+.1f}%"
+
+# one series per database (main db, demo db, ...)
+_series = {}
+_series_lock = threading.Lock()
+
+def _series_key(db):
+    # replicas get their own series, one that lags must not replace the primary's
+    return db_namespace(db)
+
+def get_series(db) -> TrendSeries:
+    key = _series_key(db)
+    with _series_lock:
+        series = _series.get(key)
+        if series is None:
+            series = _series[key] = TrendSeries()
+    series.refresh(db)
+    return series
+
+def reset_series(db):
+    '''Full reload on next use (after summaries were rebuilt), the replicas' series too'''
+    key = _series_key(db)
+    for name, series in list(_series.items()):
+        if name == key or name.startswith(f"{key}@"):
+            series.reset()
+            series.checked_at = 0.0
+
+def record_summary(db, day: date, total: int):
+    '''Apply a freshly written summary to an already loaded series'''
+    series = _series.get(_series_key(db))
+    if series is not None and series.start is not None:
+        series.apply([(day, total)])
+
+def parse_windows(raw) -> list:
+    '''Parse "7,30,90" into [7, 30, 90], raises ValueError on bad input'''
+    if not raw:
+        return list(DEFAULT_WINDOWS)
+    windows = []
+    for part in str(raw).split(","):
+        part = part.strip()
+        if not part:
+            continue
+        days = int(part)
+        if days < 1 or days > MAX_WINDOW_DAYS:
+            raise ValueError(f"window must be between 1 and {MAX_WINDOW_DAYS} days")
+        if days not in windows:
+            windows.append(days)
+    if not windows:
+        raise ValueError("no windows given")
+    return windows
@@ -0,0 +1,439 @@
+# /backend/app/tracing.py
+import contextvars
+import json
+import os
+import random
+import re
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+'''
+Distributed tracing: a trace per request (and per ingest / metadata job)
+with spans around the route handler, cache lookups, SQL statements, work
+offloaded with profiling.to_thread and calls to Steam.
+
+Off unless TRACING_EXPORTER is set, then TRACING_SAMPLE_RATE of the requests
+are traced (an incoming W3C `traceparent` header decides for itself, jobs are
+always traced). Finished traces are handed to the exporter on a background
+thread, requests never wait for it:
+- jsonl  : one span per line in TRACING_JSONL_PATH, for offline analysis
+- sentry : transactions to SENTRY_DSN (sentry-sdk)
+- otlp   : OTLP/HTTP JSON to OTEL_EXPORTER_OTLP_ENDPOINT (a collector, Jaeger, Tempo...)
+More than one can be given (comma separated), others can be added with
+register_exporter(). Traced responses carry the trace id in `x-trace-id`.
+
+Spans made outside a sampled trace are a shared no-op, instrumented code
+doesn't need to check.
+'''
+
+load_dotenv()
+
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "")
+SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))
+JSONL_PATH = os.getenv("TRACING_JSONL_PATH", "./traces/spans.jsonl")
+SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "steamvault")
+MAX_SPANS = int(os.getenv("TRACING_MAX_SPANS", "2000")) # per trace, the rest is counted but dropped
+STATEMENT_CHARS = 2000
+
+# span running in the current context (None = not traced)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+_exporters = []
+_export_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tracing")
+
+
+class Trace:
+    def __init__(self, trace_id=None, remote_parent_id=None):
+        self.id = trace_id or secrets.token_hex(16)
+        self.remote_parent_id = remote_parent_id
+        self.root = None
+        self.spans = []
+        self.dropped = 0
+        self.exported = False
+
+
+class Span:
+    def __init__(self, trace: Trace, name: str, op: str, parent_id=None, attrs=None):
+        self.trace = trace
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.op = op
+        self.attrs = dict(attrs or {})
+        self.status = "ok"
+        self.start = time.time()
+        self.end = None
+        self._started = time.perf_counter()
+
+    @property
+    def trace_id(self):
+        return self.trace.id
+
+    def set(self, key: str, value):
+        self.attrs[key] = value
+
+    def fail(self, error: BaseException):
+        self.status = "error"
+        self.attrs["error"] = f"{type(error).__name__}: {error}"
+
+    def child(self, name: str, op: str, attrs=None) -> "Span":
+        return Span(self.trace, name, op, self.span_id, attrs)
+
+    def finish(self):
+        self.end = self.start + (time.perf_counter() - self._started)
+        trace = self.trace
+        if trace.exported:
+            return # outlived its trace (e.g. a task the request left running)
+        if len(trace.spans) < MAX_SPANS or self is trace.root:
+            trace.spans.append(self)
+        else:
+            trace.dropped += 1
+        if self is trace.root:
+            trace.exported = True
+            if trace.dropped:
+                self.attrs["spans_dropped"] = trace.dropped
+            _export_executor.submit(_export, list(trace.spans))
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace.id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "op": self.op,
+            "start": self.start,
+            "end": self.end,
+            "duration_ms": round((self.end - self.start) * 1000, 3),
+            "status": self.status,
+            "attrs": self.attrs
+        }
+
+
+class _NoopSpan:
+    trace_id = None
+
+    def set(self, key, value):
+        pass
+
+    def fail(self, error):
+        pass
+
+NOOP_SPAN = _NoopSpan()
+
+
+def enabled() -> bool:
+    return bool(_exporters)
+
+def current():
+    '''Span running in this context, None when not traced'''
+    return _current_span.get()
+
+@contextmanager
+def _running(span: Span):
+    token = _current_span.set(span)
+    try:
+        yield span
+    except HTTPException as e:
+        # a 404 is an answer, not a failure
+        if e.status_code >= 500:
+            span.fail(e)
+        span.set("http.status_code", e.status_code)
+        raise
+    except BaseException as e:
+        span.fail(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        span.finish()
+
+@contextmanager
+def span(name: str, op: str = "function", **attrs):
+    '''Child span of the current one (no-op outside a sampled trace)'''
+    parent = _current_span.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    with _running(parent.child(name, op, attrs)) as child:
+        yield child
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+@contextmanager
+def trace(name: str, op: str, sampled=None, traceparent=None, **attrs):
+    '''
+    New trace with a root span, always a new one even inside another trace.
+    sampled: None = TRACING_SAMPLE_RATE (or the traceparent's flag), True / False forces it
+    '''
+    trace_id = remote_parent_id = None
+    match = _TRACEPARENT.match(traceparent or "")
+    if match:
+        trace_id, remote_parent_id = match.group(1), match.group(2)
+        if sampled is None:
+            sampled = bool(int(match.group(3), 16) & 1)
+    if sampled is None:
+        sampled = random.random() < SAMPLE_RATE
+
+    if not _exporters or not sampled:
+        token = _current_span.set(None)
+        try:
+            yield NOOP_SPAN
+        finally:
+            _current_span.reset(token)
+        return
+
+    new_trace = Trace(trace_id, remote_parent_id)
+    root = new_trace.root = Span(new_trace, name, op, remote_parent_id, attrs)
+    with _running(root):
+        yield root
+
+
+# ---- instrumentation ----
+
+class TracedRoute(APIRoute):
+    '''APIRoute with a span around the handler (dependencies, body and serialization included)'''
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+        name = f"{self.endpoint.__module__.rsplit('.', 1)[-1]}.{self.endpoint.__name__}"
+
+        async def traced_handler(request):
+            with span(name, op="http.handler"):
+                return await handler(request)
+        return traced_handler
+
+
+class TracingMiddleware:
+    '''
+    Plain ASGI middleware, a root span per request named after the matched
+    route (GET /analytics/top_games, not the raw path)
+    '''
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _exporters:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for header, value in scope["headers"]:
+            if header == b"traceparent":
+                traceparent = value.decode("latin-1")
+        method = scope["method"]
+        with trace(f"{method} {scope['path']}", "http.server", traceparent=traceparent, **{"http.method": method, "http.target": scope["path"]}) as root:
+            if root is NOOP_SPAN:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    root.set("http.status_code", message["status"])
+                    if message["status"] >= 500:
+                        root.status = "error"
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", root.trace_id.encode())]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace_id)
+            finally:
+                route = scope.get("route")
+                if route is not None and hasattr(route, "path"):
+                    root.name = f"{method} {route.path}"
+                    root.set("http.route", route.path)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = _current_span.get()
+    if parent is None:
+        return
+    sql = parent.child(statement.split(None, 1)[0].upper() if statement.strip() else "SQL", "db", {
+        "db.system": conn.dialect.name,
+        "db.statement": statement[:STATEMENT_CHARS],
+        "db.executemany": executemany
+    })
+    conn.info.setdefault("trace_spans", []).append(sql)
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_span.get() is None:
+        return
+    spans = conn.info.get("trace_spans")
+    if spans:
+        sql = spans.pop()
+        if cursor is not None and cursor.rowcount is not None and cursor.rowcount >= 0:
+            sql.set("db.rowcount", cursor.rowcount)
+        sql.finish()
+
+def _handle_error(context):
+    # after_cursor_execute doesn't run for failed statements
+    if _current_span.get() is None or context.connection is None:
+        return
+    spans = context.connection.info.get("trace_spans")
+    if spans:
+        sql = spans.pop()
+        sql.fail(context.original_exception)
+        sql.finish()
+
+
+# ---- exporters ----
+
+class JsonlExporter:
+    '''One JSON object per span and line, appended to TRACING_JSONL_PATH'''
+    def __init__(self, path: str = None):
+        self.path = path or JSONL_PATH
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans):
+        with open(self.path, "a") as f:
+            for s in spans:
+                f.write(json.dumps(s.to_dict(), default=str) + "\n")
+
+
+class SentryExporter:
+    '''Every trace as one Sentry transaction (root span) with its spans'''
+    def __init__(self):
+        import sentry_sdk # optional, only needed for this exporter
+        dsn = os.getenv("SENTRY_DSN")
+        if not dsn:
+            raise ValueError("SENTRY_DSN is not set")
+        # our own spans only, no automatic integrations / sampling on the sentry side
+        sentry_sdk.init(dsn=dsn, environment=os.getenv("SENTRY_ENVIRONMENT"), default_integrations=False)
+        self.sdk = sentry_sdk
+
+    @staticmethod
+    def _span(s: Span) -> dict:
+        return {
+            "trace_id": s.trace.id,
+            "span_id": s.span_id,
+            "parent_span_id": s.parent_id,
+            "op": s.op,
+            "description": s.attrs.get("db.statement", s.name),
+            "start_timestamp": s.start,
+            "timestamp": s.end,
+            "status": "ok" if s.status == "ok" else "internal_error",
+            "data": s.attrs
+        }
+
+    def export(self, spans):
+        root = spans[-1] # the root finishes last
+        self.sdk.capture_event({
+            "type": "transaction",
+            "transaction": root.name,
+            "transaction_info": {"source": "route" if root.op == "http.server" else "task"},
+            "start_timestamp": root.start,
+            "timestamp": root.end,
+            "contexts": {"trace": {
+                "trace_id": root.trace.id,
+                "span_id": root.span_id,
+                "parent_span_id": root.parent_id,
+                "op": root.op,
+                "status": "ok" if root.status == "ok" else "internal_error",
+                "data": root.attrs
+            }},
+            "spans": [self._span(s) for s in spans if s is not root]
+        })
+
+
+class OtlpExporter:
+    '''OTLP/HTTP with the JSON encoding, no opentelemetry packages needed'''
+    KINDS = {"http.server": 2, "http.client": 3, "db": 3} # SERVER, CLIENT, everything else INTERNAL
+
+    def __init__(self):
+        endpoint = os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT")
+        if not endpoint:
+            endpoint = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318").rstrip("/") + "/v1/traces"
+        self.endpoint = endpoint
+        headers = {}
+        for pair in os.getenv("OTEL_EXPORTER_OTLP_HEADERS", "").split(","):
+            if "=" in pair:
+                key, value = pair.split("=", 1)
+                headers[key.strip()] = value.strip()
+        self.client = httpx.Client(timeout=10, headers=headers)
+
+    @staticmethod
+    def _value(value) -> dict:
+        if isinstance(value, bool):
+            return {"boolValue": value}
+        if isinstance(value, int):
+            return {"intValue": str(value)}
+        if isinstance(value, float):
+            return {"doubleValue": value}
+        return {"stringValue": str(value)}
+
+    def _span(self, s: Span) -> dict:
+        result = {
+            "traceId": s.trace.id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": self.KINDS.get(s.op, 1),
+            "startTimeUnixNano": str(int(s.start * 1e9)),
+            "endTimeUnixNano": str(int(s.end * 1e9)),
+            "attributes": [{"key": k, "value": self._value(v)} for k, v in {"op": s.op, **s.attrs}.items()],
+            "status": {"code": 1} if s.status == "ok" else {"code": 2, "message": str(s.attrs.get("error", ""))}
+        }
+        if s.parent_id:
+            result["parentSpanId"] = s.parent_id
+        return result
+
+    def export(self, spans):
+        payload = {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "steamvault"}, "spans": [self._span(s) for s in spans]}]
+        }]}
+        self.client.post(self.endpoint, json=payload).raise_for_status()
+
+
+EXPORTERS = {"jsonl": JsonlExporter, "sentry": SentryExporter, "otlp": OtlpExporter}
+
+def register_exporter(name: str, factory):
+    '''factory() -> object with export(spans), usable as TRACING_EXPORTER=name'''
+    EXPORTERS[name] = factory
+
+def _export(spans):
+    for exporter in _exporters:
+        try:
+            exporter.export(spans)
+        except Exception as e:
+            print(f"[TRACING] {type(exporter).__name__} failed: {e}")
+
+def flush(timeout: float = 10):
+    '''Wait for the traces handed to the exporters so far (shutdown, scripts)'''
+    _export_executor.submit(lambda: None).result(timeout=timeout)
+
+_sql_hooked = False
+
+def configure(exporter: str = None):
+    '''Set up the exporters (default TRACING_EXPORTER) and the SQL hooks, returns the exporter names in use'''
+    global _sql_hooked
+    _exporters.clear()
+    names = []
+    for name in (exporter if exporter is not None else TRACING_EXPORTER).split(","):
+        name = name.strip()
+        if not name:
+            continue
+        if name not in EXPORTERS:
+            print(f"[TRACING] unknown exporter {name!r}, expected one of {', '.join(EXPORTERS)}")
+            continue
+        try:
+            _exporters.append(EXPORTERS[name]())
+            names.append(name)
+        except Exception as e:
+            print(f"[TRACING] {name} exporter disabled: {e}")
+
+    if _exporters and not _sql_hooked:
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(Engine, "handle_error", _handle_error)
+        _sql_hooked = True
+    if names:
+        print(f"Tracing: {', '.join(names)}, sample rate {SAMPLE_RATE}")
+    return names
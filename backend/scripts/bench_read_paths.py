@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+# backend/scripts/bench_read_paths.py
+"""
+Benchmark the Core read paths (services/analytics.py, services/games.py)
+against the ORM queries they replaced, on the demo database (in memory, like
+the demo API).
+
+    python backend/scripts/bench_read_paths.py
+    python backend/scripts/bench_read_paths.py --repeat 500 --json bench.json
+    DEMO_DB_PATH=/tmp/big_demo.db python backend/scripts/bench_read_paths.py   # e.g. a load_test.py --generate db
+
+For every query both versions run --repeat times on one session, after a
+warm up (statement caches filled) and a check that they return the same
+response. Reported per call and per returned row:
+- cpu: process CPU time (the db is in memory, so this includes SQLite)
+- peak: highest memory allocated during one call (tracemalloc, separate runs)
+compare_games is measured on its SQL path (the time series store is off).
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta, timezone
+
+# ensure project root is on path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+os.chdir(ROOT) # DEMO_DB_PATH default is relative
+
+from backend.app.db import demo_database
+from backend.app.db.models import DailySummary, Game, GameMetadata, GameStats, Snapshot
+from backend.app.services import analytics, db_sync, games, series, timeseries
+
+DEMO_REFERENCE_DATE = date(2025, 11, 15) # same as routes/demo/demo_routes.py
+
+
+# ---- the ORM versions, as they were before the Core rewrite ----
+
+def orm_summary_history(db, start_date=None, end_date=None, limit=90):
+    query = db.query(DailySummary).order_by(DailySummary.date.desc())
+    if start_date:
+        query = query.filter(DailySummary.date >= start_date)
+    if end_date:
+        query = query.filter(DailySummary.date <= end_date)
+    return [{
+        'id': s.id,
+        'new_games_count': s.new_games_count,
+        'average_playtime_per_game': s.average_playtime_per_game,
+        'most_played_appid': s.most_played_appid,
+        'most_played_minutes': s.most_played_minutes,
+        'date': s.date.isoformat(),
+        'total_playtime_minutes': s.total_playtime_minutes,
+        'total_games_tracked': s.total_games_tracked,
+        'total_playtime_change': s.total_playtime_change,
+        'most_played_name': s.most_played_name
+    } for s in reversed(query.limit(limit).all())]
+
+def orm_activity_heatmap(db, limit_days=90, reference_date=None):
+    start_date = reference_date - timedelta(days=limit_days)
+    summaries = db.query(DailySummary).filter(DailySummary.date >= start_date).order_by(DailySummary.date).all()
+    return [{"date": s.date.isoformat(), "total_playtime": s.total_playtime_minutes, "games_played": s.total_games_tracked} for s in summaries]
+
+def orm_search_games(db, q):
+    rows = (
+        db.query(Game.appid, Game.name, Game.img_icon_url, GameStats.current_playtime, GameStats.last_played)
+        .outerjoin(GameStats, GameStats.appid == Game.appid)
+        .filter(Game.name.ilike(f"%{q}%"))
+        .all()
+    )
+    return [{
+        "appid": appid, "name": name, "img_icon_url": img_icon_url, "playtime_forever": playtime,
+        "last_played": last_played.isoformat() if last_played else None
+    } for appid, name, img_icon_url, playtime, last_played in rows]
+
+def orm_game_details(db, appid, days=30, reference_date=None):
+    game = db.query(Game).filter_by(appid=appid).first()
+    stats = db.query(GameStats).filter_by(appid=appid).first()
+    metadata = db.query(GameMetadata).filter_by(appid=appid).first()
+    start = reference_date - timedelta(days=days)
+    # the playtime at the end of every day from the cutoff day on, carried forward
+    snaps = db.query(Snapshot.date, Snapshot.playtime_forever).filter(Snapshot.appid == appid).order_by(Snapshot.date).all()
+    by_day = {}
+    for d, p in snaps:
+        by_day[max(d.date(), start)] = p
+    rows = []
+    if by_day:
+        day, playtime = min(by_day), 0
+        while day <= max(max(by_day), reference_date):
+            playtime = by_day.get(day, playtime)
+            rows.append((datetime.combine(day, datetime.min.time()), playtime))
+            day += timedelta(days=1)
+    return {
+        "appid": game.appid,
+        "name": game.name,
+        "img_icon_url": game.img_icon_url,
+        "playtime_forever": stats.current_playtime if stats else None,
+        "first_seen": stats.first_snapshot_date.isoformat() if stats and stats.first_snapshot_date else None,
+        "last_played": stats.last_played.isoformat() if stats and stats.last_played else None,
+        "lifetime_rank": stats.lifetime_rank if stats else None,
+        "header_image": metadata.header_image if metadata else None,
+        "genres": json.loads(metadata.genres) if metadata and metadata.genres else [],
+        "categories": json.loads(metadata.categories) if metadata and metadata.categories else [],
+        "resolution": "day",
+        "history": [{"date": d.isoformat(), "playtime_forever": p} for d, p in rows]
+    }
+
+def orm_compare_games(db, appids, start_date, end_date):
+    days = (end_date - start_date).days + 1
+    range_start = datetime.combine(start_date, datetime.min.time(), tzinfo=timezone.utc)
+    range_end = datetime.combine(end_date + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    result = {}
+    for appid in appids:
+        snaps = (
+            db.query(Snapshot.date, Snapshot.playtime_forever)
+            .filter(Snapshot.appid == appid, Snapshot.date >= range_start, Snapshot.date < range_end)
+            .order_by(Snapshot.date)
+            .all()
+        )
+        snap_map = {}
+        for snap_date, playtime in snaps:
+            snap_map[snap_date.date()] = playtime
+        playtime, deltas = series.daily_series(start_date, days, snap_map)
+        dates, playtime, deltas = series.aggregate_daily(start_date, playtime, deltas, "day", None)
+        result[appid] = [
+            {"date": d.isoformat(), "playtime_forever": p, "daily_delta": delta}
+            for d, p, delta in zip(dates, playtime.tolist(), deltas.tolist())
+        ]
+    return result
+
+
+# ---- measuring ----
+
+def timestamp_formats(result) -> set:
+    # game_details history dates with the digits zeroed: every point is dated the same way, one format
+    return {re.sub(r"\d", "0", p["date"]) for p in result.get("history", [])} if isinstance(result, dict) else set()
+
+def count_rows(result) -> int:
+    # rows the db returned, roughly: list items / history points / compare points
+    if isinstance(result, list):
+        return len(result)
+    if "history" in result:
+        return 1 + len(result["history"])
+    return sum(len(points) for points in result.values())
+
+def cpu_per_call(func, repeat: int) -> float:
+    started = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - started) / repeat
+
+def peak_per_call(func, repeat: int) -> float:
+    peaks = []
+    tracemalloc.start()
+    try:
+        for _ in range(repeat):
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            result = func()
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+            del result
+    finally:
+        tracemalloc.stop()
+    return sorted(peaks)[len(peaks) // 2]
+
+def cases(db):
+    ref = DEMO_REFERENCE_DATE
+    appids = [a for (a,) in db.query(Game.appid).order_by(Game.appid).limit(3).all()]
+    start = ref - timedelta(days=365)
+    return [
+        ("summary_history", lambda: orm_summary_history(db), lambda: analytics.summary_history(session=db)),
+        ("summary_history_365", lambda: orm_summary_history(db, start, ref, 365), lambda: analytics.summary_history(start, ref, 365, session=db)),
+        ("activity_heatmap", lambda: orm_activity_heatmap(db, 365, ref), lambda: analytics.activity_heatmap(365, db, reference_date=ref)),
+        ("search_games", lambda: orm_search_games(db, "a"), lambda: games.search_games("a", db)),
+        ("game_details", lambda: orm_game_details(db, appids[0], 365, ref), lambda: games.game_details(appids[0], 365, db, reference_date=ref)),
+        ("compare_games", lambda: orm_compare_games(db, appids, start, ref), lambda: analytics.compare_games(appids, start, ref, db, reference_date=ref)),
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="ORM vs Core read path benchmark on the demo database")
+    parser.add_argument("--repeat", type=int, default=200, help="calls per query and version")
+    parser.add_argument("--json", help="also write the results here")
+    args = parser.parse_args()
+
+    demo_database.load_demo_database(prepare=db_sync.backfill_game_stats)
+    timeseries.get_store = lambda db: None # compare_games on its sql path
+    db = demo_database.SessionLocal()
+    results = []
+    try:
+        for name, orm, core in cases(db):
+            expected = orm()
+            if core() != expected:
+                print(f"{name}: Core and ORM responses differ, skipped")
+                continue
+            if len(timestamp_formats(expected)) > 1:
+                print(f"{name}: history dates mix formats {sorted(timestamp_formats(expected))}, skipped")
+                continue
+            rows = max(count_rows(expected), 1)
+            for func in (orm, core):
+                cpu_per_call(func, 10) # warm up, statement caches filled
+
+            row = {"query": name, "rows": rows}
+            for version, func in (("orm", orm), ("core", core)):
+                cpu = cpu_per_call(func, args.repeat)
+                peak = peak_per_call(func, max(args.repeat // 10, 5))
+                row[version] = {
+                    "cpu_us": round(cpu * 1e6, 1),
+                    "cpu_us_per_row": round(cpu * 1e6 / rows, 2),
+                    "peak_kb": round(peak / 1024, 1),
+                    "peak_bytes_per_row": round(peak / rows)
+                }
+            row["cpu_change"] = round(row["core"]["cpu_us"] / row["orm"]["cpu_us"] - 1, 3)
+            row["peak_change"] = round(row["core"]["peak_kb"] / row["orm"]["peak_kb"] - 1, 3) if row["orm"]["peak_kb"] else None
+            results.append(row)
+    finally:
+        db.close()
+
+    print(f"{'query':<22}{'rows':>6}{'orm us/row':>12}{'core us/row':>13}{'cpu':>8}{'orm B/row':>11}{'core B/row':>12}{'peak':>8}")
+    for r in results:
+        print(
+            f"{r['query']:<22}{r['rows']:>6}{r['orm']['cpu_us_per_row']:>12}{r['core']['cpu_us_per_row']:>13}{r['cpu_change']:>+8.0%}"
+            f"{r['orm']['peak_bytes_per_row']:>11}{r['core']['peak_bytes_per_row']:>12}{r['peak_change']:>+8.0%}"
+        )
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"repeat": args.repeat, "results": results}, f, indent=2)
+        print(f"Wrote {args.json}")
+
+if __name__ == "__main__":
+    main()
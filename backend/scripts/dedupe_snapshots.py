@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# backend/scripts/dedupe_snapshots.py
+"""
+Convert a dense snapshot history to change-only storage (SNAPSHOT_MODE=sparse,
+see backend/app/services/sparse.py): every snapshot equal to its game's
+previous one (same playtime and last_played) is deleted.
+
+    python backend/scripts/dedupe_snapshots.py --dry-run        # count only
+    python backend/scripts/dedupe_snapshots.py
+    python backend/scripts/dedupe_snapshots.py --since 2025-01-01 --json dedupe.json
+
+Before and after the delete it measures the snapshot table (rows, bytes of
+table + indexes, whole db) and times a set of analytics reads on their SQL
+paths (time series store and cache off, like bench_read_paths.py), median of
+--repeat calls each. The reads must return the same responses afterwards,
+the script says which ones don't. The db is compacted afterwards (VACUUM),
+then a new analytics bundle is built so running workers drop their caches.
+Set SNAPSHOT_MODE=sparse before the next ingest or daily rows come back.
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+# ensure project root is on path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from sqlalchemy import func, select, text
+from sqlalchemy.exc import OperationalError
+from backend.app.db.database import SessionLocal, engine, init_database
+from backend.app.db.models import GameStats
+from backend.app.services import analytics, bundle, cache, games, heatmap, partitions, sparse, timeseries
+
+def snapshot_rows(db) -> int:
+    return sum(db.execute(select(func.count()).select_from(t)).scalar() for t in partitions.live_tables(db))
+
+def snapshot_bytes(db):
+    '''bytes of the snapshot tables + their indexes, None when the db can't tell'''
+    if db.get_bind().dialect.name == "postgresql":
+        return db.execute(text("SELECT COALESCE(SUM(pg_total_relation_size(relid)), 0) FROM pg_partition_tree('snapshots')")).scalar()
+    names = ", ".join(f"'{t.name}'" for t in partitions.live_tables(db))
+    try:
+        # needs sqlite built with the dbstat table (most builds are)
+        return db.execute(text(f"SELECT SUM(pgsize) FROM dbstat WHERE name IN (SELECT name FROM sqlite_master WHERE tbl_name IN ({names}))")).scalar()
+    except OperationalError:
+        return None
+
+def database_bytes(db) -> int:
+    if db.get_bind().dialect.name == "postgresql":
+        return db.execute(text("SELECT pg_database_size(current_database())")).scalar()
+    return db.execute(text("PRAGMA page_count")).scalar() * db.execute(text("PRAGMA page_size")).scalar()
+
+def compact():
+    # outside of a transaction
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("VACUUM (ANALYZE) snapshots"))
+        else:
+            conn.execute(text("VACUUM"))
+            conn.execute(text("ANALYZE"))
+
+def reads(db, as_of: date):
+    '''name -> call of the analytics reads that scan snapshots'''
+    top = [a for (a,) in db.query(GameStats.appid).order_by(GameStats.lifetime_rank).limit(3).all()]
+    if not top:
+        # game_stats not backfilled yet: the games with the most playtime in their snapshots
+        S = partitions.snapshots(db)
+        top = [a for (a,) in db.query(S.appid).group_by(S.appid).order_by(func.max(S.playtime_forever).desc(), S.appid).limit(3).all()]
+    reads = {
+        "top_games_week": lambda: analytics.get_top_games("week", 1, 50, db, reference_date=as_of),
+        "top_games_month": lambda: analytics.get_top_games("month", 1, 50, db, reference_date=as_of),
+        "library_as_of": lambda: analytics.library_as_of(as_of - timedelta(days=30), 1, 100, db),
+        "summarize_day": lambda: analytics._summarize_day(db, as_of),
+        "played_days_84": lambda: [a.tolist() for a in timeseries.played_days(db, as_of - timedelta(days=83), as_of)],
+        "calendar_1y_top10": lambda: heatmap.activity_calendar(1, 10, db, reference_date=as_of),
+        "compare_games_90": lambda: analytics.compare_games(top, as_of - timedelta(days=90), as_of, db, reference_date=as_of),
+        "game_details_365": lambda: games.game_details(top[0], 365, db, reference_date=as_of),
+        "streaks_game": lambda: analytics.get_streaks(top[0], db),
+    }
+    return reads
+
+def measure(db, as_of: date, repeat: int) -> dict:
+    result = {"rows": snapshot_rows(db), "table_bytes": snapshot_bytes(db), "database_bytes": database_bytes(db), "ms": {}, "responses": {}}
+    for name, read in reads(db, as_of).items():
+        response = read()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            read()
+            timings.append((time.perf_counter() - started) * 1000)
+        result["ms"][name] = round(statistics.median(timings), 2)
+        result["responses"][name] = json.dumps(response, sort_keys=True, default=str)
+    return result
+
+def mixed_timestamps(report) -> bool:
+    # game_details history must date every point the same way (naive, day at midnight)
+    response = report["responses"].get("game_details_365")
+    history = json.loads(response)["history"] if response else []
+    return len({re.sub(r"\d", "0", p["date"]) for p in history}) > 1
+
+def change(before, after) -> str:
+    if not before or after is None:
+        return ""
+    return f"{after / before - 1:+.0%}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Delete snapshots that repeat the game's previous one (sparse storage)")
+    parser.add_argument("--since", type=date.fromisoformat, help="only rows from this day on (YYYY-MM-DD)")
+    parser.add_argument("--dry-run", action="store_true", help="count the redundant snapshots, change nothing")
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per read")
+    parser.add_argument("--json", help="also write the report here")
+    args = parser.parse_args()
+
+    init_database()
+    # the reads run on their sql paths: that is what the table size changes
+    timeseries.get_store = lambda db: None
+    cache.get_cache = lambda key: None
+    cache.set_cache = lambda *args, **kwargs: None
+
+    db = SessionLocal()
+    try:
+        if args.dry_run:
+            redundant = sparse.count_redundant(db, args.since)
+            rows = snapshot_rows(db)
+            print(f"{redundant:,} of {rows:,} snapshots repeat the previous one ({redundant / max(rows, 1):.0%})")
+            return
+
+        S = partitions.snapshots(db)
+        newest = db.query(func.max(S.date)).scalar()
+        if newest is None:
+            print("No snapshots")
+            return
+        as_of = newest.date()
+
+        before = measure(db, as_of, args.repeat)
+        started = time.perf_counter()
+        removed = sparse.dedupe(db, args.since)
+        db.commit()
+        deleted_s = time.perf_counter() - started
+        db.close()
+
+        compact()
+        db = SessionLocal()
+        after = measure(db, as_of, args.repeat)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print(f"Deleted {removed:,} snapshots in {deleted_s:.1f}s (reads as of {as_of})\n")
+    print(f"{'':<22}{'before':>16}{'after':>16}{'change':>9}")
+    for key, label in (("rows", "rows"), ("table_bytes", "table + indexes"), ("database_bytes", "database")):
+        b, a = before[key], after[key]
+        print(f"{label:<22}{'-' if b is None else f'{b:,}':>16}{'-' if a is None else f'{a:,}':>16}{change(b, a):>9}")
+    print(f"\n{'read (ms, median)':<22}{'before':>16}{'after':>16}{'change':>9}  same response")
+    differ = []
+    for name, ms in before["ms"].items():
+        same = before["responses"][name] == after["responses"][name]
+        if not same:
+            differ.append(name)
+        print(f"{name:<22}{ms:>16}{after['ms'][name]:>16}{change(ms, after['ms'][name]):>9}  {'yes' if same else 'NO'}")
+    if mixed_timestamps(before) or mixed_timestamps(after):
+        differ.append("game_details_365 (mixed timestamp formats)")
+
+    if args.json:
+        for report in (before, after):
+            report.pop("responses")
+        with open(args.json, "w") as f:
+            json.dump({"as_of": as_of.isoformat(), "removed": removed, "differ": differ, "before": before, "after": after}, f, indent=2)
+        print(f"Wrote {args.json}")
+
+    # the live data changed, summaries and game stats are still right
+    bundle.build_bundle()
+    if differ:
+        print(f"\nResponses changed: {', '.join(differ)}")
+        sys.exit(1)
+    if not sparse.SPARSE:
+        print("\nSet SNAPSHOT_MODE=sparse, otherwise the next ingest writes every game again.")
+
+if __name__ == "__main__":
+    main()
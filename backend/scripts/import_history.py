@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# backend/scripts/import_history.py
+"""
+Bulk import playtime history exported from other trackers.
+
+    python backend/scripts/import_history.py history.csv
+    python backend/scripts/import_history.py history.ndjson --chunk-size 100000
+    python backend/scripts/import_history.py history.csv --restart   # ignore the checkpoint
+
+- CSV (header: appid,date,playtime[,name]) or NDJSON ({"appid", "date", "playtime", "name"})
+- re-running the same command after a failure resumes where it stopped
+- daily summaries and game stats are rebuilt at the end
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# ensure project root is on path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend.app.db.database import init_database
+from backend.app.services import importer
+
+def print_progress(stats):
+    sys.stdout.write(
+        f"\r{stats['rows_read']:,} rows ({stats['rows_per_second']:,} rows/s), "
+        f"{stats['snapshots_inserted']:,} snapshots, {stats['duplicates_skipped']:,} duplicates, "
+        f"{stats['rows_invalid']:,} invalid"
+    )
+    sys.stdout.flush()
+
+def main():
+    parser = argparse.ArgumentParser(description="Import playtime history (CSV / NDJSON)")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=importer.FORMATS, default=None, help="default: from the file extension")
+    parser.add_argument("--chunk-size", type=int, default=importer.CHUNK_SIZE)
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint and start over")
+    args = parser.parse_args()
+
+    init_database()
+    started = time.perf_counter()
+    try:
+        stats = importer.import_history(args.path, args.format, args.chunk_size, resume=not args.restart, progress=print_progress)
+    except importer.ImportFormatError as e:
+        print(f"\n{e}")
+        sys.exit(2)
+    except Exception as e:
+        print(f"\nImport failed: {e}\nRun the same command again to resume.")
+        sys.exit(1)
+
+    print(
+        f"\nDone in {time.perf_counter() - started:.1f}s: {stats['snapshots_inserted']:,} snapshots "
+        f"({stats['first_day']} .. {stats['last_day']}), {stats['games_created']} new games, "
+        f"{stats['summaries_rebuilt']} daily summaries rebuilt"
+    )
+    for error in stats["errors"]:
+        print(f"  skipped {error}")
+    if stats["rows_invalid"] > len(stats["errors"]):
+        print(f"  ... {stats['rows_invalid'] - len(stats['errors'])} more invalid rows")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,427 @@
+#!/usr/bin/env python3
+# backend/scripts/load_test.py
+"""
+Load test the demo API: boots it in demo mode, drives a weighted mix of
+/demo/analytics/* and /demo/games/* requests at increasing concurrency and
+writes a JSON report (throughput, latency percentiles, error rate and the
+server's cache hit ratio per level).
+
+    python backend/scripts/load_test.py                          # steamvault_demo.db
+    python backend/scripts/load_test.py --levels 1,8,32,128 --duration 30
+    python backend/scripts/load_test.py --generate 5000 --days 730 --db /tmp/big_demo.db
+    python backend/scripts/load_test.py --url http://127.0.0.1:8000   # a server that is already running
+    python backend/scripts/load_test.py --compare loadtests/old.json  # print the change vs an older report
+
+- the server runs as a separate uvicorn process (--workers, default 1); cache
+  stats are per process, with more workers only the one answering
+  /demo/stats/cache is counted
+- --generate builds a synthetic dataset (one snapshot per game per day, like
+  the real ingest, ending on the demo reference date) unless --db exists
+- --mix takes a JSON list of {"name", "path", "weight"}; paths can use
+  {appid}, {appid2}, {q} and {page}
+- the highest level within --slo-p99-ms and --slo-error-rate is reported as
+  the sustained throughput
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+
+# ensure project root is on path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+REPORT_VERSION = 1
+DEMO_DB = os.path.join(ROOT, "steamvault_demo.db")
+DEMO_REFERENCE_DATE = date(2025, 11, 15) # same as routes/demo/demo_routes.py
+
+# name, path, weight: mostly the dashboard's default requests (precomputed),
+# plus non-default parameters that are computed live
+DEFAULT_MIX = [
+    {"name": "summary_latest", "path": "/demo/analytics/summary/latest", "weight": 15},
+    {"name": "summary_history", "path": "/demo/analytics/summary/history", "weight": 5},
+    {"name": "top_games_lifetime", "path": "/demo/analytics/top_games", "weight": 10},
+    {"name": "top_games_week", "path": "/demo/analytics/top_games?period=week", "weight": 5},
+    {"name": "top_games_month", "path": "/demo/analytics/top_games?period=month", "weight": 5},
+    {"name": "top_games_paged", "path": "/demo/analytics/top_games?page={page}&limit=25", "weight": 3},
+    {"name": "trends", "path": "/demo/analytics/trends", "weight": 5},
+    {"name": "streaks", "path": "/demo/analytics/streaks", "weight": 3},
+    {"name": "streaks_game", "path": "/demo/analytics/streaks?appid={appid}", "weight": 3},
+    {"name": "heatmap", "path": "/demo/analytics/activity/heatmap", "weight": 4},
+    {"name": "calendar", "path": "/demo/analytics/activity/calendar", "weight": 3},
+    {"name": "compare", "path": "/demo/analytics/games/compare?appids={appid}&appids={appid2}", "weight": 4},
+    {"name": "game", "path": "/demo/games/{appid}", "weight": 15},
+    {"name": "game_90_days", "path": "/demo/games/{appid}?days=90", "weight": 5},
+    {"name": "search", "path": "/demo/games/search?q={q}", "weight": 10},
+]
+
+
+def generate_dataset(path, games: int, days: int, seed: int):
+    '''Synthetic demo db: `games` games snapshotted daily for `days` days up to DEMO_REFERENCE_DATE'''
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from backend.app.db.models import Base
+    from backend.app.services import analytics
+
+    rng = random.Random(seed)
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    first_day = DEMO_REFERENCE_DATE - timedelta(days=days - 1)
+    started = time.perf_counter()
+
+    conn = sqlite3.connect(path)
+    try:
+        conn.executemany(
+            "INSERT INTO games (appid, name, img_icon_url) VALUES (?, ?, ?)",
+            [(10 * (i + 1), f"Load Test Game {i + 1}", None) for i in range(games)]
+        )
+        # most games are barely touched, a few are played most days
+        activity = [rng.betavariate(0.4, 4) for _ in range(games)]
+        playtime = [rng.choice((0, 0, rng.randint(1, 20000))) for _ in range(games)]
+        last_played = [None] * games
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            snapshot_at = datetime.combine(day, datetime.min.time()) + timedelta(hours=20)
+            rows = []
+            for i in range(games):
+                if rng.random() < activity[i]:
+                    playtime[i] += rng.randint(10, 240)
+                    last_played[i] = snapshot_at - timedelta(minutes=rng.randint(0, 600))
+                # stored the way SQLAlchemy writes datetimes
+                rows.append((10 * (i + 1), playtime[i], last_played[i] and str(last_played[i]), str(snapshot_at)))
+            conn.executemany("INSERT INTO snapshots (appid, playtime_forever, last_played, date) VALUES (?, ?, ?, ?)", rows)
+        conn.commit()
+    finally:
+        conn.close()
+
+    db = sessionmaker(bind=engine, info={"db": "loadtest-generate"})()
+    try:
+        summaries = analytics.rebuild_daily_summaries(db, first_day, DEMO_REFERENCE_DATE, finalize_before=DEMO_REFERENCE_DATE + timedelta(days=1))
+        db.commit()
+    finally:
+        db.close()
+        engine.dispose()
+    print(f"Generated {path}: {games} games x {days} days, {summaries} summaries ({time.perf_counter() - started:.1f}s)")
+
+def describe_dataset(path):
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        return {
+            "path": path,
+            "size_bytes": os.path.getsize(path),
+            "games": conn.execute("SELECT count(*) FROM games").fetchone()[0],
+            "snapshots": conn.execute("SELECT count(*) FROM snapshots").fetchone()[0],
+        }
+    finally:
+        conn.close()
+
+
+def start_server(db_path, port: int, workers: int, log_path):
+    # a warm cache from an earlier run would skew the hit ratio
+    cache_path = os.path.join(tempfile.gettempdir(), f"steamvault-loadtest-cache-{port}.json")
+    if os.path.exists(cache_path):
+        os.remove(cache_path)
+    env = {**os.environ, "DEMO_MODE": "1", "DEMO_DB_PATH": db_path, "CACHE_SNAPSHOT_PATH": cache_path}
+    command = [
+        sys.executable, "-m", "uvicorn", "backend.app.main:app",
+        "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning",
+    ]
+    log = open(log_path, "w")
+    return subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+def stop_server(server):
+    server.terminate()
+    try:
+        server.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        server.kill()
+        server.wait()
+
+async def wait_until_ready(url, server=None, timeout: float = 600):
+    # preloading the demo responses takes a while on big datasets
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=url, timeout=5) as client:
+        while time.monotonic() < deadline:
+            if server is not None and server.poll() is not None:
+                raise RuntimeError(f"server exited with code {server.returncode}")
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.5)
+    raise RuntimeError(f"server not ready after {timeout:.0f}s")
+
+
+class Params:
+    '''Fills the {placeholders} of the mix paths from the dataset'''
+
+    def __init__(self, appids, names, rng: random.Random):
+        self.appids = appids
+        self.terms = sorted({name[i:i + 2].lower() for name in names for i in range(len(name) - 1) if name[i:i + 2].strip()}) or ["a"]
+        self.rng = rng
+
+    def fill(self, path: str) -> str:
+        if "{" not in path:
+            return path
+        first, second = self.rng.sample(self.appids, 2) if len(self.appids) > 1 else (self.appids * 2)[:2]
+        return path.format(appid=first, appid2=second, q=self.rng.choice(self.terms), page=self.rng.randint(1, 4))
+
+async def load_params(client, rng):
+    resp = await client.get("/demo/analytics/top_games", params={"limit": 100})
+    resp.raise_for_status()
+    games = resp.json()["top_games"]
+    if not games:
+        raise RuntimeError("dataset has no games")
+    return Params([g["appid"] for g in games], [g["name"] for g in games if g.get("name")], rng)
+
+async def cache_stats(client):
+    try:
+        resp = await client.get("/demo/stats/cache")
+        return resp.json() if resp.status_code == 200 else None
+    except httpx.HTTPError:
+        return None
+
+def cache_delta(before, after):
+    '''Lookups made between two /demo/stats/cache readings'''
+    if not before or not after:
+        return None
+    layers = {}
+    for layer, counts in after["layers"].items():
+        old = before["layers"].get(layer, {})
+        hits, stale_hits, misses = (counts[k] - old.get(k, 0) for k in ("hits", "stale_hits", "misses"))
+        total = hits + stale_hits + misses
+        if total:
+            layers[layer] = {"hits": hits, "stale_hits": stale_hits, "misses": misses, "hit_ratio": round((hits + stale_hits) / total, 4)}
+    lookups = sum(l["hits"] + l["stale_hits"] + l["misses"] for l in layers.values())
+    hits = sum(l["hits"] + l["stale_hits"] for l in layers.values())
+    return {"hit_ratio": round(hits / lookups, 4) if lookups else None, "lookups": lookups, "layers": layers}
+
+
+def percentile(sorted_values, q: float):
+    # nearest rank
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+def latency_summary(latencies):
+    values = sorted(latencies)
+    if not values:
+        return {"mean": None, "p50": None, "p90": None, "p95": None, "p99": None, "max": None}
+    return {
+        "mean": round(sum(values) / len(values), 2),
+        "p50": round(percentile(values, 50), 2),
+        "p90": round(percentile(values, 90), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(values[-1], 2),
+    }
+
+async def run_level(client, mix, params: Params, concurrency: int, duration: float, rng: random.Random):
+    '''`concurrency` clients sending back to back for `duration` seconds. Returns (name, ms, status) per request'''
+    weights = [entry["weight"] for entry in mix]
+    results = []
+    deadline = time.perf_counter() + duration
+
+    async def user():
+        while time.perf_counter() < deadline:
+            entry = rng.choices(mix, weights)[0]
+            path = params.fill(entry["path"])
+            started = time.perf_counter()
+            try:
+                status = (await client.get(path)).status_code
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            results.append((entry["name"], (time.perf_counter() - started) * 1000, status))
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+    return results, time.perf_counter() - started
+
+def summarize_level(concurrency: int, results, elapsed: float, cache):
+    errors = [r for r in results if not isinstance(r[2], int) or r[2] >= 400]
+    status_counts = {}
+    for _, _, status in results:
+        status_counts[str(status)] = status_counts.get(str(status), 0) + 1
+
+    endpoints = {}
+    for name in sorted({r[0] for r in results}):
+        rows = [r for r in results if r[0] == name]
+        latency = latency_summary([r[1] for r in rows])
+        endpoints[name] = {
+            "requests": len(rows),
+            "errors": sum(1 for r in rows if not isinstance(r[2], int) or r[2] >= 400),
+            "p50_ms": latency["p50"],
+            "p99_ms": latency["p99"],
+        }
+
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": len(results),
+        "throughput_rps": round(len(results) / elapsed, 1) if elapsed else 0.0,
+        "errors": len(errors),
+        "error_rate": round(len(errors) / len(results), 4) if results else 0.0,
+        "status_counts": status_counts,
+        "latency_ms": latency_summary([r[1] for r in results]),
+        "cache": cache,
+        "endpoints": endpoints,
+    }
+
+def sustained(levels, slo_p99_ms: float, slo_error_rate: float):
+    '''Best throughput among the levels within the SLO, and the first level that missed it'''
+    within = [l for l in levels if l["error_rate"] <= slo_error_rate and (l["latency_ms"]["p99"] or 0) <= slo_p99_ms]
+    missed = [l["concurrency"] for l in levels if l not in within]
+    best = max(within, key=lambda l: l["throughput_rps"], default=None)
+    return {
+        "slo": {"p99_ms": slo_p99_ms, "error_rate": slo_error_rate},
+        "throughput_rps": best["throughput_rps"] if best else None,
+        "at_concurrency": best["concurrency"] if best else None,
+        "degraded_at_concurrency": missed[0] if missed else None,
+    }
+
+
+def print_level(level):
+    latency = level["latency_ms"]
+    ratio = level["cache"]["hit_ratio"] if level["cache"] else None
+    print(
+        f"  c={level['concurrency']:<4} {level['throughput_rps']:>8.1f} req/s  "
+        f"p50 {latency['p50']} ms  p95 {latency['p95']} ms  p99 {latency['p99']} ms  "
+        f"errors {level['error_rate']:.2%}  cache hits {'-' if ratio is None else f'{ratio:.1%}'}"
+    )
+
+def print_comparison(report, baseline):
+    print(f"\nvs {baseline.get('git_commit') or 'baseline'} ({baseline.get('started_at')}):")
+    old_levels = {l["concurrency"]: l for l in baseline.get("levels", [])}
+    if not any(l["concurrency"] in old_levels for l in report["levels"]):
+        print("  no concurrency level in common")
+    for level in report["levels"]:
+        old = old_levels.get(level["concurrency"])
+        if not old:
+            continue
+        def change(new, previous):
+            return f"{(new - previous) / previous:+.1%}" if new is not None and previous else "n/a"
+        print(
+            f"  c={level['concurrency']:<4} throughput {change(level['throughput_rps'], old['throughput_rps'])}  "
+            f"p99 {change(level['latency_ms']['p99'], old['latency_ms']['p99'])}  "
+            f"error rate {old['error_rate']:.2%} -> {level['error_rate']:.2%}"
+        )
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, mix):
+    rng = random.Random(args.seed)
+    limits = httpx.Limits(max_connections=max(args.levels), max_keepalive_connections=max(args.levels))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=args.timeout) as client:
+        params = await load_params(client, rng)
+        if args.warmup:
+            await run_level(client, mix, params, args.levels[0], args.warmup, rng)
+
+        levels = []
+        for concurrency in args.levels:
+            before = await cache_stats(client)
+            results, elapsed = await run_level(client, mix, params, concurrency, args.duration, rng)
+            level = summarize_level(concurrency, results, elapsed, cache_delta(before, await cache_stats(client)))
+            print_level(level)
+            levels.append(level)
+        return levels
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the demo API")
+    parser.add_argument("--url", help="test a running server instead of booting one")
+    parser.add_argument("--db", default=DEMO_DB, help="demo database to serve (default: steamvault_demo.db)")
+    parser.add_argument("--generate", type=int, metavar="GAMES", help="generate a dataset with this many games into --db first")
+    parser.add_argument("--days", type=int, default=365, help="days of history for --generate")
+    parser.add_argument("--levels", default="1,4,16,64", help="comma separated concurrency levels")
+    parser.add_argument("--duration", type=float, default=15, help="seconds per level")
+    parser.add_argument("--warmup", type=float, default=3, help="seconds of unrecorded traffic first")
+    parser.add_argument("--mix", help="JSON file with the request mix")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=30, help="per request timeout (s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--slo-p99-ms", type=float, default=500)
+    parser.add_argument("--slo-error-rate", type=float, default=0.01)
+    parser.add_argument("--report", help="report path (default: loadtests/load-test-<time>.json)")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    args = parser.parse_args()
+    args.levels = [int(level) for level in args.levels.split(",") if level.strip()]
+    started_at = datetime.now(timezone.utc)
+
+    mix = DEFAULT_MIX
+    if args.mix:
+        with open(args.mix) as f:
+            mix = json.load(f)
+
+    server = None
+    dataset = None
+    if not args.url:
+        args.db = os.path.abspath(args.db)
+        if args.generate and not os.path.exists(args.db):
+            generate_dataset(args.db, args.generate, args.days, args.seed)
+        dataset = describe_dataset(args.db)
+        log_path = os.path.join(tempfile.gettempdir(), f"steamvault-loadtest-server-{args.port}.log")
+        print(f"Starting demo server on {args.db} ({dataset['games']} games, {dataset['snapshots']} snapshots), log: {log_path}")
+        server = start_server(args.db, args.port, args.workers, log_path)
+        args.url = f"http://127.0.0.1:{args.port}"
+
+    try:
+        ready_started = time.perf_counter()
+        asyncio.run(wait_until_ready(args.url, server))
+        print(f"Server ready after {time.perf_counter() - ready_started:.1f}s, {args.duration:g}s per level")
+        levels = asyncio.run(run(args, mix))
+    except (RuntimeError, httpx.HTTPError) as e:
+        print(f"Load test failed: {e}")
+        sys.exit(1)
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    report = {
+        "report_version": REPORT_VERSION,
+        "started_at": started_at.isoformat(),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "target": args.url if server is None else "booted",
+        "workers": args.workers if server is not None else None,
+        "dataset": dataset,
+        "config": {"levels": args.levels, "duration_s": args.duration, "warmup_s": args.warmup, "seed": args.seed, "mix": mix},
+        "sustained": sustained(levels, args.slo_p99_ms, args.slo_error_rate),
+        "levels": levels,
+    }
+    report_path = args.report or os.path.join("loadtests", f"load-test-{started_at:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(report_path) or ".", exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+
+    result = report["sustained"]
+    if result["throughput_rps"] is not None:
+        print(f"\nSustained {result['throughput_rps']} req/s at concurrency {result['at_concurrency']} (p99 <= {args.slo_p99_ms:g} ms, errors <= {args.slo_error_rate:.1%})")
+    else:
+        print("\nNo level met the SLO")
+    print(f"Report written to {report_path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(report, json.load(f))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# backend/scripts/partition_snapshots.py
+"""
+Month partitions for the snapshots table (see backend/app/services/partitions.py).
+
+    python backend/scripts/partition_snapshots.py enable              # one time conversion
+    python backend/scripts/partition_snapshots.py status
+    python backend/scripts/partition_snapshots.py rollover            # also runs on startup / nightly finalize
+    python backend/scripts/partition_snapshots.py archive 2023-01     # take a month out of the live data
+    python backend/scripts/partition_snapshots.py archive --before 2024-01
+    python backend/scripts/partition_snapshots.py restore 2023-01
+
+- enable on Postgres rewrites the table in one transaction (stop the API first)
+- archive on Postgres detaches the partition into the `archive` schema, on
+  SQLite the month is written to SNAPSHOT_ARCHIVE_DIR/snapshots_YYYY_MM.db
+- archive / restore build a new analytics bundle, running workers drop their
+  caches when they see it (same as the import CLI)
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import date
+
+# ensure project root is on path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from backend.app.db.database import SessionLocal, init_database
+from backend.app.services import bundle, partitions
+
+def parse_month(value: str) -> date:
+    try:
+        year, month = value.split("-")[:2]
+        return date(int(year), int(month), 1)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected YYYY-MM, got {value!r}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage month partitions of the snapshots table")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("enable", help="convert the snapshots table (one time)")
+    commands.add_parser("status", help="list partitions")
+    commands.add_parser("rollover", help="move finished months into their partitions / create upcoming ones")
+    archive = commands.add_parser("archive", help="take months out of the live data")
+    archive.add_argument("month", nargs="?", type=parse_month)
+    archive.add_argument("--before", type=parse_month, help="every attached month before this one")
+    restore = commands.add_parser("restore", help="bring an archived month back")
+    restore.add_argument("month", type=parse_month)
+    args = parser.parse_args()
+
+    init_database()
+    db = SessionLocal()
+    try:
+        if args.command == "enable":
+            result = partitions.enable(db)
+        elif args.command == "status":
+            result = partitions.status(db)
+        elif args.command == "rollover":
+            if not partitions.is_partitioned(db):
+                print("Snapshots aren't partitioned, run `enable` first")
+                sys.exit(2)
+            result = partitions.rollover(db)
+        elif args.command == "archive":
+            if not args.month and not args.before:
+                parser.error("archive needs a month or --before")
+            months = [args.month] if args.month else [
+                date.fromisoformat(p["month"]) for p in partitions.status(db)
+                if p["status"] == "attached" and date.fromisoformat(p["month"]) < args.before
+            ]
+            result = []
+            for month in months:
+                result.append(partitions.archive(db, month))
+                db.commit() # one month at a time, an error later keeps the earlier ones
+        else:
+            result = partitions.restore(db, args.month)
+        db.commit()
+    except ValueError as e:
+        db.rollback()
+        print(e)
+        sys.exit(2)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    print(json.dumps(result, indent=2, default=str))
+    if args.command in ("archive", "restore") and result:
+        # the live data changed, summaries and game stats are kept as they are
+        bundle.build_bundle()
+    if args.command == "enable":
+        print("Restart the API so it picks up the partitions.")
+
+if __name__ == "__main__":
+    main()
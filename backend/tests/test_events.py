@@ -0,0 +1,29 @@
+# /backend/tests/test_events.py
+import asyncio
+import unittest
+from starlette.requests import Request
+from backend.app.routes import events as events_routes
+from backend.app.services import events
+
+'''
+/events/stream only holds a subscriber slot while its body is being sent.
+'''
+
+def _request():
+    async def receive():
+        await asyncio.sleep(3600)
+    return Request({"type": "http", "method": "GET", "path": "/events/stream", "headers": []}, receive)
+
+async def _client_gone(message):
+    raise OSError("client disconnected")
+
+class EventStreamTest(unittest.IsolatedAsyncioTestCase):
+    async def test_disconnect_before_first_chunk(self):
+        response = await events_routes.event_stream(_request())
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+        with self.assertRaises(Exception):
+            await response(scope, _request().receive, _client_gone)
+        self.assertEqual(events.subscriber_count(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
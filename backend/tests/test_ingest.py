@@ -0,0 +1,54 @@
+# /backend/tests/test_ingest.py
+import asyncio
+import unittest
+from unittest import mock
+from backend.app.services import ingest, steam_api
+
+'''
+A writer error while the download is ahead (queue full) stops the download
+too, instead of leaving it blocked on the queue with the response open.
+'''
+
+class FailingWriter:
+    def __init__(self):
+        self.aborted = False
+        self.closed = False
+
+    def write(self, batch):
+        raise RuntimeError("disk full")
+
+    def abort(self):
+        self.aborted = True
+
+    def close(self):
+        self.closed = True
+
+class SaveTest(unittest.IsolatedAsyncioTestCase):
+    async def test_writer_error_stops_download(self):
+        stream = {"closed": False}
+        async def stream_owned_games():
+            try:
+                for _ in range(100):
+                    yield [object()]
+            finally:
+                stream["closed"] = True
+
+        writers = []
+        def open_writer():
+            writers.append(FailingWriter())
+            return writers[-1]
+
+        job = ingest.IngestJob("test")
+        with mock.patch.object(ingest, "SnapshotWriter", open_writer), \
+                mock.patch.object(steam_api, "stream_owned_games", stream_owned_games):
+            with self.assertRaises(RuntimeError):
+                await asyncio.wait_for(ingest._save(job), timeout=5)
+
+        others = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        self.assertEqual(others, [])
+        self.assertTrue(stream["closed"])
+        self.assertTrue(writers[0].aborted and writers[0].closed)
+        self.assertIn("download", job.stages)
+
+if __name__ == "__main__":
+    unittest.main()
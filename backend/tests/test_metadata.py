@@ -0,0 +1,66 @@
+# /backend/tests/test_metadata.py
+import json
+import unittest
+from unittest import mock
+import httpx
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from backend.app.db.models import Base, GameMetadata, GameGenre
+from backend.app.services import metadata
+
+'''
+The metadata run against a fake store (httpx.MockTransport): a store page,
+a "success: false" (no store page) and a 429 that ends the run.
+'''
+
+def _store(appid: int):
+    if appid == 10:
+        return httpx.Response(200, json={"10": {"success": True, "data": {
+            "header_image": "https://example.com/10.jpg",
+            "genres": [{"id": "1", "description": "Action"}],
+            "categories": [{"id": 2, "description": "Single-player"}],
+            "developers": ["Valve"],
+            "release_date": {"coming_soon": False, "date": "1 Nov, 2004"}
+        }}})
+    if appid == 20:
+        return httpx.Response(200, json={"20": {"success": False}})
+    return httpx.Response(429)
+
+class EnrichTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        self.Session = sessionmaker(bind=engine)
+
+    async def test_store_page_missing_page_and_rate_limit(self):
+        requested = []
+        def handler(request):
+            appid = int(request.url.params["appids"])
+            requested.append(appid)
+            return _store(appid)
+
+        # one call at a time, in order
+        with mock.patch.object(metadata, "METADATA_CONCURRENCY", 1), \
+                mock.patch.object(metadata, "METADATA_RATE_PER_MINUTE", 60000):
+            stats = await metadata.enrich([10, 20, 30, 40, 50, 60], transport=httpx.MockTransport(handler), session_factory=self.Session)
+
+        # the call already waiting for its turn may still go out, nothing after it
+        self.assertEqual(requested[:3], [10, 20, 30])
+        self.assertLessEqual(len(requested), 4)
+        self.assertEqual((stats["fetched"], stats["not_on_store"], stats["failed"], stats["skipped"]), (1, 1, 0, 4))
+
+        db = self.Session()
+        try:
+            rows = {m.appid: m for m in db.query(GameMetadata).all()}
+            self.assertEqual(set(rows), {10, 20})
+            self.assertTrue(rows[10].on_store)
+            self.assertEqual(json.loads(rows[10].genres), ["Action"])
+            self.assertEqual(rows[10].release_date, "1 Nov, 2004")
+            self.assertFalse(rows[20].on_store)
+            self.assertEqual([(g.appid, g.genre) for g in db.query(GameGenre).all()], [(10, "Action")])
+        finally:
+            db.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+# /backend/tests/test_trends.py
+import time
+import unittest
+from unittest import mock
+from backend.app.services import analytics, cache, trends
+
+'''
+get_trends serves an expired entry right away and recomputes it in the
+background, on its own session.
+'''
+
+class FakeSession:
+    def __init__(self):
+        self.info = {"db": "main"}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+class FakeSeries:
+    def __init__(self, total):
+        self.total = total
+
+    def compare(self, end, days):
+        return {"days": days, "total_playtime": self.total, "previous_total_playtime": 0, "change": None}
+
+class ExpiredTrendsTest(unittest.TestCase):
+    def setUp(self):
+        self.key = "playtime_trends_7"
+        cache.delete_cache(self.key)
+
+    def tearDown(self):
+        cache.delete_cache(self.key)
+
+    def test_expired_entry_is_recomputed(self):
+        sessions = []
+        def open_session():
+            sessions.append(FakeSession())
+            return sessions[-1]
+
+        stale = {"this_week": {"total_playtime": 1}}
+        cache.set_cache(self.key, stale, ttl=-1)
+        with mock.patch.object(analytics, "ReadSessionLocal", open_session), \
+                mock.patch.object(trends, "get_series", lambda db: FakeSeries(42)):
+            result = analytics.get_trends()
+            self.assertTrue(result["cached"])
+            self.assertEqual(result["trends"], stale)
+
+            deadline = time.time() + 5
+            while cache.get_cache(self.key) is None and time.time() < deadline:
+                time.sleep(0.01)
+
+        fresh = cache.get_cache(self.key)
+        self.assertIsNotNone(fresh)
+        self.assertEqual(fresh["this_week"]["total_playtime"], 42)
+        self.assertEqual(fresh["windows"][0]["days"], 7)
+        # the request's session and the refresh's own one, both closed
+        self.assertEqual(len(sessions), 2)
+        self.assertTrue(all(s.closed for s in sessions))
+
+if __name__ == "__main__":
+    unittest.main()